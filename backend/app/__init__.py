@@ -1,13 +1,14 @@
-from flask import Flask
+from flask import Flask, request
 from flask_sqlalchemy import SQLAlchemy
 from flask_cors import CORS
 from flask_jwt_extended import JWTManager
 from flask_bcrypt import Bcrypt
 from werkzeug.middleware.proxy_fix import ProxyFix
 from config import config
+from app.db_routing import RoutingSession
 
 # Initialize extensions
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 jwt = JWTManager()
 bcrypt = Bcrypt()
 
@@ -25,24 +26,56 @@ def create_app(config_name='default'):
     # Trust proxy headers (Traefik/nginx)
     app.wsgi_app = ProxyFix(app.wsgi_app, x_for=1, x_proto=1, x_host=1)
 
+    # Structured, non-blocking logging with request ids
+    from app.log_pipeline import configure_logging
+    configure_logging(app)
+
+    # Size the connection pool from the budget before the engines exist
+    from app.db_pool import sized_engine_options, instrument_engines
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = sized_engine_options(app.config)
+
     # Initialize extensions
     db.init_app(app)
     jwt.init_app(app)
     bcrypt.init_app(app)
     CORS(app, origins=app.config['CORS_ORIGINS'])
 
+    with app.app_context():
+        instrument_engines(app, db.engines)
+
     # Register blueprints
-    from app.routes import auth, songs, styles, webhooks
+    from app.routes import auth, songs, styles, webhooks, speech
 
     api_prefix = app.config['API_PREFIX']
     app.register_blueprint(auth.bp, url_prefix=f'{api_prefix}/auth')
     app.register_blueprint(songs.bp, url_prefix=f'{api_prefix}/songs')
     app.register_blueprint(styles.bp, url_prefix=f'{api_prefix}/styles')
     app.register_blueprint(webhooks.bp, url_prefix=f'{api_prefix}/webhooks')
+    app.register_blueprint(speech.bp, url_prefix=f'{api_prefix}/speech')
+
+    # Keep analytics rollups in step with song writes
+    from app.analytics import register_rollup_listener
+    register_rollup_listener()
+
+    # Keep lyrics signatures and their LSH buckets in step with lyric writes
+    from app.lyrics_similarity import register_lyrics_index_listeners
+    register_lyrics_index_listeners()
+
+    # Register CLI commands
+    from app.commands import register_commands
+    register_commands(app)
 
     # Health check endpoint
     @app.route('/health')
     def health_check():
         return {'status': 'healthy', 'service': 'AIAMusic API'}, 200
 
+    # Prometheus metrics of all workers (not proxied by nginx)
+    @app.route('/metrics')
+    def metrics_endpoint():
+        from app.metrics import client_allowed, render
+        if not client_allowed(request, app.config['METRICS_ALLOWED_NETWORKS']):
+            return {'error': 'Forbidden'}, 403
+        return render(app.config['METRICS_DIR']), 200, {'Content-Type': 'text/plain; version=0.0.4'}
+
     return app
@@ -0,0 +1,143 @@
+"""
+Admission control for slow endpoint classes.
+
+Provider-bound requests (song creation, recreation, speech synthesis) can
+take tens of seconds during a provider brownout. Without limits they fill
+every worker thread and cheap reads queue behind them. Each endpoint class
+gets a per-process gate: at most `limit` requests run at once, at most
+`queue` more wait up to ADMISSION_QUEUE_TIMEOUT seconds for a slot, and
+anything beyond that is rejected immediately with 503 and Retry-After.
+Endpoints without a class are not limited.
+
+The limits only leave room for other requests when workers run several
+threads (gunicorn's gthread worker); see gunicorn_config.py.
+"""
+from functools import wraps
+import threading
+import time
+from flask import current_app, jsonify
+from app import metrics
+
+_gates = {}
+_gates_lock = threading.Lock()
+
+_rejections = metrics.counter('admission_rejected_total', 'Requests rejected by admission control')
+_admitted = metrics.counter('admission_admitted_total', 'Requests admitted by admission control')
+_queue_wait = metrics.summary('admission_queue_wait_seconds', 'Time admitted requests waited for a slot')
+
+
+class AdmissionGate:
+    """Concurrency limit with a bounded wait queue."""
+
+    def __init__(self, name, limit, queue, timeout):
+        self.name = name
+        self.limit = limit
+        self.queue = queue
+        self.timeout = timeout
+        self.active = 0
+        self.waiting = 0
+        self._condition = threading.Condition()
+
+    def acquire(self):
+        """Take a slot, waiting in the queue if there is room. Returns False if rejected."""
+        with self._condition:
+            if self.active < self.limit:
+                self.active += 1
+                return True
+            if self.waiting >= self.queue:
+                return False
+
+            self.waiting += 1
+            try:
+                admitted = self._condition.wait_for(lambda: self.active < self.limit, timeout=self.timeout)
+                if admitted:
+                    self.active += 1
+                return admitted
+            finally:
+                self.waiting -= 1
+
+    def release(self):
+        with self._condition:
+            self.active -= 1
+            self._condition.notify()
+
+
+def _collect_queue_depth():
+    with _gates_lock:
+        gates = list(_gates.values())
+    return [({'endpoint_class': gate.name}, gate.waiting) for gate in gates]
+
+
+def _collect_active():
+    with _gates_lock:
+        gates = list(_gates.values())
+    return [({'endpoint_class': gate.name}, gate.active) for gate in gates]
+
+
+metrics.gauge('admission_queue_depth', 'Requests waiting for a slot', _collect_queue_depth)
+metrics.gauge('admission_active', 'Requests currently holding a slot', _collect_active)
+
+
+def get_gate(endpoint_class):
+    """The per-process gate for an endpoint class, sized from config."""
+    with _gates_lock:
+        gate = _gates.get(endpoint_class)
+        if gate is None:
+            limit, queue = current_app.config['ADMISSION_LIMITS'][endpoint_class]
+            gate = AdmissionGate(endpoint_class, limit, queue, current_app.config['ADMISSION_QUEUE_TIMEOUT'])
+            _gates[endpoint_class] = gate
+        return gate
+
+
+def admission_control(endpoint_class):
+    """Limit concurrent requests to the decorated view's endpoint class."""
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not current_app.config.get('ADMISSION_CONTROL_ENABLED', True):
+                return fn(*args, **kwargs)
+
+            gate = get_gate(endpoint_class)
+            started = time.monotonic()
+
+            if not gate.acquire():
+                _rejections.inc(endpoint_class=endpoint_class)
+                current_app.logger.warning(f"Admission control: rejected {endpoint_class} request "
+                                           f"({gate.active} active, {gate.waiting} waiting)")
+                response = jsonify({'error': 'The server is busy, please try again shortly'})
+                response.status_code = 503
+                response.headers['Retry-After'] = str(current_app.config['ADMISSION_RETRY_AFTER'])
+                return response
+
+            _admitted.inc(endpoint_class=endpoint_class)
+            _queue_wait.observe(time.monotonic() - started, endpoint_class=endpoint_class)
+
+            try:
+                response = current_app.make_response(fn(*args, **kwargs))
+            except Exception:
+                gate.release()
+                raise
+
+            # Streamed bodies keep working after the view returns: hold the
+            # slot until the body is exhausted or the response is closed
+            if response.is_streamed:
+                released = threading.Event()
+
+                def release_once():
+                    if not released.is_set():
+                        released.set()
+                        gate.release()
+
+                def guarded(body):
+                    try:
+                        yield from body
+                    finally:
+                        release_once()
+
+                response.response = guarded(response.response)
+                response.call_on_close(release_once)
+            else:
+                gate.release()
+            return response
+        return wrapper
+    return decorator
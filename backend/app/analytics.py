@@ -0,0 +1,257 @@
+"""
+Song analytics backed by the song_rollups table.
+
+Every song contributes to one rollup row keyed by (user, style, creation
+day, status): one song, plus its star rating if rated. Writes keep the
+rollups current without scanning songs:
+
+- ORM inserts, updates and deletes of songs are folded into per-key deltas
+  in an after_flush hook and upserted in the same transaction.
+- Bulk UPDATE statements bypass the ORM, so their callers report the
+  affected rows through record_bulk_changes(), and Core INSERTs (song
+  imports) report the new rows through record_bulk_inserts().
+
+Archived songs keep their contribution: archival moves them with Core
+statements the flush hook does not see (see app/archival.py). Deleting an
+archived song through the ORM removes it.
+
+`flask rebuild-analytics` recomputes the table from songs and
+songs_archive, correcting any drift (e.g. rows removed by ON DELETE CASCADE).
+"""
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from sqlalchemy import event, inspect
+from sqlalchemy.dialects import mysql, sqlite
+from app import db
+from app.db_routing import RoutingSession
+from app.models import Song, SongArchive, SongRollup, Style
+
+# Song attributes that decide which rollup row a song counts towards
+ROLLUP_ATTRIBUTES = ('user_id', 'style_id', 'created_at', 'status', 'star_rating')
+
+
+def _rollup_key(user_id, style_id, created_at, status):
+    day = created_at.date() if isinstance(created_at, datetime) else created_at
+    return (user_id, style_id or 0, day or date.today(), status or 'create')
+
+
+def _add_contribution(deltas, values, sign):
+    """Add (sign=1) or remove (sign=-1) one song's contribution to deltas."""
+    key = _rollup_key(values['user_id'], values['style_id'], values['created_at'], values['status'])
+    rating = values['star_rating'] or 0
+    delta = deltas[key]
+    delta[0] += sign
+    delta[1] += sign if rating > 0 else 0
+    delta[2] += sign * rating
+
+
+def _current_values(song):
+    return {name: getattr(song, name) for name in ROLLUP_ATTRIBUTES}
+
+
+def _previous_values(song):
+    """Attribute values as they were before the flush."""
+    state = inspect(song)
+    values = {}
+    for name in ROLLUP_ATTRIBUTES:
+        history = state.attrs[name].history
+        if history.deleted:
+            values[name] = history.deleted[0]
+        elif history.unchanged:
+            values[name] = history.unchanged[0]
+        else:
+            values[name] = getattr(song, name)
+    return values
+
+
+def apply_rollup_deltas(connection, deltas):
+    """Upsert {key: [songs, rated, rating_sum]} deltas into song_rollups."""
+    rows = [
+        {'user_id': key[0], 'style_id': key[1], 'day': key[2], 'status': key[3],
+         'song_count': delta[0], 'rated_count': delta[1], 'rating_sum': delta[2]}
+        for key, delta in deltas.items() if any(delta)
+    ]
+    if not rows:
+        return
+
+    table = SongRollup.__table__
+    if connection.dialect.name == 'mysql':
+        statement = mysql.insert(table)
+        statement = statement.on_duplicate_key_update(
+            song_count=table.c.song_count + statement.inserted.song_count,
+            rated_count=table.c.rated_count + statement.inserted.rated_count,
+            rating_sum=table.c.rating_sum + statement.inserted.rating_sum,
+        )
+    else:
+        statement = sqlite.insert(table)
+        statement = statement.on_conflict_do_update(
+            index_elements=['user_id', 'style_id', 'day', 'status'],
+            set_={
+                'song_count': table.c.song_count + statement.excluded.song_count,
+                'rated_count': table.c.rated_count + statement.excluded.rated_count,
+                'rating_sum': table.c.rating_sum + statement.excluded.rating_sum,
+            },
+        )
+    connection.execute(statement, rows)
+
+
+def _track_song_writes(session, flush_context):
+    """after_flush hook: fold flushed song changes into rollup deltas."""
+    deltas = defaultdict(lambda: [0, 0, 0])
+
+    for obj in session.new:
+        if isinstance(obj, Song):
+            _add_contribution(deltas, _current_values(obj), 1)
+
+    for obj in session.dirty:
+        if isinstance(obj, Song) and session.is_modified(obj, include_collections=False):
+            state = inspect(obj)
+            if any(state.attrs[name].history.has_changes() for name in ROLLUP_ATTRIBUTES):
+                _add_contribution(deltas, _previous_values(obj), -1)
+                _add_contribution(deltas, _current_values(obj), 1)
+
+    for obj in session.deleted:
+        if isinstance(obj, (Song, SongArchive)):
+            _add_contribution(deltas, _previous_values(obj), -1)
+
+    if deltas:
+        apply_rollup_deltas(session.connection(), deltas)
+
+
+def register_rollup_listener():
+    """Keep song_rollups in step with ORM song writes."""
+    if not event.contains(RoutingSession, 'after_flush', _track_song_writes):
+        event.listen(RoutingSession, 'after_flush', _track_song_writes)
+
+
+def record_bulk_changes(rows, changes_by_id):
+    """
+    Account for a bulk UPDATE of songs that bypassed the ORM.
+
+    rows are the songs' pre-update values (id plus ROLLUP_ATTRIBUTES) and
+    changes_by_id maps song id -> {column: new value}. Call in the same
+    transaction as the UPDATE.
+    """
+    deltas = defaultdict(lambda: [0, 0, 0])
+    for row in rows:
+        changes = changes_by_id.get(row['id'])
+        if not changes or not any(name in changes for name in ROLLUP_ATTRIBUTES):
+            continue
+        before = {name: row[name] for name in ROLLUP_ATTRIBUTES}
+        _add_contribution(deltas, before, -1)
+        _add_contribution(deltas, {**before, **changes}, 1)
+
+    apply_rollup_deltas(db.session.connection(), deltas)
+
+
+def record_bulk_inserts(rows):
+    """
+    Account for songs inserted with Core statements that bypassed the ORM.
+
+    rows carry the new songs' ROLLUP_ATTRIBUTES. One upsert covers them
+    all; call in the same transaction as the INSERT.
+    """
+    deltas = defaultdict(lambda: [0, 0, 0])
+    for row in rows:
+        _add_contribution(deltas, row, 1)
+
+    apply_rollup_deltas(db.session.connection(), deltas)
+
+
+def rebuild_rollups():
+    """Recompute song_rollups from songs and songs_archive in one transaction. Returns the row count."""
+    table = SongRollup.__table__
+    songs = db.union_all(*(
+        db.select(model.user_id, model.style_id, model.created_at, model.status, model.star_rating)
+        for model in (Song, SongArchive)
+    )).subquery()
+    style_key = db.func.coalesce(songs.c.style_id, 0)
+    day = db.func.date(songs.c.created_at)
+    aggregate = (
+        db.select(
+            songs.c.user_id, style_key, day, songs.c.status,
+            db.func.count(),
+            db.func.sum(db.case((songs.c.star_rating > 0, 1), else_=0)),
+            db.func.coalesce(db.func.sum(songs.c.star_rating), 0),
+        )
+        .group_by(songs.c.user_id, style_key, day, songs.c.status)
+    )
+
+    db.session.execute(table.delete())
+    db.session.execute(table.insert().from_select(
+        ['user_id', 'style_id', 'day', 'status', 'song_count', 'rated_count', 'rating_sum'], aggregate
+    ))
+    db.session.commit()
+    return db.session.query(db.func.count()).select_from(table).scalar()
+
+
+def _week_start(day):
+    if isinstance(day, str):
+        day = date.fromisoformat(day)
+    return day - timedelta(days=day.weekday())
+
+
+def song_analytics(user_id=None, weeks=12):
+    """
+    Per-style rating/status summary and weekly completion rates.
+
+    Reads only song_rollups. user_id=None covers all users.
+    """
+    base = db.session.query(SongRollup).filter(SongRollup.song_count != 0)
+    if user_id is not None:
+        base = base.filter(SongRollup.user_id == user_id)
+
+    # Per style: totals, ratings and status distribution
+    style_rows = (
+        base.with_entities(
+            SongRollup.style_id, SongRollup.status,
+            db.func.sum(SongRollup.song_count),
+            db.func.sum(SongRollup.rated_count),
+            db.func.sum(SongRollup.rating_sum),
+        )
+        .group_by(SongRollup.style_id, SongRollup.status)
+        .all()
+    )
+
+    styles = {}
+    for style_id, status, songs, rated, rating_sum in style_rows:
+        entry = styles.setdefault(style_id, {'style_id': style_id or None, 'songs': 0, 'rated': 0,
+                                             'rating_sum': 0, 'statuses': {}})
+        entry['songs'] += int(songs or 0)
+        entry['rated'] += int(rated or 0)
+        entry['rating_sum'] += int(rating_sum or 0)
+        entry['statuses'][status] = entry['statuses'].get(status, 0) + int(songs or 0)
+
+    names = dict(db.session.query(Style.id, Style.name).filter(Style.id.in_([key for key in styles if key])))
+    by_style = []
+    for style_id, entry in styles.items():
+        rating_sum = entry.pop('rating_sum')
+        entry['style_name'] = names.get(style_id)
+        entry['avg_rating'] = round(rating_sum / entry['rated'], 2) if entry['rated'] else None
+        entry['completion_rate'] = round(entry['statuses'].get('completed', 0) / entry['songs'], 3) if entry['songs'] else None
+        by_style.append(entry)
+    by_style.sort(key=lambda entry: (entry['avg_rating'] is None, -(entry['avg_rating'] or 0), -entry['songs']))
+
+    # Per week: songs created and how many completed or failed
+    since = _week_start(date.today()) - timedelta(weeks=weeks - 1)
+    day_rows = (
+        base.filter(SongRollup.day >= since)
+        .with_entities(SongRollup.day, SongRollup.status, db.func.sum(SongRollup.song_count))
+        .group_by(SongRollup.day, SongRollup.status)
+        .all()
+    )
+
+    weekly = {}
+    for day, status, songs in day_rows:
+        entry = weekly.setdefault(_week_start(day), {'songs': 0, 'completed': 0, 'failed': 0})
+        entry['songs'] += int(songs or 0)
+        if status in ('completed', 'failed'):
+            entry[status] += int(songs or 0)
+
+    by_week = [
+        {'week_start': week.isoformat(), **entry,
+         'completion_rate': round(entry['completed'] / entry['songs'], 3) if entry['songs'] else None}
+        for week, entry in sorted(weekly.items())
+    ]
+
+    return {'by_style': by_style, 'by_week': by_week}
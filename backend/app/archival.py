@@ -0,0 +1,127 @@
+"""
+Time-based archival of old, finished songs into songs_archive.
+
+songs only grows, and every default list and stats query walks its
+indexes across years of completed and failed songs. `flask archive-songs`
+moves songs created more than ARCHIVE_AFTER_DAYS ago with a terminal
+status into songs_archive, oldest first, in batches of ARCHIVE_BATCH_SIZE.
+Each batch is one short transaction:
+
+- lock the batch's song rows (SKIP LOCKED on MySQL, so songs being edited
+  right now are left for the next pass);
+- copy them, with their lyrics and prompt from song_texts, into
+  songs_archive;
+- write delta sync tombstones, so clients drop them from the default view;
+- delete the songs and their song_texts, LSH bucket, waveform and mirror
+  failure rows.
+
+Batches are separated by ARCHIVE_BATCH_PAUSE_SECONDS to give replicas
+and concurrent writers room.
+
+Archived songs are still reachable with include_archived=true on
+GET /songs, GET /songs/<id>, GET /songs/stats and GET /songs/export; their
+mirrored audio stays playable and DELETE /songs/<id> removes them. They
+keep counting in the analytics rollups: the rows are removed with Core
+DELETEs, which the rollup flush hook does not see, and rebuild_rollups()
+aggregates over both tables. They no longer take part in near-duplicate
+lyrics detection.
+"""
+from datetime import datetime, timedelta
+import time
+from flask import current_app
+from app import db
+from app.models import (Song, SongArchive, SongDeletion, SongLshBucket, SongMirrorFailure, SongText,
+                        SongWaveform)
+
+ARCHIVABLE_STATUSES = ('completed', 'failed')
+
+# songs columns copied as-is; specific_lyrics and prompt_to_generate come from song_texts
+SONG_COLUMNS = [column.name for column in Song.__table__.columns]
+
+
+def archive_candidates(status, cutoff, limit):
+    """
+    Locking select() of the oldest songs of one status created before cutoff.
+
+    One status per statement, so idx_songs_status_created serves both the
+    range and the order and only the returned rows are read and locked.
+    """
+    return (
+        db.select(Song.id)
+        .where(Song.status == status, Song.created_at < cutoff)
+        .order_by(Song.created_at, Song.id)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    )
+
+
+def _archive_batch(cutoff, batch_size):
+    """Move one batch of songs older than cutoff. Returns the number of songs moved."""
+    song_ids = []
+    for status in ARCHIVABLE_STATUSES:
+        song_ids += db.session.execute(
+            archive_candidates(status, cutoff, batch_size - len(song_ids))
+        ).scalars().all()
+        if len(song_ids) >= batch_size:
+            break
+    if not song_ids:
+        return 0
+
+    now = datetime.utcnow()
+    copy = (
+        db.select(
+            *(Song.__table__.c[name] for name in SONG_COLUMNS),
+            SongText.specific_lyrics, SongText.prompt_to_generate, db.literal(now)
+        )
+        .select_from(Song)
+        .outerjoin(SongText, SongText.song_id == Song.id)
+        .where(Song.id.in_(song_ids))
+    )
+    db.session.execute(SongArchive.__table__.insert().from_select(
+        SONG_COLUMNS + ['specific_lyrics', 'prompt_to_generate', 'archived_at'], copy
+    ))
+    db.session.execute(SongDeletion.__table__.insert().from_select(
+        ['song_id', 'user_id', 'deleted_at'],
+        db.select(Song.id, Song.user_id, db.literal(now)).where(Song.id.in_(song_ids))
+    ))
+
+    # Core deletes: the rollup hook must not subtract archived songs
+    for model in (SongText, SongLshBucket, SongWaveform, SongMirrorFailure):
+        db.session.execute(db.delete(model).where(model.song_id.in_(song_ids)))
+    db.session.execute(db.delete(Song).where(Song.id.in_(song_ids)))
+    return len(song_ids)
+
+
+def archive_songs(older_than_days=None, batch_size=None, max_batches=None):
+    """
+    Archive finished songs created more than older_than_days ago.
+
+    Runs until no candidates are left or max_batches batches were moved.
+    Returns a summary dict.
+    """
+    config = current_app.config
+    older_than_days = older_than_days or config['ARCHIVE_AFTER_DAYS']
+    batch_size = batch_size or config['ARCHIVE_BATCH_SIZE']
+    pause = config['ARCHIVE_BATCH_PAUSE_SECONDS']
+    cutoff = datetime.utcnow() - timedelta(days=older_than_days)
+
+    summary = {'archived': 0, 'batches': 0}
+    while max_batches is None or summary['batches'] < max_batches:
+        try:
+            moved = _archive_batch(cutoff, batch_size)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            current_app.logger.error(f"Archival: Database error: {str(e)}")
+            raise
+
+        if not moved:
+            break
+        summary['archived'] += moved
+        summary['batches'] += 1
+        if moved < batch_size:
+            break
+        time.sleep(pause)
+
+    current_app.logger.info(f"Archival: {summary}")
+    return summary
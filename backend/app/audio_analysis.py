@@ -0,0 +1,266 @@
+"""
+Duration, loudness and waveform peaks of completed songs' audio.
+
+Browsers would otherwise have to download and decode every MP3 to show a
+waveform or a duration. `flask analyze-audio` decodes each completed track
+once (the local mirror copy when there is one, else the download URL) with
+ffmpeg into 32-bit float PCM and computes, with vectorized NumPy:
+
+- duration, from the decoded sample count;
+- integrated loudness in LUFS per ITU-R BS.1770: K-weighting applied in
+  the frequency domain, 400 ms blocks with 75% overlap from a cumulative
+  sum of squares, then the absolute (-70 LUFS) and relative (-10 LU) gates;
+- PEAK_BUCKETS min/max pairs of the mono mix, quantized to int8, so a
+  track's waveform is a 2 * PEAK_BUCKETS byte blob.
+
+Results are stored per track in song_waveforms. A track whose audio
+cannot be decoded gets a row with an error and is not tried again. One
+whose audio could not be fetched (ffmpeg timeout, CDN or network error) is
+retried AUDIO_ANALYSIS_RETRY_SECONDS later, doubling with each attempt up
+to AUDIO_ANALYSIS_RETRY_MAX_SECONDS, until AUDIO_ANALYSIS_MAX_ATTEMPTS.
+A track that failed from its download URL is tried again once the mirror
+has stored a local copy. Recreating a song clears its rows.
+"""
+import base64
+from datetime import datetime, timedelta
+import os
+import subprocess
+import numpy as np
+from flask import current_app
+from app import db
+from app.mirror import storage_root
+from app.models import Song, SongWaveform
+
+SAMPLE_RATE = 22050
+CHANNELS = 2
+PEAK_BUCKETS = 200
+
+BLOCK_SECONDS = 0.4
+BLOCK_STEP_SECONDS = 0.1
+ABSOLUTE_GATE_LUFS = -70.0
+RELATIVE_GATE_LU = -10.0
+
+# ffmpeg errors about reading the source rather than decoding it
+FETCH_ERROR_MARKERS = (
+    'Server returned', 'HTTP error', 'Connection refused', 'Connection reset', 'Connection timed out',
+    'Failed to resolve', 'Network is unreachable', 'Input/output error', 'No such file or directory',
+)
+
+
+class AudioAnalysisError(Exception):
+    """The audio could not be decoded or analyzed; transient if it could not be fetched."""
+
+    def __init__(self, message, transient=False):
+        super().__init__(message)
+        self.transient = transient
+
+
+def decode_audio(source, timeout=120):
+    """Decode an audio file or URL into a (samples, CHANNELS) float32 array at SAMPLE_RATE."""
+    command = [
+        current_app.config['FFMPEG_BINARY'], '-nostdin', '-v', 'error', '-i', source,
+        '-f', 'f32le', '-ac', str(CHANNELS), '-ar', str(SAMPLE_RATE), '-',
+    ]
+    try:
+        result = subprocess.run(command, capture_output=True, timeout=timeout)
+    except (OSError, subprocess.TimeoutExpired) as e:
+        raise AudioAnalysisError(f'ffmpeg failed: {str(e)}', transient=True)
+
+    if result.returncode != 0:
+        stderr = result.stderr.decode('utf-8', 'replace').strip()
+        raise AudioAnalysisError(f'ffmpeg failed: {stderr[:300]}',
+                                 transient=any(marker in stderr for marker in FETCH_ERROR_MARKERS))
+
+    usable = len(result.stdout) - len(result.stdout) % (4 * CHANNELS)
+    samples = np.frombuffer(result.stdout[:usable], dtype='<f4').reshape(-1, CHANNELS)
+    if not len(samples):
+        raise AudioAnalysisError('No audio decoded')
+    return samples
+
+
+def _k_weighting_response(num_samples, sample_rate):
+    """Complex frequency response of the BS.1770 K-weighting filter at the rfft bins."""
+    # Pre-filter (high shelf) and RLB high-pass, as biquads for this sample rate
+    k = np.tan(np.pi * 1681.974450955533 / sample_rate)
+    q = 0.7071752369554196
+    vh = 10 ** (3.999843853973347 / 20)
+    vb = vh ** 0.4996667741545416
+    a0 = 1 + k / q + k * k
+    shelf_b = [(vh + vb * k / q + k * k) / a0, 2 * (k * k - vh) / a0, (vh - vb * k / q + k * k) / a0]
+    shelf_a = [1.0, 2 * (k * k - 1) / a0, (1 - k / q + k * k) / a0]
+
+    k = np.tan(np.pi * 38.13547087602444 / sample_rate)
+    q = 0.5003270373238773
+    a0 = 1 + k / q + k * k
+    highpass_b = [1.0, -2.0, 1.0]
+    highpass_a = [1.0, 2 * (k * k - 1) / a0, (1 - k / q + k * k) / a0]
+
+    z = np.exp(-1j * np.pi * np.arange(num_samples // 2 + 1) / (num_samples / 2))
+
+    def biquad(b, a):
+        return (b[0] + b[1] * z + b[2] * z * z) / (a[0] + a[1] * z + a[2] * z * z)
+
+    return biquad(shelf_b, shelf_a) * biquad(highpass_b, highpass_a)
+
+
+def integrated_loudness(samples, sample_rate=SAMPLE_RATE):
+    """Gated integrated loudness (LUFS) of a (samples, channels) array, or None if silent."""
+    num_samples = len(samples)
+    block = int(BLOCK_SECONDS * sample_rate)
+    step = int(BLOCK_STEP_SECONDS * sample_rate)
+    if num_samples < block:
+        return None
+
+    response = _k_weighting_response(num_samples, sample_rate)
+    weighted = np.fft.irfft(np.fft.rfft(samples, axis=0) * response[:, None], n=num_samples, axis=0)
+
+    # Mean square of every 400 ms block, summed over channels
+    energy = np.concatenate(([0.0], np.cumsum(np.square(weighted).sum(axis=1))))
+    starts = np.arange(0, num_samples - block + 1, step)
+    block_power = (energy[starts + block] - energy[starts]) / block
+
+    with np.errstate(divide='ignore'):
+        block_loudness = -0.691 + 10 * np.log10(block_power)
+
+    gated = block_power[block_loudness > ABSOLUTE_GATE_LUFS]
+    if not len(gated):
+        return None
+    relative_gate = -0.691 + 10 * np.log10(gated.mean()) + RELATIVE_GATE_LU
+    gated = block_power[block_loudness > max(relative_gate, ABSOLUTE_GATE_LUFS)]
+    return float(-0.691 + 10 * np.log10(gated.mean()))
+
+
+def waveform_peaks(samples, buckets=PEAK_BUCKETS):
+    """Interleaved int8 (min, max) pairs of the mono mix over `buckets` equal slices, as bytes."""
+    mono = samples.mean(axis=1)
+    buckets = min(buckets, len(mono))
+    edges = np.linspace(0, len(mono), buckets, endpoint=False).astype(np.int64)
+
+    peaks = np.empty(buckets * 2, dtype=np.float32)
+    peaks[0::2] = np.minimum.reduceat(mono, edges)
+    peaks[1::2] = np.maximum.reduceat(mono, edges)
+    return np.round(np.clip(peaks, -1.0, 1.0) * 127).astype(np.int8).tobytes()
+
+
+def analyze_samples(samples, sample_rate=SAMPLE_RATE):
+    """(duration_ms, loudness_lufs, peaks) of decoded audio."""
+    duration_ms = int(round(len(samples) * 1000 / sample_rate))
+    return duration_ms, integrated_loudness(samples, sample_rate), waveform_peaks(samples)
+
+
+def find_unanalyzed_tracks(limit, now=None):
+    """
+    (song, index, waveform) of completed tracks to analyze, newest first.
+
+    waveform is None for tracks never analyzed, else their error row that
+    is due for a retry or failed before the mirror stored a local copy.
+    """
+    now = now or datetime.utcnow()
+    tracks = []
+    for index in (1, 2):
+        url = getattr(Song, f'download_url_{index}')
+        path = getattr(Song, f'audio_path_{index}')
+        pending = db.or_(
+            SongWaveform.song_id.is_(None),
+            db.and_(SongWaveform.error.isnot(None), db.or_(
+                SongWaveform.retry_at <= now,
+                db.and_(db.not_(SongWaveform.local_source), path.isnot(None)),
+            )),
+        )
+        rows = (db.session.query(Song, SongWaveform)
+                .outerjoin(SongWaveform, db.and_(SongWaveform.song_id == Song.id,
+                                                 SongWaveform.audio_index == index))
+                .filter(Song.status == 'completed')
+                .filter(db.or_(url.isnot(None), path.isnot(None)))
+                .filter(pending)
+                .order_by(Song.id.desc())
+                .limit(limit))
+        tracks.extend((song, index, waveform) for song, waveform in rows)
+
+    tracks.sort(key=lambda track: track[0].id, reverse=True)
+    return tracks[:limit]
+
+
+def _record_failure(waveform, error, now):
+    """Store the error and schedule the next attempt, unless it is permanent or attempts ran out."""
+    config = current_app.config
+    waveform.duration_ms = waveform.loudness_lufs = waveform.peaks = None
+    waveform.error = str(error)[:500]
+    waveform.attempts += 1
+    if not error.transient or waveform.attempts >= config['AUDIO_ANALYSIS_MAX_ATTEMPTS']:
+        waveform.retry_at = None
+    else:
+        delay = min(config['AUDIO_ANALYSIS_RETRY_SECONDS'] * 2 ** (waveform.attempts - 1),
+                    config['AUDIO_ANALYSIS_RETRY_MAX_SECONDS'])
+        waveform.retry_at = now + timedelta(seconds=delay)
+
+
+def analyze_track(song, index, waveform=None, now=None):
+    """Decode and analyze one track into its SongWaveform row (a new, unsaved one if None)."""
+    now = now or datetime.utcnow()
+    if waveform is None:
+        waveform = SongWaveform(song_id=song.id, audio_index=index, attempts=0)
+    waveform.analyzed_at = now
+
+    rel_path = getattr(song, f'audio_path_{index}')
+    local_path = os.path.join(storage_root(), rel_path) if rel_path else None
+    source = local_path if local_path and os.path.isfile(local_path) else getattr(song, f'download_url_{index}')
+    # Also set when the mirrored file is missing, so the URL fallback is not retried every pass
+    waveform.local_source = rel_path is not None
+
+    try:
+        if not source:
+            raise AudioAnalysisError('No audio source available', transient=True)
+        waveform.duration_ms, waveform.loudness_lufs, waveform.peaks = analyze_samples(decode_audio(source))
+        waveform.error, waveform.attempts, waveform.retry_at = None, 0, None
+    except AudioAnalysisError as e:
+        _record_failure(waveform, e, now)
+    return waveform
+
+
+def analyze_completed_songs(limit=None):
+    """Analyze up to `limit` tracks. Returns a summary dict of analyzed and failed tracks."""
+    limit = limit or current_app.config['AUDIO_ANALYSIS_BATCH_SIZE']
+    summary = {'analyzed': 0, 'failed': 0}
+
+    for song, index, waveform in find_unanalyzed_tracks(limit):
+        waveform = analyze_track(song, index, waveform)
+        if waveform.error:
+            summary['failed'] += 1
+            retry = f"retry after {waveform.retry_at:%Y-%m-%d %H:%M}" if waveform.retry_at else 'not retrying'
+            current_app.logger.warning(
+                f"Audio analysis: song {song.id} file {index} (attempt {waveform.attempts}, {retry}): "
+                f"{waveform.error}"
+            )
+        else:
+            summary['analyzed'] += 1
+        db.session.add(waveform)
+
+        # Commit per track so a long batch does not hold a transaction open
+        try:
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            current_app.logger.error(f"Audio analysis: Database error: {str(e)}")
+            raise
+
+    current_app.logger.info(f"Audio analysis: {summary}")
+    return summary
+
+
+def clear_audio_analysis(song):
+    """Drop a song's analysis rows, e.g. when it is regenerated."""
+    SongWaveform.query.filter_by(song_id=song.id).delete(synchronize_session=False)
+
+
+def waveforms_for(song_ids):
+    """{song_id: {index: {...}}} of the analyzed tracks of the given songs, peaks base64-encoded."""
+    rows = SongWaveform.query.filter(SongWaveform.song_id.in_(song_ids), SongWaveform.error.is_(None))
+    result = {}
+    for row in rows:
+        result.setdefault(row.song_id, {})[row.audio_index] = {
+            'duration_ms': row.duration_ms,
+            'loudness_lufs': round(row.loudness_lufs, 1) if row.loudness_lufs is not None else None,
+            'peaks': base64.b64encode(row.peaks).decode('ascii'),
+        }
+    return result
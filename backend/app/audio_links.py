@@ -0,0 +1,30 @@
+"""
+Short-lived signed links to audio files.
+
+<audio> elements cannot send an Authorization header, and a JWT in the
+query string would end up in access logs, browser history and Referer
+headers for as long as the token lives. Audio endpoints instead accept a
+`?token=` that is signed with SECRET_KEY, names the one file it grants
+(e.g. song 12, file 1) and expires after AUDIO_LINK_EXPIRES_SECONDS.
+Authenticated clients get one from the matching link endpoint.
+"""
+from flask import current_app
+from itsdangerous import BadSignature, URLSafeTimedSerializer
+
+
+def _serializer(kind):
+    return URLSafeTimedSerializer(current_app.config['SECRET_KEY'], salt=f'audio-link:{kind}')
+
+
+def sign_audio_link(kind, target):
+    """Token granting access to the `kind` audio identified by target (a JSON-serializable value)."""
+    return _serializer(kind).dumps(target)
+
+
+def verify_audio_link(kind, token, target):
+    """True if token was signed for exactly this kind and target and has not expired."""
+    try:
+        signed = _serializer(kind).loads(token, max_age=current_app.config['AUDIO_LINK_EXPIRES_SECONDS'])
+    except BadSignature:
+        return False
+    return signed == target
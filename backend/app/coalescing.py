@@ -0,0 +1,120 @@
+"""
+Short-window coalescing of identical Suno submissions.
+
+Double-clicks and client retries can send the exact same payload to Suno
+several times. Each submission is keyed by a hash of the user and the
+payload: the first caller (the leader) claims the key and submits upstream;
+identical submissions by the same user that arrive within
+SUNO_COALESCE_SECONDS reuse its task id instead of paying for another
+generation. Once the task's result arrives the claim is dropped, so later
+identical requests start a new generation. A recreate is keyed on the song
+and the task it replaces as well, so it never reuses the song's previous
+generation and only a repeat of the same recreate coalesces.
+
+A duplicate that arrives while the leader is still waiting for Suno either
+waits for it (background submissions) or raises SubmissionInFlight at once,
+so request threads are not held; callers then queue the song (see
+app/generation_queue.py), which picks up the leader's task id once it is known.
+
+Claims are stored in the database so coalescing works across workers.
+"""
+from datetime import datetime, timedelta
+import hashlib
+import json
+import time
+from flask import current_app
+from sqlalchemy.exc import IntegrityError
+from app import db
+from app.models import SunoSubmission
+
+POLL_INTERVAL = 0.25
+
+
+class SubmissionInFlight(Exception):
+    """An identical submission is still waiting for its task id (claim_submission with wait=False)."""
+
+
+def payload_fingerprint(payload, user_id, scope=None):
+    """Stable hash of a provider payload submitted on behalf of user_id, within an optional scope."""
+    key = {'user_id': user_id, 'payload': payload}
+    if scope is not None:
+        key['scope'] = scope
+    encoded = json.dumps(key, sort_keys=True, separators=(',', ':')).encode('utf-8')
+    return hashlib.sha256(encoded).hexdigest()
+
+
+def claim_submission(payload_hash, wait=True):
+    """
+    Claim a payload hash or join an identical recent submission.
+
+    Returns None when the caller is the leader and must submit upstream,
+    otherwise the task id of the identical submission. If the leader has
+    no task id yet, raises SubmissionInFlight when wait is false, or waits
+    and raises if it is still running after SUNO_COALESCE_WAIT_SECONDS.
+    """
+    table = SunoSubmission.__table__
+    window = timedelta(seconds=current_app.config['SUNO_COALESCE_SECONDS'])
+    deadline = time.monotonic() + current_app.config['SUNO_COALESCE_WAIT_SECONDS']
+
+    while True:
+        with db.engine.begin() as connection:
+            existing = connection.execute(
+                table.select().where(table.c.payload_hash == payload_hash)
+            ).mappings().first()
+
+            if existing and existing['created_at'] < datetime.utcnow() - window:
+                # Outside the window: identical payloads are new generations
+                connection.execute(table.delete().where(table.c.payload_hash == payload_hash))
+                existing = None
+
+            if existing is None:
+                try:
+                    connection.execute(table.insert().values(
+                        payload_hash=payload_hash, created_at=datetime.utcnow()
+                    ))
+                    return None
+                except IntegrityError:
+                    # Another worker claimed it first; fall through and wait
+                    pass
+            elif existing['task_id']:
+                current_app.logger.info(f"Coalesced Suno submission onto task {existing['task_id']}")
+                return existing['task_id']
+
+        if not wait:
+            raise SubmissionInFlight('An identical song submission is in progress')
+        if time.monotonic() >= deadline:
+            raise Exception('An identical song submission is still in progress. Please try again in a moment.')
+        time.sleep(POLL_INTERVAL)
+
+
+def complete_submission(payload_hash, task_id):
+    """Publish the leader's task id to waiting and later identical submissions."""
+    table = SunoSubmission.__table__
+    with db.engine.begin() as connection:
+        connection.execute(
+            table.update().where(table.c.payload_hash == payload_hash).values(task_id=task_id)
+        )
+
+
+def release_submission(payload_hash):
+    """Drop a failed leader's claim so waiting submissions can retry."""
+    table = SunoSubmission.__table__
+    with db.engine.begin() as connection:
+        connection.execute(table.delete().where(
+            table.c.payload_hash == payload_hash, table.c.task_id.is_(None)
+        ))
+
+
+def finish_task(task_id):
+    """Stop coalescing onto a task once its result has arrived."""
+    table = SunoSubmission.__table__
+    with db.engine.begin() as connection:
+        connection.execute(table.delete().where(table.c.task_id == task_id))
+
+
+def prune_submissions():
+    """Delete claims older than the coalescing window. Returns the number removed."""
+    cutoff = datetime.utcnow() - timedelta(seconds=current_app.config['SUNO_COALESCE_SECONDS'])
+    removed = SunoSubmission.query.filter(SunoSubmission.created_at < cutoff).delete(synchronize_session=False)
+    db.session.commit()
+    return removed
@@ -0,0 +1,189 @@
+import time
+import click
+from flask import current_app
+
+
+def _run_periodically(label, fn, interval):
+    """
+    Call fn once, or every `interval` seconds when interval is set.
+
+    A failed pass is logged as "<label> failed"; it ends a single run with
+    the error but not a repeating one.
+    """
+    while True:
+        try:
+            fn()
+        except Exception as e:
+            current_app.logger.error(f"{label} failed: {str(e)}")
+            if not interval:
+                raise
+
+        if not interval:
+            break
+        time.sleep(interval)
+
+
+def register_commands(app):
+    """Register management CLI commands (run with `flask <command>`)."""
+
+    @app.cli.command('reconcile-songs')
+    @click.option('--stale-minutes', type=int, default=None,
+                  help='Only check songs submitted and untouched for this many minutes.')
+    @click.option('--batch-size', type=int, default=None,
+                  help='Number of songs to query per provider batch.')
+    @click.option('--interval', type=int, default=0,
+                  help='Repeat every N seconds (0 runs a single pass).')
+    def reconcile_songs(stale_minutes, batch_size, interval):
+        """Resolve songs stuck in 'submitted' by polling the provider."""
+        from app.reconciler import reconcile_submitted_songs
+
+        def run():
+            summary = reconcile_submitted_songs(stale_minutes=stale_minutes, batch_size=batch_size)
+            click.echo(f"Reconciled: {summary}")
+
+        _run_periodically('Reconciler pass', run, interval)
+
+    @app.cli.command('mirror-audio')
+    @click.option('--limit', type=int, default=None,
+                  help='Maximum number of songs to mirror per pass.')
+    @click.option('--workers', type=int, default=None,
+                  help='Number of concurrent downloads.')
+    @click.option('--interval', type=int, default=0,
+                  help='Repeat every N seconds (0 runs a single pass).')
+    def mirror_audio(limit, workers, interval):
+        """Download completed songs' audio into local storage."""
+        from app.mirror import mirror_completed_songs
+
+        def run():
+            summary = mirror_completed_songs(limit=limit, workers=workers)
+            click.echo(f"Mirrored: {summary}")
+
+        _run_periodically('Audio mirror pass', run, interval)
+
+    @app.cli.command('analyze-audio')
+    @click.option('--limit', type=int, default=None,
+                  help='Maximum number of audio files to analyze per pass.')
+    @click.option('--interval', type=int, default=0,
+                  help='Repeat every N seconds (0 runs a single pass).')
+    def analyze_audio(limit, interval):
+        """Compute duration, loudness and waveform peaks of completed songs' audio."""
+        from app.audio_analysis import analyze_completed_songs
+
+        def run():
+            summary = analyze_completed_songs(limit=limit)
+            click.echo(f"Analyzed: {summary}")
+
+        _run_periodically('Audio analysis pass', run, interval)
+
+    @app.cli.command('archive-songs')
+    @click.option('--older-than-days', type=int, default=None,
+                  help='Archive completed/failed songs created more than this many days ago.')
+    @click.option('--batch-size', type=int, default=None,
+                  help='Songs moved per transaction.')
+    @click.option('--max-batches', type=int, default=None,
+                  help='Stop after this many batches per pass (default: until done).')
+    @click.option('--interval', type=int, default=0,
+                  help='Repeat every N seconds, e.g. 86400 for a nightly run (0 runs a single pass).')
+    def archive_songs_command(older_than_days, batch_size, max_batches, interval):
+        """Move old finished songs into the songs_archive table."""
+        from app.archival import archive_songs
+
+        def run():
+            summary = archive_songs(older_than_days=older_than_days, batch_size=batch_size,
+                                    max_batches=max_batches)
+            click.echo(f"Archived: {summary}")
+
+        _run_periodically('Archival pass', run, interval)
+
+    @app.cli.command('prune-tombstones')
+    def prune_tombstones():
+        """Delete expired song tombstones, idempotency keys, submission claims and speech jobs."""
+        from datetime import datetime, timedelta
+        from app import db
+        from app.models import SongDeletion
+        from app.idempotency import prune_expired_keys
+        from app.coalescing import prune_submissions
+        from app.speech_jobs import prune_speech_jobs
+
+        cutoff = datetime.utcnow() - timedelta(days=current_app.config['SYNC_TOMBSTONE_RETENTION_DAYS'])
+        deleted = SongDeletion.query.filter(SongDeletion.deleted_at < cutoff).delete(synchronize_session=False)
+        db.session.commit()
+        click.echo(f"Pruned {deleted} tombstones")
+        click.echo(f"Pruned {prune_expired_keys()} idempotency keys")
+        click.echo(f"Pruned {prune_submissions()} submission claims")
+        click.echo(f"Pruned {prune_speech_jobs()} speech jobs")
+
+    @app.cli.command('rebuild-analytics')
+    @click.option('--interval', type=int, default=0,
+                  help='Repeat every N seconds, e.g. 86400 for a nightly rebuild (0 runs once).')
+    def rebuild_analytics(interval):
+        """Recompute the song_rollups analytics table from songs and songs_archive."""
+        from app.analytics import rebuild_rollups
+
+        def run():
+            click.echo(f"Rebuilt analytics rollups: {rebuild_rollups()} rows")
+
+        _run_periodically('Analytics rebuild', run, interval)
+
+    @app.cli.command('rebuild-lyrics-index')
+    @click.option('--batch-size', type=int, default=500, help='Songs per transaction.')
+    def rebuild_lyrics_index_command(batch_size):
+        """Recompute lyrics MinHash signatures and LSH buckets for every song."""
+        from app.lyrics_similarity import rebuild_lyrics_index
+
+        click.echo(f"Indexed lyrics of {rebuild_lyrics_index(batch_size)} songs")
+
+    @app.cli.command('benchmark-song-reads')
+    @click.option('--limit', type=int, default=5000, help='Songs per run.')
+    @click.option('--repeat', type=int, default=3, help='Runs per path (best is reported).')
+    def benchmark_song_reads_command(limit, repeat):
+        """Compare CPU per row and peak memory of the ORM and Core song list paths."""
+        from app.read_benchmark import benchmark_song_reads
+
+        results = benchmark_song_reads(limit=limit, repeat=repeat)
+        for name, (rows, cpu_per_row, peak) in results.items():
+            click.echo(f"{name:<5} {rows} rows  {cpu_per_row * 1e6:8.1f} us/row  peak {peak / 1024:8.0f} KiB")
+
+        orm_cpu, core_cpu = results['orm'][1], results['core'][1]
+        if core_cpu:
+            click.echo(f"Core path uses {orm_cpu / core_cpu:.1f}x less CPU per row "
+                       f"and {results['orm'][2] / max(results['core'][2], 1):.1f}x less peak memory")
+
+    @app.cli.command('migrate')
+    @click.option('--target', type=int, default=None, help='Stop after this migration version.')
+    @click.option('--dry-run', is_flag=True, help='Show how each pending statement would run.')
+    @click.option('--allow-blocking', is_flag=True,
+                  help='Allow DDL that copies the table and blocks writes (maintenance windows).')
+    @click.option('--baseline', type=int, default=None,
+                  help='First mark migrations up to this version as applied without running them.')
+    def migrate_command(target, dry_run, allow_blocking, baseline):
+        """Apply pending database/migrations files with online DDL and batched backfills."""
+        from app.migration_runner import MigrationError, migrate
+
+        try:
+            applied = migrate(target=target, dry_run=dry_run, allow_blocking=allow_blocking,
+                              baseline=baseline, echo=click.echo)
+        except MigrationError as e:
+            raise click.ClickException(str(e))
+        if not dry_run:
+            click.echo(f"Applied {len(applied)} migrations")
+
+    @app.cli.command('migration-status')
+    def migration_status_command():
+        """List migration files and whether each is applied."""
+        from app.migration_runner import migration_status
+
+        for version, name, state in migration_status():
+            click.echo(f"{version:03d} {name:<40} {state}")
+
+    @app.cli.command('check-query-plans')
+    def check_query_plans_command():
+        """EXPLAIN the hot song queries and fail if an index regresses."""
+        from app.query_plans import check_query_plans
+
+        results = check_query_plans()
+        for name, ok, detail in results:
+            click.echo(f"{'OK  ' if ok else 'FAIL'} {name}: {detail}")
+
+        if not all(ok for _, ok, _ in results):
+            raise SystemExit(1)
@@ -0,0 +1,133 @@
+"""
+Database connection pool sizing and instrumentation.
+
+Every gunicorn worker has its own pool, so the web tier can open up to
+workers x (pool_size + max_overflow) connections. Instead of a fixed size
+per process, the pool is derived from DB_CONNECTION_BUDGET (the share of
+MySQL's max_connections reserved for the web tier) divided by the worker
+count. The steady pool covers the request threads plus the background job
+threads; whatever is left of the worker's share becomes overflow.
+Processes outside gunicorn (the reconciler, mirror, analyzer and archival
+loops, `flask migrate`) do a single thread of database work and get a
+fixed DB_BACKGROUND_POOL_SIZE pool instead of the whole budget.
+
+Checkout waits, timeouts and overflow use are exported at /metrics. When a
+checkout waits longer than DB_POOL_STARVATION_SECONDS a warning is logged
+(at most once a minute per process): the workers are starved for
+connections and the budget or thread count needs another look.
+"""
+import logging
+import threading
+import time
+from sqlalchemy import exc
+from sqlalchemy.pool import QueuePool
+from app import metrics
+
+logger = logging.getLogger(__name__)
+
+# Log at most one starvation warning per process in this many seconds
+STARVATION_WARNING_INTERVAL = 60
+
+_checkout_wait = metrics.summary('db_pool_checkout_wait_seconds', 'Time spent waiting to check out a connection')
+_slow_checkouts = metrics.counter('db_pool_slow_checkouts_total', 'Checkouts that waited longer than DB_POOL_STARVATION_SECONDS')
+_checkout_timeouts = metrics.counter('db_pool_checkout_timeouts_total', 'Checkouts that gave up after pool_timeout')
+
+_engines = {}
+_engines_lock = threading.Lock()
+_state = {'starvation_seconds': 0.5, 'last_warning': 0.0}
+
+
+def sized_engine_options(config):
+    """
+    SQLALCHEMY_ENGINE_OPTIONS with the pool sized from the connection budget.
+
+    SQLite (tests, local tools) is left unsized: its pools do not take
+    these arguments. Raises ValueError when the budget cannot give every
+    worker at least one connection.
+    """
+    options = dict(config.get('SQLALCHEMY_ENGINE_OPTIONS') or {})
+    if config['SQLALCHEMY_DATABASE_URI'].startswith('sqlite'):
+        for key in ('poolclass', 'pool_size', 'max_overflow', 'pool_timeout'):
+            options.pop(key, None)
+        return options
+
+    if config['DB_POOL_ROLE'] != 'web':
+        options.update(
+            poolclass=InstrumentedQueuePool,
+            pool_size=config['DB_BACKGROUND_POOL_SIZE'],
+            max_overflow=0,
+            pool_timeout=config['DB_POOL_TIMEOUT'],
+        )
+        return options
+
+    budget = config['DB_CONNECTION_BUDGET']
+    workers = max(1, config['GUNICORN_WORKERS'])
+    if budget < workers:
+        raise ValueError(f"DB_CONNECTION_BUDGET ({budget}) is below GUNICORN_WORKERS ({workers}): "
+                         f"every worker needs at least one connection")
+    per_worker = budget // workers
+    # Request threads, the speech job pool and the generation queue thread
+    wanted = config['GUNICORN_THREADS'] + config['SPEECH_JOB_WORKERS'] + 1
+    pool_size = min(wanted, per_worker)
+
+    options.update(
+        poolclass=InstrumentedQueuePool,
+        pool_size=pool_size,
+        max_overflow=per_worker - pool_size,
+        pool_timeout=config['DB_POOL_TIMEOUT'],
+    )
+    return options
+
+
+def _warn_starved(pool, waited):
+    now = time.monotonic()
+    if now - _state['last_warning'] < STARVATION_WARNING_INTERVAL:
+        return
+    _state['last_warning'] = now
+    logger.warning(f"Database pool starved: waited {waited:.2f}s for a connection ({pool.status()}). "
+                   f"Raise DB_CONNECTION_BUDGET or lower GUNICORN_THREADS/GUNICORN_WORKERS.")
+
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool that records how long each checkout waited for a connection."""
+
+    def _do_get(self):
+        started = time.monotonic()
+        try:
+            connection = super()._do_get()
+        except exc.TimeoutError:
+            _checkout_timeouts.inc()
+            logger.error(f"Database pool exhausted, checkout timed out ({self.status()})")
+            raise
+
+        waited = time.monotonic() - started
+        _checkout_wait.observe(waited)
+        if waited >= _state['starvation_seconds']:
+            _slow_checkouts.inc()
+            _warn_starved(self, waited)
+        return connection
+
+
+def _pool_collector(attribute):
+    """Gauge callback reading a QueuePool attribute from every registered engine."""
+    def collect():
+        with _engines_lock:
+            engines = list(_engines.items())
+        # engine.pool is replaced on dispose(), so look it up at scrape time
+        return [({'bind': name}, getattr(engine.pool, attribute)())
+                for name, engine in engines if isinstance(engine.pool, QueuePool)]
+    return collect
+
+
+metrics.gauge('db_pool_size', 'Steady connections per pool', _pool_collector('size'))
+metrics.gauge('db_pool_checked_out', 'Connections currently checked out', _pool_collector('checkedout'))
+metrics.gauge('db_pool_overflow', 'Connections open beyond pool_size (negative until the pool has filled)',
+              _pool_collector('overflow'))
+
+
+def instrument_engines(app, engines):
+    """Export pool metrics for the app's engines (a {bind_key: Engine} mapping)."""
+    _state['starvation_seconds'] = app.config['DB_POOL_STARVATION_SECONDS']
+    with _engines_lock:
+        for key, engine in engines.items():
+            _engines[key or 'default'] = engine
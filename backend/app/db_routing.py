@@ -0,0 +1,104 @@
+"""
+Read/write splitting between the primary database and an optional replica.
+
+When a `replica` bind is configured (DB_REPLICA_HOST), GET endpoints marked
+with @read_replica run their SELECTs against it. Everything else - writes,
+flushes and any route not explicitly marked - stays on the primary. Reads
+also fall back to the primary while the replica lags behind by more than
+REPLICA_MAX_LAG_SECONDS or its lag cannot be determined.
+
+Streamed responses (GET /songs/export) run their queries after the view
+has returned, so for those the flag is held until the body is exhausted
+or closed.
+"""
+from functools import wraps
+import time
+from flask import current_app, g, has_app_context
+from flask_sqlalchemy.session import Session
+from werkzeug.wrappers import Response
+
+REPLICA_BIND = 'replica'
+
+# Per-process cache of the last replica lag check
+_lag_state = {'checked_at': 0.0, 'healthy': False}
+
+
+def read_replica(fn):
+    """Route the decorated view's reads to the replica when it is healthy."""
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        previous = g.get('use_read_replica', False)
+        g.use_read_replica = True
+        try:
+            response = fn(*args, **kwargs)
+        finally:
+            g.use_read_replica = previous
+
+        if isinstance(response, Response) and response.is_streamed:
+            # The body runs outside this call, in the request context that
+            # stream_with_context pushes again; that context shares this g
+            response.response = _stream_on_replica(response.response, g._get_current_object())
+        return response
+    return wrapper
+
+
+def _stream_on_replica(body, app_globals):
+    """Yield from a streamed body with reads routed to the replica."""
+    previous = app_globals.get('use_read_replica', False)
+    app_globals.use_read_replica = True
+    try:
+        yield from body
+    finally:
+        app_globals.use_read_replica = previous
+
+
+def _replica_lag_seconds(engine):
+    """Return the replica's lag in seconds, 0 if it is not replicating."""
+    with engine.connect() as connection:
+        for statement, column in (('SHOW REPLICA STATUS', 'Seconds_Behind_Source'),
+                                  ('SHOW SLAVE STATUS', 'Seconds_Behind_Master')):
+            try:
+                row = connection.exec_driver_sql(statement).mappings().first()
+            except Exception:
+                continue
+            if row is None:
+                return 0
+            return row.get(column)
+    return None
+
+
+def replica_is_healthy(engine):
+    """Cached check that the replica is within the allowed lag."""
+    interval = current_app.config['REPLICA_LAG_CHECK_INTERVAL']
+    now = time.monotonic()
+
+    if now - _lag_state['checked_at'] >= interval:
+        try:
+            lag = _replica_lag_seconds(engine)
+            healthy = lag is not None and lag <= current_app.config['REPLICA_MAX_LAG_SECONDS']
+            if not healthy:
+                current_app.logger.warning(f"Read replica lag is {lag if lag is not None else 'unknown'}s, routing reads to primary")
+        except Exception as e:
+            current_app.logger.warning(f"Read replica unavailable, routing reads to primary: {str(e)}")
+            healthy = False
+        _lag_state.update(checked_at=now, healthy=healthy)
+
+    return _lag_state['healthy']
+
+
+class RoutingSession(Session):
+    """Session that sends reads from @read_replica views to the replica bind."""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if (
+            bind is None
+            and not self._flushing
+            and not self.new and not self.dirty and not self.deleted
+            and has_app_context()
+            and g.get('use_read_replica')
+        ):
+            engine = self._db.engines.get(REPLICA_BIND)
+            if engine is not None and replica_is_healthy(engine):
+                return engine
+
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
@@ -0,0 +1,54 @@
+"""
+Background submission of queued songs to Suno.
+
+Imports can queue hundreds of songs for generation; submitting them inside
+the request would hold it open for minutes and trip Suno's rate limit. Each
+song is queued instead as a 'bulk' job on the submission scheduler (see
+app/submission_scheduler.py), which interleaves different users' imports
+and keeps interactive creates ahead of them. A granted bulk job submits its
+song and then holds the slot for IMPORT_SUBMIT_INTERVAL_SECONDS, spacing
+bulk submissions apart. Creates and recreates that duplicate a submission
+still in flight are queued at their own 'interactive'/'recreate' priority
+and are not spaced. Songs that are no longer in 'create' status when their
+turn comes are skipped.
+
+The queue lives in memory: songs still waiting when a worker restarts stay
+in 'create' and can be submitted again from the UI.
+"""
+from functools import partial
+import time
+from flask import current_app
+from app import db
+from app.models import Song
+from app.submission_scheduler import get_scheduler
+
+
+def _submit_song(app, song_id, priority):
+    """Submit one queued song, in its own app context."""
+    from app.routes.songs import _submit_to_suno
+
+    with app.app_context():
+        try:
+            song = db.session.get(Song, song_id)
+            if song is None or song.status != 'create':
+                return
+
+            try:
+                _submit_to_suno(song, recreate=priority == 'recreate')
+            except Exception as e:
+                db.session.rollback()
+                app.logger.error(f"Generation queue: failed to submit song {song_id}: {str(e)}")
+
+            if priority == 'bulk':
+                time.sleep(app.config['IMPORT_SUBMIT_INTERVAL_SECONDS'])
+        finally:
+            db.session.remove()
+
+
+def queue_for_generation(song_ids, user_id, priority='bulk'):
+    """Queue a user's songs (already committed in 'create' status) for submission at priority."""
+    if song_ids:
+        app = current_app._get_current_object()
+        scheduler = get_scheduler()
+        for song_id in song_ids:
+            scheduler.submit(priority, user_id, partial(_submit_song, app, song_id, priority))
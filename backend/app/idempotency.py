@@ -0,0 +1,126 @@
+"""
+Idempotency-Key support for endpoints that trigger paid generations.
+
+A client may send `Idempotency-Key: <unique value>` with a request. The
+first request with a given key runs normally and its response is stored;
+retries with the same key replay that response instead of running again.
+A retry that arrives while the first request is still running gets a 409.
+Server errors (5xx) are not stored, so the client can retry them.
+"""
+from datetime import datetime, timedelta
+from functools import wraps
+import hashlib
+from flask import current_app, jsonify, make_response, request
+from flask_jwt_extended import get_jwt_identity
+from sqlalchemy.exc import IntegrityError
+from app import db
+from app.models import IdempotencyKey
+
+HEADER = 'Idempotency-Key'
+
+
+def _request_fingerprint():
+    """Hash of the request path and body, to detect key reuse with a different request."""
+    digest = hashlib.sha256(request.path.encode('utf-8'))
+    digest.update(request.get_data() or b'')
+    return digest.hexdigest()
+
+
+def _claim_key(user_id, key, endpoint, request_hash):
+    """
+    Insert the in-flight record for a key, or return the existing one.
+
+    Uses its own connection so the claim is visible to other workers
+    immediately, independent of the request's session.
+    """
+    table = IdempotencyKey.__table__
+    ttl = timedelta(hours=current_app.config['IDEMPOTENCY_KEY_TTL_HOURS'])
+
+    with db.engine.begin() as connection:
+        try:
+            connection.execute(table.insert().values(
+                user_id=user_id, idem_key=key, endpoint=endpoint,
+                request_hash=request_hash, created_at=datetime.utcnow()
+            ))
+            return None
+        except IntegrityError:
+            pass
+
+    with db.engine.begin() as connection:
+        existing = connection.execute(
+            table.select().where(table.c.user_id == user_id, table.c.idem_key == key)
+        ).mappings().first()
+
+        # Expired keys are released and claimed afresh
+        if existing and existing['created_at'] < datetime.utcnow() - ttl:
+            connection.execute(table.delete().where(table.c.id == existing['id']))
+            connection.execute(table.insert().values(
+                user_id=user_id, idem_key=key, endpoint=endpoint,
+                request_hash=request_hash, created_at=datetime.utcnow()
+            ))
+            return None
+
+    return existing
+
+
+def _finish_key(user_id, key, response):
+    """Store the final response for a key, or release it after a server error."""
+    table = IdempotencyKey.__table__
+    condition = db.and_(table.c.user_id == user_id, table.c.idem_key == key)
+
+    with db.engine.begin() as connection:
+        if response.status_code >= 500:
+            connection.execute(table.delete().where(condition))
+        else:
+            connection.execute(table.update().where(condition).values(
+                status_code=response.status_code,
+                response_body=response.get_data(as_text=True)
+            ))
+
+
+def idempotent(endpoint):
+    """Make a JWT-protected view honour the Idempotency-Key header."""
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            key = request.headers.get(HEADER)
+            if not key:
+                return fn(*args, **kwargs)
+
+            if len(key) > 255:
+                return jsonify({'error': f'{HEADER} must be at most 255 characters'}), 400
+
+            user_id = get_jwt_identity()
+            request_hash = _request_fingerprint()
+            existing = _claim_key(user_id, key, endpoint, request_hash)
+
+            if existing is not None:
+                if existing['request_hash'] != request_hash or existing['endpoint'] != endpoint:
+                    return jsonify({'error': f'{HEADER} was already used for a different request'}), 422
+                if existing['status_code'] is None:
+                    return jsonify({'error': 'A request with this Idempotency-Key is still in progress'}), 409
+
+                replay = make_response(existing['response_body'], existing['status_code'])
+                replay.mimetype = 'application/json'
+                replay.headers['Idempotent-Replayed'] = 'true'
+                return replay
+
+            try:
+                response = make_response(fn(*args, **kwargs))
+            except Exception:
+                _finish_key(user_id, key, make_response('', 500))
+                raise
+
+            _finish_key(user_id, key, response)
+            return response
+        return wrapper
+    return decorator
+
+
+def prune_expired_keys():
+    """Delete stored keys older than the TTL. Returns the number removed."""
+    cutoff = datetime.utcnow() - timedelta(hours=current_app.config['IDEMPOTENCY_KEY_TTL_HOURS'])
+    removed = IdempotencyKey.query.filter(IdempotencyKey.created_at < cutoff).delete(synchronize_session=False)
+    db.session.commit()
+    return removed
+
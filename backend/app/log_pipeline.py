@@ -0,0 +1,179 @@
+"""
+Non-blocking, structured logging for the app's loggers.
+
+Request threads only do the cheap part of logging: level and sampling
+checks, rendering the message (truncated to LOG_MAX_MESSAGE_LENGTH) and
+tagging it with the request id. The record is then put on a bounded
+in-memory queue; a listener thread formats it as one JSON object per line
+and writes it to stderr, which gunicorn (capture_output) sends to its
+errorlog. When the queue is full records are dropped and
+counted rather than blocking the request.
+
+LOG_SAMPLE_RATES keeps only a fraction of the below-WARNING records from
+chatty loggers, e.g. "app.routes.webhooks=0.1". Warnings and errors are
+never sampled.
+
+gunicorn forks workers after the app is preloaded, and threads do not
+survive a fork, so each child process starts its own queue and listener.
+"""
+import atexit
+from datetime import datetime, timezone
+import json
+import logging
+from logging.handlers import QueueHandler, QueueListener
+import os
+import queue
+import random
+import re
+import sys
+import traceback
+import uuid
+from flask import g, has_request_context, request
+from flask.logging import default_handler
+from app import metrics
+
+REQUEST_ID_HEADER = 'X-Request-ID'
+# Client-supplied ids are echoed into every record and the response header
+REQUEST_ID_PATTERN = re.compile(r'[A-Za-z0-9-]{1,64}')
+
+_dropped = metrics.counter('log_records_dropped_total', 'Log records dropped because the log queue was full')
+_pipeline = {'handler': None, 'listener': None, 'queue_size': 10000}
+
+
+def parse_sample_rates(value):
+    """Parse "logger=rate,logger=rate" into a dict."""
+    rates = {}
+    for item in (value or '').split(','):
+        if '=' not in item:
+            continue
+        name, rate = item.split('=', 1)
+        rates[name.strip()] = min(max(float(rate), 0.0), 1.0)
+    return rates
+
+
+class SamplingFilter(logging.Filter):
+    """Keep a fraction of below-WARNING records per logger (longest prefix wins)."""
+
+    def __init__(self, rates):
+        super().__init__()
+        self.rates = sorted(rates.items(), key=lambda item: len(item[0]), reverse=True)
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING or not self.rates:
+            return True
+        for name, rate in self.rates:
+            if record.name == name or record.name.startswith(name + '.'):
+                return rate >= 1.0 or random.random() < rate
+        return True
+
+
+class AsyncQueueHandler(QueueHandler):
+    """QueueHandler that never blocks and prepares records cheaply."""
+
+    def __init__(self, log_queue, max_message_length):
+        super().__init__(log_queue)
+        self.max_message_length = max_message_length
+
+    def prepare(self, record):
+        message = record.getMessage()
+        if len(message) > self.max_message_length:
+            message = f"{message[:self.max_message_length]}... [truncated {len(message) - self.max_message_length} chars]"
+
+        # Traceback objects cannot be formatted later on another thread safely
+        if record.exc_info:
+            record.exc_text = ''.join(traceback.format_exception(*record.exc_info))
+            record.exc_info = None
+
+        record.msg = message
+        record.args = None
+        record.request_id = g.get('request_id') if has_request_context() else None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            _dropped.inc(logger=record.name)
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record."""
+
+    def format(self, record):
+        data = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.msg,
+            'pid': record.process,
+            'thread': record.threadName,
+        }
+        if getattr(record, 'request_id', None):
+            data['request_id'] = record.request_id
+        if record.exc_text:
+            data['exception'] = record.exc_text
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+def _start_listener():
+    """Give the handler a fresh queue and listener thread (at setup and after fork)."""
+    log_queue = queue.Queue(maxsize=_pipeline['queue_size'])
+    output = logging.StreamHandler(sys.stderr)
+    output.setFormatter(JsonFormatter())
+
+    _pipeline['handler'].queue = log_queue
+    listener = QueueListener(log_queue, output)
+    listener.start()
+    _pipeline['listener'] = listener
+
+
+def _restart_after_fork():
+    if _pipeline['handler'] is not None:
+        _start_listener()
+
+
+def _flush_at_exit():
+    if _pipeline['listener'] is not None:
+        _pipeline['listener'].stop()
+
+
+os.register_at_fork(after_in_child=_restart_after_fork)
+atexit.register(_flush_at_exit)
+
+
+def init_request_ids(app):
+    """Tag each request with an id (the proxy's X-Request-ID if it is well-formed, else a new one)."""
+    @app.before_request
+    def assign_request_id():
+        request_id = request.headers.get(REQUEST_ID_HEADER, '')
+        g.request_id = request_id if REQUEST_ID_PATTERN.fullmatch(request_id) else uuid.uuid4().hex
+
+    @app.after_request
+    def echo_request_id(response):
+        if g.get('request_id'):
+            response.headers[REQUEST_ID_HEADER] = g.request_id
+        return response
+
+
+def configure_logging(app):
+    """Route the app's loggers through the async JSON pipeline."""
+    init_request_ids(app)
+
+    if not app.config['LOG_ASYNC']:
+        return
+
+    logger = app.logger
+    logger.setLevel(app.config['LOG_LEVEL'])
+    logger.removeHandler(default_handler)
+
+    # Several apps in one process (tests, CLI) share the 'app' logger
+    if _pipeline['handler'] is not None:
+        logger.removeHandler(_pipeline['handler'])
+        _pipeline['listener'].stop()
+
+    handler = AsyncQueueHandler(None, app.config['LOG_MAX_MESSAGE_LENGTH'])
+    handler.addFilter(SamplingFilter(parse_sample_rates(app.config['LOG_SAMPLE_RATES'])))
+    _pipeline.update(handler=handler, queue_size=app.config['LOG_QUEUE_SIZE'])
+    _start_listener()
+
+    logger.addHandler(handler)
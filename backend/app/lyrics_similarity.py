@@ -0,0 +1,205 @@
+"""
+Near-duplicate lyrics detection with MinHash and locality-sensitive hashing.
+
+Each song's lyrics are reduced to a set of word 3-grams (section tags like
+[Chorus] and punctuation removed) and summarized by a MinHash signature of
+NUM_PERMUTATIONS 32-bit values, stored on song_texts.lyrics_minhash. The
+fraction of equal positions in two signatures estimates the Jaccard
+similarity of the two 3-gram sets.
+
+The signature is split into NUM_BANDS bands of ROWS_PER_BAND values, and
+each band is hashed into a song_lsh_buckets row. Songs sharing any bucket
+are candidates; with 16 x 8 bands, pairs above ~0.7 similarity almost
+always share one and pairs below ~0.4 rarely do. A lookup is one indexed
+query on the buckets plus a comparison against a bounded number of
+candidate signatures, independent of the number of songs.
+
+Signatures and buckets are maintained by flush hooks whenever lyrics are
+written through the ORM; song imports insert them with Core statements
+(insert_buckets) and `flask rebuild-lyrics-index` backfills them.
+"""
+from hashlib import blake2b
+import re
+import numpy as np
+from flask import current_app
+from sqlalchemy import event, inspect
+from app import db
+from app.db_routing import RoutingSession
+from app.models import Song, SongLshBucket, SongText
+
+NUM_BANDS = 16
+ROWS_PER_BAND = 8
+NUM_PERMUTATIONS = NUM_BANDS * ROWS_PER_BAND
+SHINGLE_SIZE = 3
+
+_SECTION_TAG = re.compile(r'\[[^\]]*\]')
+_WORD = re.compile(r"[\w']+")
+
+
+def _seeded_uint64(label):
+    return int.from_bytes(blake2b(label.encode(), digest_size=8).digest(), 'little')
+
+
+# Multiply-shift hash family; derived from fixed labels so signatures stay
+# comparable across processes, releases and numpy versions
+_MULTIPLIERS = np.array([_seeded_uint64(f'minhash-a-{i}') | 1 for i in range(NUM_PERMUTATIONS)], dtype=np.uint64)
+_OFFSETS = np.array([_seeded_uint64(f'minhash-b-{i}') for i in range(NUM_PERMUTATIONS)], dtype=np.uint64)
+
+
+def shingles(lyrics):
+    """The set of normalized word 3-grams in the lyrics."""
+    words = _WORD.findall(_SECTION_TAG.sub(' ', lyrics or '').lower())
+    if len(words) < SHINGLE_SIZE:
+        return {' '.join(words)} if words else set()
+    return {' '.join(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)}
+
+
+def lyrics_signature(lyrics):
+    """MinHash signature of the lyrics as bytes, or None if there are no words."""
+    grams = shingles(lyrics)
+    if not grams:
+        return None
+
+    hashes = np.array([_seeded_uint64(gram) for gram in grams], dtype=np.uint64)
+    # (a * x + b) mod 2^64, keeping the high 32 bits, for every hash function at once
+    permuted = (hashes[:, None] * _MULTIPLIERS + _OFFSETS) >> np.uint64(32)
+    return permuted.min(axis=0).astype('<u4').tobytes()
+
+
+def _unpack(signature):
+    return np.frombuffer(signature, dtype='<u4')
+
+
+def band_buckets(signature):
+    """[(band, bucket)] for a signature; bucket is a signed 64-bit hash of the band's values."""
+    values = _unpack(signature)
+    buckets = []
+    for band in range(NUM_BANDS):
+        chunk = values[band * ROWS_PER_BAND:(band + 1) * ROWS_PER_BAND].tobytes()
+        bucket = int.from_bytes(blake2b(chunk, digest_size=8).digest(), 'little', signed=True)
+        buckets.append((band, bucket))
+    return buckets
+
+
+def similarity(signature, other):
+    """Estimated Jaccard similarity of the lyrics behind two signatures."""
+    return float(np.mean(_unpack(signature) == _unpack(other)))
+
+
+def find_similar(signature, exclude_song_id=None, threshold=None, limit=10):
+    """
+    [(song_id, similarity)] of songs whose lyrics are near-duplicates, most similar first.
+
+    Only songs sharing an LSH bucket are compared, best-matching first and
+    at most SIMILAR_LYRICS_MAX_CANDIDATES of them.
+    """
+    if signature is None:
+        return []
+    if threshold is None:
+        threshold = current_app.config['SIMILAR_LYRICS_THRESHOLD']
+
+    hits = db.func.count().label('hits')
+    candidates = (db.session.query(SongLshBucket.song_id, hits)
+                  .filter(db.tuple_(SongLshBucket.band, SongLshBucket.bucket).in_(band_buckets(signature)))
+                  .group_by(SongLshBucket.song_id)
+                  .order_by(hits.desc())
+                  .limit(current_app.config['SIMILAR_LYRICS_MAX_CANDIDATES']))
+    candidate_ids = [song_id for song_id, _ in candidates if song_id != exclude_song_id]
+    if not candidate_ids:
+        return []
+
+    rows = (db.session.query(SongText.song_id, SongText.lyrics_minhash)
+            .filter(SongText.song_id.in_(candidate_ids), SongText.lyrics_minhash.isnot(None)))
+    scored = [(song_id, similarity(signature, other)) for song_id, other in rows]
+    matches = sorted((item for item in scored if item[1] >= threshold), key=lambda item: item[1], reverse=True)
+    return matches[:limit]
+
+
+def similar_songs(signature, exclude_song_id=None, limit=10):
+    """find_similar() resolved to song dicts with a `similarity` field."""
+    matches = find_similar(signature, exclude_song_id=exclude_song_id, limit=limit)
+    if not matches:
+        return []
+
+    songs = {song.id: song for song in Song.query.filter(Song.id.in_([song_id for song_id, _ in matches]))}
+    results = []
+    for song_id, score in matches:
+        if song_id in songs:
+            data = songs[song_id].to_dict(include_user=True, include_style=False, include_texts=False)
+            data['similarity'] = round(score, 3)
+            results.append(data)
+    return results
+
+
+def _replace_buckets(connection, song_id, signature):
+    table = SongLshBucket.__table__
+    connection.execute(table.delete().where(table.c.song_id == song_id))
+    if signature is not None:
+        connection.execute(table.insert(), [
+            {'band': band, 'bucket': bucket, 'song_id': song_id} for band, bucket in band_buckets(signature)
+        ])
+
+
+def insert_buckets(connection, signatures):
+    """Insert the LSH buckets of new songs ({song_id: signature}) in one statement."""
+    rows = [
+        {'band': band, 'bucket': bucket, 'song_id': song_id}
+        for song_id, signature in signatures.items() if signature is not None
+        for band, bucket in band_buckets(signature)
+    ]
+    if rows:
+        connection.execute(SongLshBucket.__table__.insert(), rows)
+
+
+def _sign_changed_lyrics(session, flush_context, instances):
+    """before_flush hook: recompute the signature of song texts whose lyrics changed."""
+    for obj in list(session.new) + list(session.dirty):
+        if isinstance(obj, SongText) and inspect(obj).attrs.specific_lyrics.history.has_changes():
+            obj.lyrics_minhash = lyrics_signature(obj.specific_lyrics)
+
+
+def _index_signed_lyrics(session, flush_context):
+    """after_flush hook: rewrite the LSH buckets of songs whose signature changed."""
+    connection = None
+    for obj in list(session.new) + list(session.dirty):
+        if isinstance(obj, SongText) and inspect(obj).attrs.lyrics_minhash.history.has_changes():
+            connection = connection or session.connection()
+            _replace_buckets(connection, obj.song_id, obj.lyrics_minhash)
+
+    for obj in session.deleted:
+        if isinstance(obj, SongText):
+            connection = connection or session.connection()
+            _replace_buckets(connection, obj.song_id, None)
+
+
+def register_lyrics_index_listeners():
+    """Keep lyrics signatures and LSH buckets in step with ORM lyric writes."""
+    if not event.contains(RoutingSession, 'before_flush', _sign_changed_lyrics):
+        event.listen(RoutingSession, 'before_flush', _sign_changed_lyrics)
+    if not event.contains(RoutingSession, 'after_flush', _index_signed_lyrics):
+        event.listen(RoutingSession, 'after_flush', _index_signed_lyrics)
+
+
+def rebuild_lyrics_index(batch_size=500):
+    """Recompute every signature and its buckets, in primary-key batches. Returns the songs indexed."""
+    indexed = 0
+    last_id = 0
+    while True:
+        batch = (db.session.query(SongText.song_id, SongText.specific_lyrics)
+                 .filter(SongText.song_id > last_id)
+                 .order_by(SongText.song_id)
+                 .limit(batch_size)
+                 .all())
+        if not batch:
+            return indexed
+
+        connection = db.session.connection()
+        for song_id, lyrics in batch:
+            signature = lyrics_signature(lyrics)
+            db.session.query(SongText).filter_by(song_id=song_id).update(
+                {'lyrics_minhash': signature}, synchronize_session=False)
+            _replace_buckets(connection, song_id, signature)
+        db.session.commit()
+
+        indexed += len(batch)
+        last_id = batch[-1][0]
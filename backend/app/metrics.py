@@ -0,0 +1,246 @@
+"""
+Minimal in-process metrics, rendered in the Prometheus text format at /metrics.
+
+Each gunicorn worker keeps its own values, but a scrape reaches whichever
+worker accepts it. With METRICS_DIR set (the gunicorn config sets it),
+every worker writes a snapshot of its values to METRICS_DIR/<pid>.json
+every METRICS_FLUSH_SECONDS, and /metrics renders all snapshots:
+
+- counters and summaries are summed over the workers, including exited
+  ones, so totals stay monotonic across worker restarts;
+- gauges describe a live process, so they are reported per worker with a
+  pid label and dropped once the worker has exited.
+
+The directory is emptied when gunicorn starts. Without METRICS_DIR (the
+development server) only the current process is rendered.
+
+/metrics is served at the app root, which nginx does not proxy; the app
+additionally only answers clients in METRICS_ALLOWED_NETWORKS.
+"""
+import glob
+import ipaddress
+import json
+import os
+import threading
+import time
+
+_lock = threading.Lock()
+_metrics = {}
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    inner = ','.join(f'{key}="{str(value)}"' for key, value in sorted(labels.items()))
+    return '{' + inner + '}'
+
+
+class Counter:
+    """Monotonic counter with optional labels."""
+
+    kind = 'counter'
+
+    def __init__(self, name, description):
+        self.name = name
+        self.description = description
+        self._values = {}
+
+    def inc(self, amount=1, **labels):
+        key = tuple(sorted(labels.items()))
+        with _lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with _lock:
+            return [(self.name, dict(key), value) for key, value in self._values.items()]
+
+
+class Gauge:
+    """Gauge whose labelled values are read from a callback at scrape time."""
+
+    kind = 'gauge'
+
+    def __init__(self, name, description, collect):
+        self.name = name
+        self.description = description
+        self._collect = collect
+
+    def samples(self):
+        return [(self.name, labels, value) for labels, value in self._collect()]
+
+
+class Summary:
+    """Count and sum of observations (e.g. wait times), with optional labels."""
+
+    kind = 'summary'
+
+    def __init__(self, name, description):
+        self.name = name
+        self.description = description
+        self._values = {}
+
+    def observe(self, value, **labels):
+        key = tuple(sorted(labels.items()))
+        with _lock:
+            count, total = self._values.get(key, (0, 0.0))
+            self._values[key] = (count + 1, total + value)
+
+    def samples(self):
+        with _lock:
+            items = list(self._values.items())
+        samples = []
+        for key, (count, total) in items:
+            samples.append((f'{self.name}_count', dict(key), count))
+            samples.append((f'{self.name}_sum', dict(key), total))
+        return samples
+
+
+def _register(metric):
+    with _lock:
+        return _metrics.setdefault(metric.name, metric)
+
+
+def counter(name, description):
+    """Get or create a counter."""
+    return _register(Counter(name, description))
+
+
+def gauge(name, description, collect):
+    """Get or create a gauge; collect() returns [(labels, value), ...]."""
+    return _register(Gauge(name, description, collect))
+
+
+def summary(name, description):
+    """Get or create a summary."""
+    return _register(Summary(name, description))
+
+
+def client_allowed(request, networks):
+    """
+    Whether a /metrics request comes straight from a client in one of networks.
+
+    ProxyFix rewrites remote_addr from X-Forwarded-For, which a client can
+    set itself, so the connection's own peer address is checked, and
+    requests forwarded by a proxy are refused.
+    """
+    if request.headers.get('X-Forwarded-For'):
+        return False
+    peer = request.environ.get('werkzeug.proxy_fix.orig', request.environ).get('REMOTE_ADDR')
+    try:
+        address = ipaddress.ip_address(peer)
+    except ValueError:
+        return False
+    return any(address in ipaddress.ip_network(network.strip(), strict=False) for network in networks if network.strip())
+
+
+def _snapshot():
+    """This process's metrics as JSON-able {name: {kind, description, samples}}."""
+    with _lock:
+        metrics = list(_metrics.values())
+    return {
+        metric.name: {'kind': metric.kind, 'description': metric.description, 'samples': metric.samples()}
+        for metric in metrics
+    }
+
+
+def _write_json(path, data):
+    """Write data to path atomically, so readers never see a partial file."""
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w') as fh:
+        json.dump(data, fh)
+    os.replace(tmp_path, path)
+
+
+def write_snapshot(directory):
+    """Write this process's metrics to directory/<pid>.json."""
+    os.makedirs(directory, exist_ok=True)
+    _write_json(os.path.join(directory, f'{os.getpid()}.json'),
+                {'pid': os.getpid(), 'alive': True, 'metrics': _snapshot()})
+
+
+def start_exporter(directory, interval):
+    """Write snapshots every interval seconds from a daemon thread (call in each worker after fork)."""
+    write_snapshot(directory)
+
+    def run():
+        while True:
+            time.sleep(interval)
+            try:
+                write_snapshot(directory)
+            except OSError:
+                pass
+
+    threading.Thread(target=run, name='metrics-exporter', daemon=True).start()
+
+
+def mark_process_dead(directory, pid):
+    """Keep an exited worker's counters and summaries but drop its gauges."""
+    path = os.path.join(directory, f'{pid}.json')
+    try:
+        with open(path) as fh:
+            snapshot = json.load(fh)
+    except (OSError, ValueError):
+        return
+
+    snapshot['alive'] = False
+    snapshot['metrics'] = {name: metric for name, metric in snapshot['metrics'].items() if metric['kind'] != 'gauge'}
+    _write_json(path, snapshot)
+
+
+def reset_directory(directory):
+    """Remove the snapshots of a previous run (call in the gunicorn master before forking)."""
+    os.makedirs(directory, exist_ok=True)
+    for path in glob.glob(os.path.join(directory, '*.json')):
+        os.remove(path)
+
+
+def _read_snapshots(directory):
+    snapshots = []
+    for path in glob.glob(os.path.join(directory, '*.json')):
+        try:
+            with open(path) as fh:
+                snapshots.append(json.load(fh))
+        except (OSError, ValueError):
+            continue  # being replaced or removed right now
+    return snapshots
+
+
+def _merge(snapshots):
+    """Combine per-process snapshots: sum counters and summaries, label gauges with their pid."""
+    merged = {}
+    for snapshot in snapshots:
+        for name, metric in snapshot['metrics'].items():
+            entry = merged.setdefault(name, {'kind': metric['kind'], 'description': metric['description'],
+                                             'samples': {}})
+            for sample_name, labels, value in metric['samples']:
+                if metric['kind'] == 'gauge':
+                    if not snapshot['alive']:
+                        continue
+                    labels = {**labels, 'pid': snapshot['pid']}
+                    entry['samples'][(sample_name, tuple(sorted(labels.items())))] = value
+                else:
+                    key = (sample_name, tuple(sorted(labels.items())))
+                    entry['samples'][key] = entry['samples'].get(key, 0) + value
+    return {
+        name: {**entry, 'samples': [(sample_name, dict(labels), value)
+                                    for (sample_name, labels), value in entry['samples'].items()]}
+        for name, entry in merged.items()
+    }
+
+
+def render(directory=None):
+    """Metrics in the Prometheus text exposition format: of all workers with a directory, else this process."""
+    if directory:
+        write_snapshot(directory)
+        metrics = _merge(_read_snapshots(directory))
+    else:
+        metrics = _snapshot()
+
+    lines = []
+    for name in sorted(metrics):
+        metric = metrics[name]
+        lines.append(f'# HELP {name} {metric["description"]}')
+        lines.append(f'# TYPE {name} {metric["kind"]}')
+        for sample_name, labels, value in metric['samples']:
+            lines.append(f'{sample_name}{_format_labels(labels)} {value}')
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,444 @@
+"""
+Online runner for the SQL migrations in database/migrations (flask migrate).
+
+Migrations stay plain SQL files named NNN_description.sql. `flask migrate`
+applies the pending ones in version order and records each in
+schema_migrations, so a database knows which versions it has. Each
+statement is run in the least disruptive way available:
+
+- ALTER TABLE is tried with ALGORITHM=INSTANT, then ALGORITHM=INPLACE,
+  LOCK=NONE; CREATE/DROP INDEX with ALGORITHM=INPLACE LOCK=NONE. If MySQL
+  can only do it by copying the table (blocking writes), the migration
+  stops unless --allow-blocking is given. DDL runs with a short
+  lock_wait_timeout and is retried, so a long transaction holding the
+  table's metadata lock does not queue all traffic behind the ALTER.
+- Table-wide UPDATE, DELETE and INSERT ... SELECT statements on a table
+  with an integer primary key are backfilled in primary-key ranges, each
+  its own transaction. Ranges are resized towards
+  MIGRATION_BATCH_TARGET_SECONDS, separated by MIGRATION_BATCH_PAUSE_SECONDS,
+  held back while the read replica lags, and progress is reported as they go.
+- USE, SHOW and DESCRIBE are skipped (the runner is connected to the
+  configured database); everything else runs as written.
+
+Progress is recorded after every statement and backfill batch, so an
+interrupted migration resumes where it stopped. `flask migrate --dry-run`
+shows how each pending statement would run. Databases whose migrations were
+applied by hand are marked up to date with `flask migrate --baseline N`.
+"""
+from collections import namedtuple
+from datetime import datetime
+import hashlib
+import os
+import re
+import time
+from flask import current_app
+from sqlalchemy import inspect
+from sqlalchemy.exc import DBAPIError
+from app import db
+from app.db_routing import REPLICA_BIND, replica_is_healthy
+from app.models import SchemaMigration
+
+MIGRATION_FILE = re.compile(r'^(\d+)_(\w+)\.sql$')
+
+# MySQL error codes
+ER_LOCK_WAIT_TIMEOUT = 1205
+ER_UNKNOWN_ALTER_ALGORITHM = 1800
+ER_ALTER_OPERATION_NOT_SUPPORTED = 1845
+ER_ALTER_OPERATION_NOT_SUPPORTED_REASON = 1846
+UNSUPPORTED_ALGORITHM_ERRORS = (ER_UNKNOWN_ALTER_ALGORITHM, ER_ALTER_OPERATION_NOT_SUPPORTED,
+                                ER_ALTER_OPERATION_NOT_SUPPORTED_REASON)
+
+ALTER_ALGORITHMS = (', ALGORITHM=INSTANT', ', ALGORITHM=INPLACE, LOCK=NONE')
+INDEX_ALGORITHMS = (' ALGORITHM=INPLACE LOCK=NONE',)
+
+Migration = namedtuple('Migration', 'version name path checksum statements')
+
+# kind: 'skip', 'alter', 'index', 'backfill' or 'sql'. Backfills run
+# before + <key range predicate on qualifier> + after.
+Step = namedtuple('Step', 'kind sql table qualifier before after')
+
+
+class MigrationError(Exception):
+    """A migration cannot be applied (safely)."""
+
+
+def split_statements(script):
+    """Split a SQL script into statements, dropping comments. Quotes are respected."""
+    statements, current = [], []
+    i, length = 0, len(script)
+    while i < length:
+        char = script[i]
+        if char in '\'"`':
+            end = i + 1
+            while end < length:
+                if script[end] == '\\' and char != '`':
+                    end += 2
+                    continue
+                if script[end] == char:
+                    if end + 1 < length and script[end + 1] == char:
+                        end += 2
+                        continue
+                    break
+                end += 1
+            current.append(script[i:end + 1])
+            i = end + 1
+        elif script.startswith('--', i) or char == '#':
+            newline = script.find('\n', i)
+            i = length if newline == -1 else newline
+        elif script.startswith('/*', i):
+            close = script.find('*/', i + 2)
+            i = length if close == -1 else close + 2
+        elif char == ';':
+            statements.append(''.join(current).strip())
+            current = []
+            i += 1
+        else:
+            current.append(char)
+            i += 1
+
+    statements.append(''.join(current).strip())
+    return [statement for statement in statements if statement]
+
+
+def _mask_literals(sql):
+    """sql with the contents of quoted strings blanked out, positions unchanged."""
+    return re.sub(r"'(?:[^'\\]|\\.|'')*'|\"(?:[^\"\\]|\\.|\"\")*\"",
+                  lambda match: "'" + ' ' * (len(match.group()) - 2) + "'", sql)
+
+
+_BACKFILL_PATTERNS = (
+    re.compile(r'^UPDATE\s+([`\w.]+)(?:\s+(?:AS\s+)?(\w+))?\s+SET\b', re.I),
+    re.compile(r'^DELETE\s+FROM\s+([`\w.]+)(?:\s+(?:AS\s+)?(\w+))?(?=\s+WHERE\b|\s*$)', re.I),
+    re.compile(r'^INSERT\s+(?:IGNORE\s+)?INTO\s+.+?\bSELECT\b.+?\bFROM\s+([`\w.]+)(?:\s+(?:AS\s+)?(\w+))?'
+               r'(?=\s+WHERE\b|\s*$)', re.I | re.S),
+)
+
+# Constructs that make a statement unsafe to split into key ranges
+_UNBATCHABLE = re.compile(r'\b(JOIN|USING|GROUP\s+BY|HAVING|UNION|ORDER\s+BY|LIMIT|ON\s+DUPLICATE)\b', re.I)
+
+
+def _plan_backfill(sql):
+    masked = _mask_literals(sql)
+    if _UNBATCHABLE.search(masked) or len(re.findall(r'\bSELECT\b', masked, re.I)) > 1:
+        return None
+    if masked.upper().startswith(('UPDATE', 'DELETE')) and re.search(r'\bSELECT\b', masked, re.I):
+        return None
+
+    for pattern in _BACKFILL_PATTERNS:
+        match = pattern.match(masked)
+        if match:
+            break
+    else:
+        return None
+
+    table = match.group(1).strip('`')
+    qualifier = match.group(2) or match.group(1)
+    wheres = list(re.finditer(r'\bWHERE\b', masked[match.end(1):], re.I))
+    if len(wheres) > 1:
+        return None
+    if wheres:
+        split = match.end(1) + wheres[0].end()
+        before, after = sql[:split] + ' ', f' AND ({sql[split:].strip()})'
+    else:
+        before, after = sql.rstrip() + ' WHERE ', ''
+    return Step('backfill', sql, table, qualifier, before, after)
+
+
+def plan_statement(sql):
+    """Classify one statement into a Step describing how it will be run."""
+    keyword = sql.split(None, 1)[0].upper()
+    if keyword in ('USE', 'SHOW', 'DESCRIBE', 'DESC'):
+        return Step('skip', sql, None, None, None, None)
+    if keyword == 'ALTER' and re.match(r'^ALTER\s+TABLE\b', sql, re.I):
+        return Step('alter', sql, None, None, None, None)
+    if re.match(r'^(CREATE\s+(UNIQUE\s+|FULLTEXT\s+)?|DROP\s+)INDEX\b', sql, re.I):
+        return Step('index', sql, None, None, None, None)
+    if keyword in ('UPDATE', 'DELETE', 'INSERT'):
+        step = _plan_backfill(sql)
+        if step:
+            return step
+    return Step('sql', sql, None, None, None, None)
+
+
+def describe_step(step):
+    """One-line summary of a Step for progress output and --dry-run."""
+    summary = ' '.join(step.sql.split())
+    if len(summary) > 80:
+        summary = summary[:77] + '...'
+    label = {
+        'skip': 'skipped',
+        'alter': 'online DDL (INSTANT, else INPLACE/LOCK=NONE)',
+        'index': 'online DDL (INPLACE/LOCK=NONE)',
+        'backfill': f'batched by primary key of {step.table}',
+        'sql': 'as written',
+    }[step.kind]
+    return f"{label}: {summary}"
+
+
+def discover_migrations(directory=None):
+    """The migration files in directory (default MIGRATIONS_DIR), in version order."""
+    directory = directory or current_app.config['MIGRATIONS_DIR']
+    migrations = []
+    for filename in os.listdir(directory):
+        match = MIGRATION_FILE.match(filename)
+        if not match:
+            continue
+        path = os.path.join(directory, filename)
+        with open(path, encoding='utf-8') as f:
+            script = f.read()
+        migrations.append(Migration(
+            version=int(match.group(1)),
+            name=match.group(2),
+            path=path,
+            checksum=hashlib.sha256(script.encode('utf-8')).hexdigest(),
+            statements=split_statements(script),
+        ))
+
+    migrations.sort(key=lambda migration: migration.version)
+    versions = [migration.version for migration in migrations]
+    if len(set(versions)) != len(versions):
+        raise MigrationError('Two migration files share a version number')
+    return migrations
+
+
+def _error_code(error):
+    args = getattr(getattr(error, 'orig', None), 'args', ())
+    return args[0] if args and isinstance(args[0], int) else None
+
+
+def _execute(connection, sql):
+    """Run raw SQL without parameter substitution (migrations may contain literal %)."""
+    return connection.exec_driver_sql(sql, execution_options={'no_parameters': True})
+
+
+class MigrationRunner:
+    """Applies pending migrations over one connection, recording progress in schema_migrations."""
+
+    def __init__(self, connection, echo=print, allow_blocking=False):
+        config = current_app.config
+        self.connection = connection
+        self.echo = echo
+        self.allow_blocking = allow_blocking
+        self.mysql = connection.dialect.name == 'mysql'
+        self.batch_size = config['MIGRATION_BATCH_SIZE']
+        self.batch_target = config['MIGRATION_BATCH_TARGET_SECONDS']
+        self.batch_pause = config['MIGRATION_BATCH_PAUSE_SECONDS']
+        self.ddl_retries = config['MIGRATION_DDL_RETRIES']
+        self.progress_interval = config['MIGRATION_PROGRESS_SECONDS']
+        self.replica = db.engines.get(REPLICA_BIND)
+        self.table = SchemaMigration.__table__
+
+        self.table.create(connection, checkfirst=True)
+        if self.mysql:
+            _execute(connection, f"SET SESSION lock_wait_timeout = {int(config['MIGRATION_LOCK_WAIT_TIMEOUT'])}")
+        connection.commit()
+
+    def records(self):
+        """{version: schema_migrations row}."""
+        return {row.version: row for row in self.connection.execute(db.select(self.table))}
+
+    def _record(self, version, **values):
+        self.connection.execute(self.table.update().where(self.table.c.version == version).values(**values))
+        self.connection.commit()
+
+    def baseline(self, migrations, version):
+        """Mark migrations up to version as applied without running them. Returns how many were marked."""
+        records = self.records()
+        marked = 0
+        for migration in migrations:
+            if migration.version > version or migration.version in records:
+                continue
+            self.connection.execute(self.table.insert().values(
+                version=migration.version, name=migration.name, checksum=migration.checksum,
+                status='applied', statements_done=len(migration.statements),
+                started_at=datetime.utcnow(), applied_at=datetime.utcnow(),
+            ))
+            marked += 1
+        self.connection.commit()
+        return marked
+
+    def apply(self, migration, record=None):
+        """Apply (or resume) one migration."""
+        if record is None:
+            self.connection.execute(self.table.insert().values(
+                version=migration.version, name=migration.name, checksum=migration.checksum,
+                status='running', statements_done=0, started_at=datetime.utcnow(),
+            ))
+            self.connection.commit()
+            done, position = 0, None
+        elif record.checksum != migration.checksum:
+            raise MigrationError(f'Migration {migration.version} changed since it was started; '
+                                 'restore the file or finish it by hand')
+        else:
+            done, position = record.statements_done, record.backfill_position
+            self.echo(f"Resuming migration {migration.version} at statement {done + 1}")
+
+        started = time.monotonic()
+        steps = [plan_statement(statement) for statement in migration.statements]
+        for index in range(done, len(steps)):
+            step = steps[index]
+            self.echo(f"  [{index + 1}/{len(steps)}] {describe_step(step)}")
+            if step.kind == 'alter':
+                self._online_ddl(step, ALTER_ALGORITHMS)
+            elif step.kind == 'index':
+                self._online_ddl(step, INDEX_ALGORITHMS)
+            elif step.kind == 'backfill':
+                self._backfill(migration.version, step, position)
+            elif step.kind == 'sql':
+                _execute(self.connection, step.sql)
+            self.connection.commit()
+            self._record(migration.version, statements_done=index + 1, backfill_position=None)
+            position = None
+
+        self._record(migration.version, status='applied', applied_at=datetime.utcnow())
+        current_app.logger.info(f"Migration {migration.version} ({migration.name}) applied "
+                                f"in {time.monotonic() - started:.1f}s")
+
+    def _ddl(self, sql):
+        """Run DDL, retrying when it times out waiting for the table's metadata lock."""
+        for attempt in range(1, self.ddl_retries + 1):
+            try:
+                _execute(self.connection, sql)
+                return
+            except DBAPIError as e:
+                self.connection.rollback()
+                if _error_code(e) != ER_LOCK_WAIT_TIMEOUT or attempt == self.ddl_retries:
+                    raise
+                self.echo(f"    metadata lock busy, retrying ({attempt}/{self.ddl_retries - 1})")
+                time.sleep(attempt)
+
+    def _online_ddl(self, step, algorithms):
+        if not self.mysql or re.search(r'\bALGORITHM\s*=', step.sql, re.I):
+            self._ddl(step.sql)
+            return
+
+        for algorithm in algorithms:
+            try:
+                self._ddl(step.sql + algorithm)
+                self.echo(f"    done with{algorithm.lstrip(',')}")
+                return
+            except DBAPIError as e:
+                if _error_code(e) not in UNSUPPORTED_ALGORITHM_ERRORS:
+                    raise
+
+        if not self.allow_blocking:
+            raise MigrationError('This statement needs a table copy that blocks writes; run it in a '
+                                 'maintenance window with --allow-blocking')
+        self.echo('    no online algorithm available, running with a table copy')
+        self._ddl(step.sql)
+
+    def _integer_key(self, table):
+        """The single integer primary key column of table, or None."""
+        inspector = inspect(self.connection)
+        key = inspector.get_pk_constraint(table).get('constrained_columns') or []
+        if len(key) != 1:
+            return None
+        for column in inspector.get_columns(table):
+            if column['name'] == key[0]:
+                try:
+                    return key[0] if column['type'].python_type is int else None
+                except NotImplementedError:
+                    return None
+        return None
+
+    def _wait_for_replica(self):
+        while self.replica is not None and not replica_is_healthy(self.replica):
+            self.echo('    replica is lagging, pausing backfill')
+            time.sleep(current_app.config['REPLICA_LAG_CHECK_INTERVAL'])
+
+    def _backfill(self, version, step, position=None):
+        key = self._integer_key(step.table)
+        if key is None:
+            self.echo(f"    {step.table} has no integer primary key, running in one statement")
+            _execute(self.connection, step.sql)
+            return
+
+        low, high = _execute(self.connection, f"SELECT MIN({key}), MAX({key}) FROM {step.table}").first()
+        self.connection.commit()
+        if low is None:
+            return
+
+        position = max(position or low, low)
+        batch_size = self.batch_size
+        rows, started, reported = 0, time.monotonic(), 0.0
+        column = f"{step.qualifier}.{key}"
+        while position <= high:
+            self._wait_for_replica()
+
+            batch_started = time.monotonic()
+            end = position + batch_size
+            result = _execute(self.connection,
+                              f"{step.before}{column} >= {position} AND {column} < {end}{step.after}")
+            rows += max(result.rowcount, 0)
+            position = end
+            # Commits the batch together with its position
+            self._record(version, backfill_position=position)
+
+            # Keep each batch's locks short: shrink slow batches, grow fast ones
+            elapsed = time.monotonic() - batch_started
+            if elapsed > self.batch_target:
+                batch_size = max(batch_size // 2, 1)
+            elif elapsed < self.batch_target / 4:
+                batch_size = min(batch_size * 2, self.batch_size * 10)
+
+            now = time.monotonic()
+            if now - reported >= self.progress_interval or position > high:
+                done = min(position, high + 1) - low
+                self.echo(f"    {step.table}.{key} {min(position, high + 1)}/{high + 1} "
+                          f"({100 * done / (high + 1 - low):.0f}%), {rows} rows, "
+                          f"{rows / max(now - started, 1e-9):.0f} rows/s, batch {batch_size}")
+                reported = now
+
+            time.sleep(self.batch_pause)
+
+
+def migration_status():
+    """(version, name, state) of every migration file; state is applied, pending, running or changed."""
+    migrations = discover_migrations()
+    with db.engine.connect() as connection:
+        runner = MigrationRunner(connection, echo=lambda message: None)
+        records = runner.records()
+
+    status = []
+    for migration in migrations:
+        record = records.get(migration.version)
+        if record is None:
+            state = 'pending'
+        elif record.checksum and record.checksum != migration.checksum:
+            state = 'changed'
+        else:
+            state = record.status
+        status.append((migration.version, migration.name, state))
+    return status
+
+
+def migrate(target=None, dry_run=False, allow_blocking=False, baseline=None, echo=print):
+    """
+    Apply pending migrations up to target (default: all). Returns the versions applied.
+
+    dry_run only prints the plan; baseline=N marks migrations up to N as
+    applied without running them.
+    """
+    migrations = discover_migrations()
+    with db.engine.connect() as connection:
+        runner = MigrationRunner(connection, echo=echo, allow_blocking=allow_blocking)
+        if baseline is not None:
+            echo(f"Marked {runner.baseline(migrations, baseline)} migrations as applied")
+
+        records = runner.records()
+        pending = [
+            migration for migration in migrations
+            if (target is None or migration.version <= target)
+            and (migration.version not in records or records[migration.version].status != 'applied')
+        ]
+
+        applied = []
+        for migration in pending:
+            echo(f"Migration {migration.version:03d} {migration.name}")
+            if dry_run:
+                for index, statement in enumerate(migration.statements):
+                    echo(f"  [{index + 1}/{len(migration.statements)}] {describe_step(plan_statement(statement))}")
+                continue
+            runner.apply(migration, records.get(migration.version))
+            applied.append(migration.version)
+        return applied
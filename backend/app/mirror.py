@@ -0,0 +1,228 @@
+"""
+Server-side mirroring of generated audio into local storage.
+
+Completed songs point at third-party CDN URLs that expire. The mirror job
+fetches both audio files for each completed song concurrently, streams them
+to disk with a SHA-256 checksum, retries transient failures and records the
+local path and size on the song.
+
+A file that still fails is recorded in song_mirror_failures and skipped
+until its retry_at: AUDIO_MIRROR_RETRY_SECONDS after the first failure,
+doubling with each attempt up to AUDIO_MIRROR_RETRY_MAX_SECONDS. After
+AUDIO_MIRROR_MAX_ATTEMPTS the file is given up (retry_at NULL), so songs
+with dead CDN URLs do not crowd out the rest of the backlog.
+
+Downloads run on a thread pool; all database work stays on the calling
+thread because SQLAlchemy sessions are not thread-safe.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+import hashlib
+import os
+import time
+import requests
+from flask import current_app
+from app import db
+from app.models import Song, SongMirrorFailure
+
+CHUNK_SIZE = 64 * 1024
+
+
+def storage_root():
+    """Absolute path of the local audio storage directory."""
+    return os.path.abspath(current_app.config['AUDIO_STORAGE_DIR'])
+
+
+def relative_audio_path(song_id, index):
+    """Storage-relative path for a song's n-th audio file."""
+    return f"{song_id % 1000:03d}/{song_id}_{index}.mp3"
+
+
+def fetch_to_file(session, url, dest, retries=3, backoff=1.0, timeout=30):
+    """
+    Stream url into dest, returning (size, sha256 hexdigest).
+
+    Data is written to a temporary file next to dest and renamed into place
+    once complete, so readers never see a partial file.
+    """
+    os.makedirs(os.path.dirname(dest), exist_ok=True)
+    tmp_path = f"{dest}.part"
+    last_error = None
+
+    for attempt in range(1, retries + 1):
+        try:
+            digest = hashlib.sha256()
+            size = 0
+            with session.get(url, stream=True, timeout=timeout) as response:
+                response.raise_for_status()
+                with open(tmp_path, 'wb') as fh:
+                    for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                        if not chunk:
+                            continue
+                        fh.write(chunk)
+                        digest.update(chunk)
+                        size += len(chunk)
+
+            expected = response.headers.get('Content-Length')
+            encoded = response.headers.get('Content-Encoding')
+            if expected and expected.isdigit() and not encoded and int(expected) != size:
+                raise IOError(f'Truncated download: expected {expected} bytes, got {size}')
+
+            os.replace(tmp_path, dest)
+            return size, digest.hexdigest()
+        except (requests.exceptions.RequestException, IOError) as e:
+            last_error = e
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            # Client errors (expired or missing URL) will not fix themselves
+            status = getattr(getattr(e, 'response', None), 'status_code', None)
+            if status is not None and 400 <= status < 500:
+                break
+            if attempt < retries:
+                time.sleep(backoff * (2 ** (attempt - 1)))
+
+    raise Exception(f'Failed to fetch {url}: {last_error}')
+
+
+def _backing_off(index, now):
+    """EXISTS clause: the song's index-th file failed and is not due for another attempt."""
+    return db.exists().where(
+        SongMirrorFailure.song_id == Song.id,
+        SongMirrorFailure.audio_index == index,
+        db.or_(SongMirrorFailure.retry_at.is_(None), SongMirrorFailure.retry_at > now),
+    )
+
+
+def find_unmirrored_songs(limit, now=None):
+    """
+    Completed songs with at least one remote URL not yet stored locally.
+
+    Files backing off after a failure are not counted. Newest first, so
+    fresh CDN URLs are fetched before older ones expire.
+    """
+    now = now or datetime.utcnow()
+    return (
+        Song.query
+        .filter(Song.status == 'completed')
+        .filter(db.or_(*(
+            db.and_(
+                getattr(Song, f'download_url_{index}').isnot(None),
+                getattr(Song, f'audio_path_{index}').is_(None),
+                ~_backing_off(index, now),
+            )
+            for index in (1, 2)
+        )))
+        .order_by(Song.id.desc())
+        .limit(limit)
+        .all()
+    )
+
+
+def _record_failure(failure, song_id, index, error, now):
+    """Count a failed attempt and schedule the next one (or give up)."""
+    config = current_app.config
+    if failure is None:
+        failure = SongMirrorFailure(song_id=song_id, audio_index=index, attempts=0)
+        db.session.add(failure)
+
+    failure.attempts += 1
+    failure.error = error[:500]
+    failure.failed_at = now
+    if failure.attempts >= config['AUDIO_MIRROR_MAX_ATTEMPTS']:
+        failure.retry_at = None
+    else:
+        delay = min(config['AUDIO_MIRROR_RETRY_SECONDS'] * 2 ** (failure.attempts - 1),
+                    config['AUDIO_MIRROR_RETRY_MAX_SECONDS'])
+        failure.retry_at = now + timedelta(seconds=delay)
+    return failure
+
+
+def mirror_completed_songs(limit=None, workers=None, session=None):
+    """
+    Mirror audio for up to `limit` completed songs.
+
+    Returns a summary dict with counts of mirrored files, failures and bytes.
+    """
+    limit = limit or current_app.config['AUDIO_MIRROR_BATCH_SIZE']
+    workers = workers or current_app.config['AUDIO_MIRROR_WORKERS']
+    session = session or requests.Session()
+    root = storage_root()
+    now = datetime.utcnow()
+
+    songs = find_unmirrored_songs(limit, now)
+    failures = {
+        (failure.song_id, failure.audio_index): failure
+        for failure in SongMirrorFailure.query.filter(SongMirrorFailure.song_id.in_([song.id for song in songs]))
+    } if songs else {}
+
+    jobs = []
+    for song in songs:
+        for index in (1, 2):
+            url = getattr(song, f'download_url_{index}')
+            failure = failures.get((song.id, index))
+            if failure and (failure.retry_at is None or failure.retry_at > now):
+                continue
+            if url and not getattr(song, f'audio_path_{index}'):
+                jobs.append((song, index, url, relative_audio_path(song.id, index)))
+
+    summary = {'mirrored': 0, 'failed': 0, 'bytes': 0}
+    if not jobs:
+        return summary
+
+    def run(job):
+        _, _, url, rel_path = job
+        return fetch_to_file(session, url, os.path.join(root, rel_path))
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [(job, pool.submit(run, job)) for job in jobs]
+
+        for (song, index, url, rel_path), future in futures:
+            try:
+                size, checksum = future.result()
+            except Exception as e:
+                summary['failed'] += 1
+                failure = _record_failure(failures.get((song.id, index)), song.id, index, str(e), now)
+                retry = f"retry after {failure.retry_at:%Y-%m-%d %H:%M}" if failure.retry_at else 'giving up'
+                current_app.logger.warning(
+                    f"Audio mirror: song {song.id} file {index} (attempt {failure.attempts}, {retry}): {str(e)}"
+                )
+                continue
+
+            if (song.id, index) in failures:
+                db.session.delete(failures[(song.id, index)])
+            setattr(song, f'audio_path_{index}', rel_path)
+            setattr(song, f'audio_size_{index}', size)
+            setattr(song, f'audio_sha256_{index}', checksum)
+            summary['mirrored'] += 1
+            summary['bytes'] += size
+
+    try:
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error(f"Audio mirror: Database error: {str(e)}")
+        raise
+
+    current_app.logger.info(f"Audio mirror: {summary}")
+    return summary
+
+
+def clear_local_audio(song):
+    """Remove mirrored files for a song, reset its local audio fields and forget failed attempts."""
+    root = storage_root()
+    for index in (1, 2):
+        rel_path = getattr(song, f'audio_path_{index}')
+        if rel_path:
+            try:
+                os.remove(os.path.join(root, rel_path))
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                current_app.logger.warning(f"Audio mirror: could not remove {rel_path}: {str(e)}")
+        setattr(song, f'audio_path_{index}', None)
+        setattr(song, f'audio_size_{index}', None)
+        setattr(song, f'audio_sha256_{index}', None)
+
+    # New URLs follow (recreate): start their retries afresh
+    if song.id is not None:
+        SongMirrorFailure.query.filter_by(song_id=song.id).delete()
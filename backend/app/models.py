@@ -1,11 +1,18 @@
 from datetime import datetime
 from app import db
+from app.user_directory import username_for
+
+LYRICS_PREVIEW_LENGTH = 300
 
 
 class User(db.Model):
     """User model for authentication and ownership."""
 
     __tablename__ = 'users'
+    __table_args__ = (
+        # Team directory: active users by username prefix
+        db.Index('idx_users_active_username', 'is_active', 'username'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(100), unique=True, nullable=False, index=True)
@@ -54,7 +61,7 @@ class Style(db.Model):
             'id': self.id,
             'name': self.name,
             'style_prompt': self.style_prompt,
-            'created_by': self.creator.username if self.creator else None,
+            'created_by': username_for(self.created_by),
             'created_by_id': self.created_by,
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'updated_at': self.updated_at.isoformat() if self.updated_at else None
@@ -67,49 +74,119 @@ class Song(db.Model):
     """Song model for music creation tracking."""
 
     __tablename__ = 'songs'
+    __table_args__ = (
+        # Reconciler lookup of stale submitted songs
+        db.Index('idx_songs_status_updated', 'status', 'updated_at'),
+        # Archival: oldest finished songs of a status
+        db.Index('idx_songs_status_created', 'status', 'created_at'),
+        # Delta sync: a user's songs changed since a cursor
+        db.Index('idx_songs_user_updated', 'user_id', 'updated_at', 'id'),
+        # get_songs: filter by user, newest first
+        db.Index('idx_songs_user_created', 'user_id', 'created_at'),
+        # get_stats: filter by user and status
+        db.Index('idx_songs_user_status', 'user_id', 'status'),
+        # Songs of a style, newest first
+        db.Index('idx_songs_style_created', 'style_id', 'created_at'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
-    status = db.Column(db.Enum('create', 'submitted', 'completed', 'failed', 'unspecified'), default='create', index=True)
+    # active_history: the analytics flush hook needs the old value of these
+    # rollup columns even when they are set on an expired instance
+    user_id = db.column_property(
+        db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), nullable=False), active_history=True
+    )
+    status = db.column_property(
+        db.Column(db.Enum('create', 'submitted', 'completed', 'failed', 'unspecified'), default='create'),
+        active_history=True
+    )
     specific_title = db.Column(db.String(500))
     version = db.Column(db.String(10), default='v1')
-    star_rating = db.Column(db.Integer, default=0, index=True)
-    specific_lyrics = db.Column(db.Text)
-    prompt_to_generate = db.Column(db.Text)
-    style_id = db.Column(db.Integer, db.ForeignKey('styles.id', ondelete='SET NULL'))
+    star_rating = db.column_property(db.Column(db.Integer, default=0, index=True), active_history=True)
+    # Short prefix of the lyrics for list views; full text lives in song_texts
+    lyrics_preview = db.Column(db.String(LYRICS_PREVIEW_LENGTH))
+    style_id = db.column_property(
+        db.Column(db.Integer, db.ForeignKey('styles.id', ondelete='SET NULL')), active_history=True
+    )
     vocal_gender = db.Column(db.Enum('male', 'female', 'other'))
     voice_name = db.Column(db.String(255))  # Azure Speech voice name
     download_url_1 = db.Column(db.String(1000))
     downloaded_url_1 = db.Column(db.Boolean, default=False)
     download_url_2 = db.Column(db.String(1000))
     downloaded_url_2 = db.Column(db.Boolean, default=False)
+    # Server-side mirror of the generated audio (paths relative to AUDIO_STORAGE_DIR)
+    audio_path_1 = db.Column(db.String(255))
+    audio_size_1 = db.Column(db.BigInteger)
+    audio_sha256_1 = db.Column(db.String(64))
+    audio_path_2 = db.Column(db.String(255))
+    audio_size_2 = db.Column(db.BigInteger)
+    audio_sha256_2 = db.Column(db.String(64))
     speech_task_id = db.Column(db.String(255), index=True)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    created_at = db.column_property(db.Column(db.DateTime, default=datetime.utcnow, index=True), active_history=True)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
-    def to_dict(self, include_user=False, include_style=True):
-        """Convert song to dictionary."""
+    # Large texts, loaded only when accessed (detail views, edits, Suno submission)
+    texts = db.relationship('SongText', uselist=False, lazy='select', cascade='all, delete-orphan')
+
+    def _set_text(self, field, value):
+        """Store a large text field on the 1:1 song_texts row."""
+        if self.texts is None:
+            if value is None:
+                return
+            self.texts = SongText()
+        setattr(self.texts, field, value)
+        # The change lands in song_texts; bump the song so delta sync sees it
+        self.updated_at = datetime.utcnow()
+
+    @property
+    def specific_lyrics(self):
+        return self.texts.specific_lyrics if self.texts else None
+
+    @specific_lyrics.setter
+    def specific_lyrics(self, value):
+        self._set_text('specific_lyrics', value)
+        self.lyrics_preview = value[:LYRICS_PREVIEW_LENGTH] if value else None
+
+    @property
+    def prompt_to_generate(self):
+        return self.texts.prompt_to_generate if self.texts else None
+
+    @prompt_to_generate.setter
+    def prompt_to_generate(self, value):
+        self._set_text('prompt_to_generate', value)
+
+    def to_dict(self, include_user=False, include_style=True, include_texts=True):
+        """
+        Convert song to dictionary.
+
+        List views pass include_texts=False to skip loading song_texts; they
+        get lyrics_preview instead of the full lyrics and prompt.
+        """
         data = {
             'id': self.id,
             'status': self.status,
             'specific_title': self.specific_title,
             'version': self.version or 'v1',
             'star_rating': self.star_rating or 0,
-            'specific_lyrics': self.specific_lyrics,
-            'prompt_to_generate': self.prompt_to_generate,
+            'lyrics_preview': self.lyrics_preview,
             'vocal_gender': self.vocal_gender,
             'voice_name': self.voice_name,
             'download_url_1': self.download_url_1,
             'downloaded_url_1': self.downloaded_url_1 or False,
             'download_url_2': self.download_url_2,
             'downloaded_url_2': self.downloaded_url_2 or False,
+            'audio_size_1': self.audio_size_1,
+            'audio_size_2': self.audio_size_2,
             'speech_task_id': self.speech_task_id,
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'updated_at': self.updated_at.isoformat() if self.updated_at else None
         }
 
+        if include_texts:
+            data['specific_lyrics'] = self.specific_lyrics
+            data['prompt_to_generate'] = self.prompt_to_generate
+
         if include_user:
-            data['creator'] = self.creator.username if self.creator else None
+            data['creator'] = username_for(self.user_id)
             data['user_id'] = self.user_id
 
         if include_style and self.style:
@@ -119,3 +196,235 @@ class Song(db.Model):
             data['style_id'] = self.style_id
 
         return data
+
+
+class SongText(db.Model):
+    """Large per-song texts, split out of songs to keep that table narrow."""
+
+    __tablename__ = 'song_texts'
+
+    song_id = db.Column(db.Integer, db.ForeignKey('songs.id', ondelete='CASCADE'), primary_key=True)
+    specific_lyrics = db.Column(db.Text)
+    prompt_to_generate = db.Column(db.Text)
+    # MinHash of specific_lyrics, maintained by app/lyrics_similarity.py
+    lyrics_minhash = db.Column(db.LargeBinary(512))
+
+
+class SongArchive(db.Model):
+    """
+    Cold copy of an old, finished song moved out of songs by `flask archive-songs`.
+
+    Same columns as songs (ids are kept) plus the song_texts columns, so
+    archived songs need no joins and the hot tables shrink. See app/archival.py.
+    """
+
+    __tablename__ = 'songs_archive'
+    __table_args__ = (
+        # include_archived lists: a user's songs, newest first
+        db.Index('idx_songs_archive_user_created', 'user_id', 'created_at'),
+        # include_archived stats
+        db.Index('idx_songs_archive_user_status', 'user_id', 'status'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
+    status = db.Column(db.Enum('create', 'submitted', 'completed', 'failed', 'unspecified'))
+    specific_title = db.Column(db.String(500))
+    version = db.Column(db.String(10))
+    star_rating = db.Column(db.Integer, default=0)
+    lyrics_preview = db.Column(db.String(LYRICS_PREVIEW_LENGTH))
+    style_id = db.Column(db.Integer, db.ForeignKey('styles.id', ondelete='SET NULL'))
+    vocal_gender = db.Column(db.Enum('male', 'female', 'other'))
+    voice_name = db.Column(db.String(255))
+    download_url_1 = db.Column(db.String(1000))
+    downloaded_url_1 = db.Column(db.Boolean, default=False)
+    download_url_2 = db.Column(db.String(1000))
+    downloaded_url_2 = db.Column(db.Boolean, default=False)
+    audio_path_1 = db.Column(db.String(255))
+    audio_size_1 = db.Column(db.BigInteger)
+    audio_sha256_1 = db.Column(db.String(64))
+    audio_path_2 = db.Column(db.String(255))
+    audio_size_2 = db.Column(db.BigInteger)
+    audio_sha256_2 = db.Column(db.String(64))
+    speech_task_id = db.Column(db.String(255))
+    specific_lyrics = db.Column(db.Text)
+    prompt_to_generate = db.Column(db.Text)
+    created_at = db.Column(db.DateTime)
+    updated_at = db.Column(db.DateTime)
+    archived_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    style = db.relationship('Style')
+
+    def to_dict(self, include_user=False, include_style=True, include_texts=True):
+        """Convert archived song to dictionary, in the Song.to_dict() format."""
+        data = Song.to_dict(self, include_user=include_user, include_style=include_style,
+                            include_texts=include_texts)
+        data['archived'] = True
+        data['archived_at'] = self.archived_at.isoformat() if self.archived_at else None
+        return data
+
+
+class SongLshBucket(db.Model):
+    """LSH band bucket of a song's lyrics signature; songs sharing a bucket are near-duplicate candidates."""
+
+    __tablename__ = 'song_lsh_buckets'
+    __table_args__ = (
+        db.Index('idx_song_lsh_buckets_song', 'song_id'),
+    )
+
+    band = db.Column(db.SmallInteger, primary_key=True, autoincrement=False)
+    bucket = db.Column(db.BigInteger, primary_key=True, autoincrement=False)
+    song_id = db.Column(db.Integer, db.ForeignKey('songs.id', ondelete='CASCADE'), primary_key=True,
+                        autoincrement=False)
+
+
+class SongWaveform(db.Model):
+    """Duration, loudness and waveform peaks of one of a song's audio files (see app/audio_analysis.py)."""
+
+    __tablename__ = 'song_waveforms'
+
+    song_id = db.Column(db.Integer, db.ForeignKey('songs.id', ondelete='CASCADE'), primary_key=True,
+                        autoincrement=False)
+    audio_index = db.Column(db.SmallInteger, primary_key=True, autoincrement=False)
+    duration_ms = db.Column(db.Integer)
+    loudness_lufs = db.Column(db.Float)
+    peaks = db.Column(db.LargeBinary(1024))  # int8 (min, max) pairs
+    error = db.Column(db.String(500))  # Set instead of the results when decoding failed
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    retry_at = db.Column(db.DateTime)  # Next attempt after a transient failure; NULL = not retried
+    local_source = db.Column(db.Boolean, nullable=False, default=False)  # Analyzed the mirrored copy
+    analyzed_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+
+class SongMirrorFailure(db.Model):
+    """Failed attempts to mirror one of a song's audio files, and when to try again (see app/mirror.py)."""
+
+    __tablename__ = 'song_mirror_failures'
+
+    song_id = db.Column(db.Integer, db.ForeignKey('songs.id', ondelete='CASCADE'), primary_key=True,
+                        autoincrement=False)
+    audio_index = db.Column(db.SmallInteger, primary_key=True, autoincrement=False)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    error = db.Column(db.String(500))
+    failed_at = db.Column(db.DateTime, default=datetime.utcnow)
+    retry_at = db.Column(db.DateTime)  # NULL once AUDIO_MIRROR_MAX_ATTEMPTS is reached
+
+
+class SongDeletion(db.Model):
+    """Tombstone for a deleted song, consumed by the delta sync endpoint."""
+
+    __tablename__ = 'song_deletions'
+    __table_args__ = (
+        db.Index('idx_song_deletions_user', 'user_id', 'id'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    song_id = db.Column(db.Integer, nullable=False)
+    user_id = db.Column(db.Integer, nullable=False)
+    deleted_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+
+    def to_dict(self):
+        """Convert tombstone to dictionary."""
+        return {
+            'id': self.song_id,
+            'deleted_at': self.deleted_at.isoformat() if self.deleted_at else None
+        }
+
+
+class SongRollup(db.Model):
+    """
+    Pre-aggregated song counts per user, style, creation day and status.
+
+    Maintained incrementally on song writes (see app/analytics.py) and
+    rebuilt from songs and songs_archive by `flask rebuild-analytics`. Songs without a style
+    are counted under style_id 0.
+    """
+
+    __tablename__ = 'song_rollups'
+    __table_args__ = (
+        db.Index('idx_song_rollups_day', 'day'),
+    )
+
+    user_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    style_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    day = db.Column(db.Date, primary_key=True)
+    status = db.Column(db.String(20), primary_key=True)
+    song_count = db.Column(db.Integer, nullable=False, default=0)
+    rated_count = db.Column(db.Integer, nullable=False, default=0)
+    rating_sum = db.Column(db.Integer, nullable=False, default=0)
+
+
+class IdempotencyKey(db.Model):
+    """Stored outcome of a request sent with an Idempotency-Key header."""
+
+    __tablename__ = 'idempotency_keys'
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'idem_key', name='uq_idempotency_user_key'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, nullable=False)
+    idem_key = db.Column(db.String(255), nullable=False)
+    endpoint = db.Column(db.String(100), nullable=False)
+    request_hash = db.Column(db.String(64), nullable=False)
+    status_code = db.Column(db.Integer)  # NULL while the original request is in flight
+    response_body = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+
+
+class SunoSubmission(db.Model):
+    """Recent Suno submissions keyed by payload hash, used to coalesce duplicates."""
+
+    __tablename__ = 'suno_submissions'
+
+    payload_hash = db.Column(db.String(64), primary_key=True)
+    task_id = db.Column(db.String(255))  # NULL while the leading request is in flight
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+
+
+class SpeechJob(db.Model):
+    """Background text-to-speech synthesis job (POST /speech/jobs)."""
+
+    __tablename__ = 'speech_jobs'
+    __table_args__ = (
+        db.Index('idx_speech_jobs_user_created', 'user_id', 'created_at'),
+    )
+
+    id = db.Column(db.String(32), primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
+    status = db.Column(db.Enum('queued', 'running', 'completed', 'failed'), default='queued', nullable=False)
+    voice_name = db.Column(db.String(255), nullable=False)
+    text = db.Column(db.Text, nullable=False)
+    error = db.Column(db.String(500))
+    audio_path = db.Column(db.String(255))  # Relative to AUDIO_STORAGE_DIR
+    audio_size = db.Column(db.Integer)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def to_dict(self):
+        """Convert job to dictionary."""
+        return {
+            'id': self.id,
+            'status': self.status,
+            'voice_name': self.voice_name,
+            'error': self.error,
+            'audio_size': self.audio_size,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
+
+
+class SchemaMigration(db.Model):
+    """A database/migrations file applied (or being applied) by `flask migrate`."""
+
+    __tablename__ = 'schema_migrations'
+
+    version = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    name = db.Column(db.String(255), nullable=False)
+    checksum = db.Column(db.String(64))  # sha256 of the file; NULL for versions marked applied by schema.sql
+    status = db.Column(db.String(20), nullable=False, default='running')  # 'running' or 'applied'
+    # Resume point of an interrupted migration
+    statements_done = db.Column(db.Integer, nullable=False, default=0)
+    backfill_position = db.Column(db.BigInteger)
+    started_at = db.Column(db.DateTime, default=datetime.utcnow)
+    applied_at = db.Column(db.DateTime)
@@ -0,0 +1,103 @@
+"""
+Query-plan regression checks for the hot song queries.
+
+Each check builds the same query the endpoint runs, asks MySQL to EXPLAIN
+it and verifies that the expected composite index is chosen and, unless the
+check allows it, that no filesort is needed. Run against a database with
+realistic data via `flask check-query-plans`; the command exits non-zero on
+regressions. tests/test_query_plans.py runs the same checks against a
+seeded MySQL test database.
+"""
+from datetime import datetime, timedelta
+from app import db
+from app.archival import archive_candidates
+from app.models import Song
+from app.reconciler import stale_songs_query
+from app.song_rows import song_rows_select
+
+SAMPLE_USER_ID = 1
+SAMPLE_STYLE_ID = 1
+
+
+def _hot_queries():
+    """(name, query, expected index, filesort allowed) for each hot query shape."""
+    since = datetime.utcnow() - timedelta(minutes=15)
+    return [
+        (
+            'get_songs: user songs newest first',
+            song_rows_select().where(Song.user_id == SAMPLE_USER_ID).order_by(Song.created_at.desc()),
+            'idx_songs_user_created',
+            False,
+        ),
+        (
+            'get_stats: user songs by status',
+            Song.query.filter_by(user_id=SAMPLE_USER_ID, status='failed').with_entities(db.func.count()),
+            'idx_songs_user_status',
+            False,
+        ),
+        (
+            'style songs newest first',
+            Song.query.filter_by(style_id=SAMPLE_STYLE_ID).order_by(Song.created_at.desc()),
+            'idx_songs_style_created',
+            False,
+        ),
+        (
+            'get_song_changes: user songs since cursor',
+            song_rows_select().where(Song.user_id == SAMPLE_USER_ID, Song.updated_at > since)
+            .order_by(Song.updated_at, Song.id),
+            'idx_songs_user_updated',
+            False,
+        ),
+        (
+            # Only the few stale submitted songs are sorted into id order for paging
+            'reconciler: stale submitted songs',
+            stale_songs_query(timedelta(minutes=15), 50),
+            'idx_songs_status_updated',
+            True,
+        ),
+        (
+            'archival: oldest completed songs',
+            archive_candidates('completed', datetime.utcnow() - timedelta(days=365), 500),
+            'idx_songs_status_created',
+            False,
+        ),
+    ]
+
+
+def explain(query):
+    """Return the EXPLAIN rows for an ORM query or select() as a list of dicts."""
+    connection = db.session.connection()
+    statement = getattr(query, 'statement', query)
+    compiled = statement.compile(dialect=connection.dialect)
+    result = connection.exec_driver_sql(f'EXPLAIN {compiled}', compiled.params)
+    return [dict(row._mapping) for row in result]
+
+
+def check_query_plans():
+    """
+    EXPLAIN every hot query and collect plan regressions.
+
+    Returns a list of (name, ok, detail) tuples.
+    """
+    if db.engine.dialect.name != 'mysql':
+        raise Exception(f'Query plan checks require MySQL, not {db.engine.dialect.name}')
+
+    results = []
+    for name, query, expected_index, filesort_allowed in _hot_queries():
+        rows = explain(query)
+        songs_row = next((row for row in rows if row.get('table') == 'songs'), rows[0] if rows else {})
+        key = songs_row.get('key')
+        extra = songs_row.get('Extra') or ''
+
+        problems = []
+        if key != expected_index:
+            problems.append(f'uses {key or "no index"} instead of {expected_index}')
+        if 'filesort' in extra and not filesort_allowed:
+            problems.append('needs a filesort')
+        if 'index_merge' in (songs_row.get('type') or ''):
+            problems.append('uses an index merge')
+
+        detail = '; '.join(problems) or f'{key} ({songs_row.get("type")}, ~{songs_row.get("rows")} rows)'
+        results.append((name, not problems, detail))
+
+    return results
@@ -0,0 +1,57 @@
+"""
+Benchmark of the song list read paths (`flask benchmark-song-reads`).
+
+Builds the GET /songs payload for the newest `limit` songs twice: through
+ORM Song objects and Song.to_dict(), as the endpoint used to, and through
+the Core select() rows of app/song_rows.py. Reports the CPU time per row
+(best of `repeat` runs) and, from a separate run under tracemalloc, the
+peak Python memory of each path. Run it against a copy of production
+data; the numbers include the database round trip.
+"""
+import time
+import tracemalloc
+from app import db
+from app.models import Song
+from app.song_rows import song_rows_select, fetch_song_rows, song_rows_to_dicts
+
+
+def _orm_payload(limit):
+    songs = Song.query.order_by(Song.created_at.desc()).limit(limit).all()
+    return [song.to_dict(include_user=True, include_style=True, include_texts=False) for song in songs]
+
+
+def _core_payload(limit):
+    rows = fetch_song_rows(song_rows_select().order_by(Song.created_at.desc()).limit(limit))
+    return song_rows_to_dicts(rows, include_user=True)
+
+
+def _measure(build, limit, repeat):
+    """(rows, CPU seconds per row, peak bytes) of one read path."""
+    best_cpu = None
+    for _ in range(repeat):
+        # Start each run cold: no identity map carried over from the last one
+        db.session.expunge_all()
+        started = time.process_time()
+        rows = len(build(limit))
+        cpu = time.process_time() - started
+        best_cpu = cpu if best_cpu is None else min(best_cpu, cpu)
+
+    # tracemalloc slows allocation down, so measure memory in its own run
+    db.session.expunge_all()
+    tracemalloc.start()
+    try:
+        build(limit)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+        db.session.expunge_all()
+
+    return rows, best_cpu / max(rows, 1), peak
+
+
+def benchmark_song_reads(limit=5000, repeat=3):
+    """{'orm': ..., 'core': ...} _measure() results for both read paths."""
+    return {
+        'orm': _measure(_orm_payload, limit, repeat),
+        'core': _measure(_core_payload, limit, repeat),
+    }
@@ -0,0 +1,180 @@
+"""
+Background reconciliation for songs stuck in 'submitted'.
+
+If a provider callback is lost or rejected, a song would stay 'submitted'
+forever. The reconciler periodically picks up submitted songs that have not
+been touched for a while, asks the provider for their task status in batches
+and applies the results through the same code path as the callback.
+"""
+from datetime import datetime, timedelta
+import os
+import requests
+from flask import current_app
+from app import db
+from app.models import Song
+from app.routes.webhooks import apply_task_result
+
+# Suno record-info task states that will never produce audio
+SUNO_FAILED_STATES = {
+    'CREATE_TASK_FAILED',
+    'GENERATE_AUDIO_FAILED',
+    'CALLBACK_EXCEPTION',
+    'SENSITIVE_WORD_ERROR',
+}
+
+
+class SunoTaskClient:
+    """Fetches task status from the Suno record-info API."""
+
+    def __init__(self, api_key=None, status_url=None, timeout=10):
+        self.api_key = api_key or os.getenv('SUNO_API_KEY')
+        self.status_url = status_url or os.getenv(
+            'SUNO_STATUS_URL', 'https://api.sunoapi.org/api/v1/generate/record-info'
+        )
+        self.timeout = timeout
+        self.session = requests.Session()
+
+    def fetch_statuses(self, task_ids):
+        """
+        Return a {task_id: payload} map for the given task ids.
+
+        Payloads are normalized to the callback format understood by
+        apply_task_result. Tasks that are still pending or could not be
+        queried are left out of the map.
+        """
+        if not self.api_key:
+            raise Exception('Suno API key is not configured. Please set SUNO_API_KEY.')
+
+        headers = {'Authorization': f'Bearer {self.api_key}'}
+        results = {}
+
+        for task_id in task_ids:
+            try:
+                response = self.session.get(
+                    self.status_url, params={'taskId': task_id},
+                    headers=headers, timeout=self.timeout
+                )
+                response.raise_for_status()
+                payload = self._normalize(task_id, response.json())
+            except (requests.exceptions.RequestException, ValueError) as e:
+                current_app.logger.warning(f"Reconciler: status lookup failed for task {task_id}: {str(e)}")
+                continue
+
+            if payload:
+                results[task_id] = payload
+
+        return results
+
+    @staticmethod
+    def _normalize(task_id, result):
+        """Convert a record-info response into a callback-style payload."""
+        task = (result or {}).get('data') or {}
+        state = (task.get('status') or '').upper()
+
+        if state in SUNO_FAILED_STATES:
+            return {
+                'task_id': task_id,
+                'status': 'failed',
+                'msg': task.get('errorMessage') or state,
+            }
+
+        if state == 'SUCCESS':
+            response = task.get('response') or {}
+            return {
+                'task_id': task_id,
+                'status': 'completed',
+                'data': response.get('sunoData') or response.get('data') or [],
+            }
+
+        return None
+
+
+class LocalTaskClient:
+    """
+    In-memory stand-in for the provider status API.
+
+    Used in tests and local development: register a callback-style payload
+    per task id with set_result and the reconciler will pick it up.
+    """
+
+    def __init__(self, results=None):
+        self.results = dict(results or {})
+        self.requested = []
+
+    def set_result(self, task_id, payload):
+        self.results[task_id] = payload
+
+    def fetch_statuses(self, task_ids):
+        self.requested.append(list(task_ids))
+        return {task_id: self.results[task_id] for task_id in task_ids if task_id in self.results}
+
+
+def get_task_client():
+    """Build the task status client configured for this app."""
+    if current_app.config.get('RECONCILE_CLIENT') == 'local':
+        return LocalTaskClient()
+    return SunoTaskClient()
+
+
+def stale_songs_query(stale_after, limit, after_id=0):
+    """
+    Query for submitted songs not updated within stale_after.
+
+    Served by the (status, updated_at) index; ordered by id so callers can
+    page through the result set.
+    """
+    cutoff = datetime.utcnow() - stale_after
+    return (
+        Song.query
+        .filter(Song.status == 'submitted', Song.updated_at < cutoff, Song.id > after_id)
+        .filter(Song.speech_task_id.isnot(None))
+        .order_by(Song.id)
+        .limit(limit)
+    )
+
+
+def find_stale_songs(stale_after, limit, after_id=0):
+    """Return the next `limit` stale submitted songs after after_id (see stale_songs_query)."""
+    return stale_songs_query(stale_after, limit, after_id).all()
+
+
+def reconcile_submitted_songs(client=None, stale_minutes=None, batch_size=None):
+    """
+    Run one reconciliation pass over stale submitted songs.
+
+    Returns a summary dict with counts per outcome.
+    """
+    client = client or get_task_client()
+    stale_after = timedelta(minutes=stale_minutes or current_app.config['RECONCILE_STALE_MINUTES'])
+    batch_size = batch_size or current_app.config['RECONCILE_BATCH_SIZE']
+
+    summary = {'checked': 0, 'updated': 0, 'failed': 0, 'pending': 0}
+    last_id = 0
+
+    while True:
+        songs = find_stale_songs(stale_after, batch_size, after_id=last_id)
+        if not songs:
+            break
+        last_id = songs[-1].id
+
+        results = client.fetch_statuses([song.speech_task_id for song in songs])
+
+        for song in songs:
+            summary['checked'] += 1
+            payload = results.get(song.speech_task_id)
+            outcome = apply_task_result(song, payload) if payload else 'ignored'
+
+            if outcome == 'ignored':
+                summary['pending'] += 1
+            else:
+                summary[outcome] += 1
+
+        try:
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            current_app.logger.error(f"Reconciler: Database error: {str(e)}")
+            raise
+
+    current_app.logger.info(f"Reconciler: {summary}")
+    return summary
@@ -1,7 +1,9 @@
 from flask import Blueprint, request, jsonify, redirect, current_app
 from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity
 from app import db, bcrypt
+from app.db_routing import read_replica
 from app.models import User
+from app.user_directory import invalidate as invalidate_user_directory
 import os
 import requests
 from urllib.parse import urlencode
@@ -17,6 +19,34 @@ MICROSOFT_REDIRECT_URI = os.getenv('MICROSOFT_REDIRECT_URI', 'https://speech.aia
 FRONTEND_URL = os.getenv('FRONTEND_URL', 'https://speech.aiacopilot.com')
 
 
+def _escape_like(value):
+    """Escape LIKE wildcards so user input matches literally."""
+    return value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def _allocate_username(base_username):
+    """
+    Return base_username, or base_username_<n> with the lowest free n.
+
+    Fetches every taken candidate in one query instead of probing each
+    counter value in turn.
+    """
+    taken = {
+        username for (username,) in db.session.query(User.username).filter(db.or_(
+            User.username == base_username,
+            User.username.like(f'{_escape_like(base_username)}\\_%', escape='\\')
+        ))
+    }
+
+    if base_username not in taken:
+        return base_username
+
+    counter = 1
+    while f"{base_username}_{counter}" in taken:
+        counter += 1
+    return f"{base_username}_{counter}"
+
+
 @bp.route('/register', methods=['POST'])
 def register():
     """Register a new user."""
@@ -44,6 +74,7 @@ def register():
     try:
         db.session.add(user)
         db.session.commit()
+        invalidate_user_directory()
         return jsonify({
             'message': 'User created successfully',
             'user': user.to_dict()
@@ -81,6 +112,7 @@ def login():
 
 @bp.route('/me', methods=['GET'])
 @jwt_required()
+@read_replica
 def get_current_user():
     """Get current authenticated user."""
     user_id = get_jwt_identity()
@@ -94,11 +126,33 @@ def get_current_user():
 
 @bp.route('/users', methods=['GET'])
 @jwt_required()
+@read_replica
 def get_users():
-    """Get all users (for admin or team view)."""
-    users = User.query.filter_by(is_active=True).all()
+    """
+    Get active users (for admin or team view), ordered by username.
+
+    `q` filters by username prefix. Pages are keyset-paginated: pass the
+    returned `next_cursor` as `after` while `has_more` is true.
+    """
+    limit = min(request.args.get('limit', 50, type=int), 200)
+    prefix = request.args.get('q', '').strip()
+    after = request.args.get('after')
+
+    # Range scan on idx_users_active_username
+    query = User.query.filter_by(is_active=True)
+    if prefix:
+        query = query.filter(User.username.like(f'{_escape_like(prefix)}%', escape='\\'))
+    if after:
+        query = query.filter(User.username > after)
+
+    users = query.order_by(User.username).limit(limit + 1).all()
+    has_more = len(users) > limit
+    users = users[:limit]
+
     return jsonify({
-        'users': [user.to_dict() for user in users]
+        'users': [user.to_dict() for user in users],
+        'next_cursor': users[-1].username if has_more else None,
+        'has_more': has_more
     }), 200
 
 
@@ -191,11 +245,7 @@ def microsoft_callback():
                 # Create new user
                 # Generate unique username from display name
                 base_username = display_name.replace(' ', '_').lower()[:50]
-                username = base_username
-                counter = 1
-                while User.query.filter_by(username=username).first():
-                    username = f"{base_username}_{counter}"
-                    counter += 1
+                username = _allocate_username(base_username)
 
                 user = User(
                     username=username,
@@ -206,6 +256,7 @@ def microsoft_callback():
                 )
                 db.session.add(user)
                 db.session.commit()
+                invalidate_user_directory()
                 current_app.logger.info(f"Created new user from Microsoft: {username}")
 
         if not user.is_active:
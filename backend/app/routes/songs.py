@@ -1,15 +1,47 @@
-from flask import Blueprint, request, jsonify, current_app
-from flask_jwt_extended import jwt_required, get_jwt_identity
+from flask import Blueprint, request, jsonify, current_app, send_file, Response, stream_with_context, url_for
+from flask_jwt_extended import jwt_required, get_jwt_identity, verify_jwt_in_request
 from app import db
-from app.models import Song, Style
+from app.db_routing import read_replica
+from app.models import Song, SongArchive, SongDeletion, SongText, Style
+from app.mirror import clear_local_audio, storage_root
+from app.audio_links import sign_audio_link, verify_audio_link
+from app.coalescing import (SubmissionInFlight, payload_fingerprint, claim_submission, complete_submission,
+                            release_submission)
+from app.idempotency import idempotent
+from app.admission import admission_control
+from app.song_import import SongImportError, import_songs
+from app.generation_queue import queue_for_generation
+from app.submission_scheduler import SubmissionQueueTimeout, submission_slot
+from app.analytics import ROLLUP_ATTRIBUTES, record_bulk_changes, song_analytics
+from app.lyrics_similarity import lyrics_signature, similar_songs
+from app.audio_analysis import clear_audio_analysis, waveforms_for
+from app.song_export import (EXPORT_FORMATS, parse_columns, export_select, export_rows, then_archived_rows,
+                             stream_ndjson, stream_csv)
+from app.song_rows import song_rows_select, fetch_song_rows, song_rows_to_dicts, newest_first
+from datetime import datetime, timedelta
+import base64
+import binascii
+import logging
 import requests
 import os
+import re
+import unicodedata
+from urllib.parse import quote
+from werkzeug.http import dump_options_header
 
 bp = Blueprint('songs', __name__)
+logger = logging.getLogger(__name__)
 
 
-def _submit_to_suno(song):
-    """Submit song to Suno API for generation."""
+def _submit_to_suno(song, wait_for_duplicate=True, recreate=False):
+    """
+    Submit song to Suno API for generation.
+
+    With wait_for_duplicate=False an identical submission still in flight
+    raises SubmissionInFlight instead of holding the calling thread. With
+    recreate=True the submission only coalesces with other recreates of
+    the same song replacing the same task.
+    """
     suno_api_key = os.getenv('SUNO_API_KEY')
     suno_api_url = os.getenv('SUNO_API_URL', 'https://api.sunoapi.org/api/v1/generate')
 
@@ -54,11 +86,22 @@ def _submit_to_suno(song):
         'Content-Type': 'application/json'
     }
 
+    # A user's identical payloads submitted within the coalescing window share one task
+    scope = {'recreate': song.id, 'replaces': song.speech_task_id} if recreate else None
+    payload_hash = payload_fingerprint(payload, song.user_id, scope)
+    shared_task_id = claim_submission(payload_hash, wait=wait_for_duplicate)
+    if shared_task_id:
+        song.speech_task_id = shared_task_id
+        song.status = 'submitted'
+        db.session.commit()
+        return {'data': {'taskId': shared_task_id}, 'coalesced': True}
+
+    submitted = False
     try:
         response = requests.post(suno_api_url, json=payload, headers=headers, timeout=10)
 
         # Log the status code and response for debugging
-        current_app.logger.info(f"Suno API Status: {response.status_code}")
+        logger.info(f"Suno API Status: {response.status_code}")
 
         # Handle specific HTTP error codes with user-friendly messages
         if response.status_code == 401:
@@ -81,7 +124,7 @@ def _submit_to_suno(song):
         result = response.json()
 
         # Log the full response for debugging
-        current_app.logger.info(f"Suno API Response: {result}")
+        logger.info("Suno API Response: %s", result)
 
         # Check for error in response body
         if result and isinstance(result, dict):
@@ -117,10 +160,12 @@ def _submit_to_suno(song):
                               first_item.get('id') or first_item.get('ID'))
 
         if task_id:
-            song.suno_task_id = task_id
-            current_app.logger.info(f"Stored Suno task_id: {task_id} for song {song.id}")
+            song.speech_task_id = task_id
+            complete_submission(payload_hash, task_id)
+            submitted = True
+            logger.info(f"Stored Suno task_id: {task_id} for song {song.id}")
         else:
-            current_app.logger.warning(f"No task_id found in Suno API response for song {song.id}. Full response: {result}")
+            logger.warning("No task_id found in Suno API response for song %s. Full response: %s", song.id, result)
             raise Exception('Suno API did not return a task ID. The request may have failed. Please try again.')
 
         song.status = 'submitted'
@@ -134,75 +179,479 @@ def _submit_to_suno(song):
         raise Exception('Cannot connect to Suno API. Please check your internet connection or try again later.')
     except requests.exceptions.RequestException as e:
         # Catch any other requests exceptions
-        current_app.logger.error(f"Suno API request error: {str(e)}")
+        logger.error(f"Suno API request error: {str(e)}")
         raise Exception(f'Failed to connect to Suno API: {str(e)}')
+    finally:
+        # Let waiting identical submissions retry if this one failed
+        if not submitted:
+            release_submission(payload_hash)
+
+
+def _parse_date_arg(value, end_of_day=False):
+    """Parse an ISO date or datetime query parameter."""
+    parsed = datetime.fromisoformat(value)
+    if end_of_day and len(value) == 10:
+        parsed += timedelta(days=1)
+    return parsed
+
+
+def _apply_song_filters(query, args, model=Song):
+    """
+    Apply the shared list filters from request args to a Song query or select().
+
+    Pass model=SongArchive to filter a select() of songs_archive.
+    Raises ValueError for malformed parameters.
+    """
+    status = args.get('status')
+    style_id = args.get('style_id')
+    vocal_gender = args.get('vocal_gender')
+    voice_name = args.get('voice_name')
+    version = args.get('version')
+    min_stars = args.get('min_stars')
+    max_stars = args.get('max_stars')
+    created_after = args.get('created_after')
+    created_before = args.get('created_before')
+    search = args.get('search')
 
+    # Apply filters
+    if status and status != 'all':
+        query = query.filter(model.status == status)
 
-@bp.route('/', methods=['GET'])
-@jwt_required()
-def get_songs():
-    """Get all songs with filtering and search."""
-    user_id = get_jwt_identity()
+    if style_id:
+        query = query.filter(model.style_id == int(style_id))
 
-    # Get query parameters
-    status = request.args.get('status')
-    style_id = request.args.get('style_id')
-    vocal_gender = request.args.get('vocal_gender')
-    search = request.args.get('search')
-    show_all_users = request.args.get('all_users', 'false').lower() == 'true'
+    if vocal_gender and vocal_gender != 'all':
+        query = query.filter(model.vocal_gender == vocal_gender)
 
-    # Build query
-    query = Song.query
+    if voice_name and voice_name != 'all':
+        query = query.filter(model.voice_name == voice_name)
 
-    # Filter by user unless show_all_users is true
-    if not show_all_users:
-        query = query.filter_by(user_id=user_id)
+    if version and version != 'all':
+        query = query.filter(model.version == version)
 
-    # Apply filters
-    if status and status != 'all':
-        query = query.filter_by(status=status)
+    if min_stars and int(min_stars) > 0:
+        query = query.filter(model.star_rating >= int(min_stars))
 
-    if style_id:
-        query = query.filter_by(style_id=int(style_id))
+    if max_stars:
+        query = query.filter(model.star_rating <= int(max_stars))
 
-    if vocal_gender and vocal_gender != 'all':
-        query = query.filter_by(vocal_gender=vocal_gender)
+    # Date-only values are inclusive of the whole day
+    if created_after:
+        query = query.filter(model.created_at >= _parse_date_arg(created_after))
+
+    if created_before:
+        query = query.filter(model.created_at < _parse_date_arg(created_before, end_of_day=True))
 
     # Apply search
     if search:
         search_pattern = f'%{search}%'
         query = query.filter(
             db.or_(
-                Song.specific_title.like(search_pattern),
-                Song.specific_lyrics.like(search_pattern)
+                model.specific_title.like(search_pattern),
+                model.specific_lyrics.like(search_pattern) if model is SongArchive
+                else Song.texts.has(SongText.specific_lyrics.like(search_pattern))
             )
         )
 
+    return query
+
+
+def _song_facets(statement, archive_statement=None):
+    """
+    Count the filtered songs by status, style, vocal gender and star rating.
+
+    Uses a single GROUP BY over all four columns of the filtered select()
+    (plus one over the filtered songs_archive select(), if given) and folds
+    the (small) result into per-facet counts in Python.
+    """
+    rows = []
+    for model, filtered in ((Song, statement), (SongArchive, archive_statement)):
+        if filtered is not None:
+            rows += db.session.execute(
+                filtered.order_by(None)
+                .with_only_columns(model.status, model.style_id, model.vocal_gender, model.star_rating,
+                                   db.func.count())
+                .group_by(model.status, model.style_id, model.vocal_gender, model.star_rating)
+            ).all()
+
+    facets = {'status': {}, 'style_id': {}, 'vocal_gender': {}, 'star_rating': {}}
+    for status, style_id, vocal_gender, star_rating, count in rows:
+        for name, value in (('status', status), ('style_id', style_id),
+                            ('vocal_gender', vocal_gender), ('star_rating', star_rating or 0)):
+            key = 'none' if value is None else str(value)
+            facets[name][key] = facets[name].get(key, 0) + count
+
+    return facets
+
+
+def _filter_archived(statement, user_id, show_all_users):
+    """Restrict a songs_archive select() like a songs one: to the user unless all_users, then the list filters."""
+    if not show_all_users:
+        statement = statement.where(SongArchive.user_id == user_id)
+    return _apply_song_filters(statement, request.args, SongArchive)
+
+
+@bp.route('/', methods=['GET'])
+@jwt_required()
+@read_replica
+def get_songs():
+    """
+    Get all songs with filtering and search.
+
+    Pass `facets=true` to also get counts per status, style, vocal gender
+    and star rating for the filtered set, and `include_archived=true` to
+    merge in archived songs. Rows are read without the ORM (see
+    app/song_rows.py).
+    """
+    user_id = get_jwt_identity()
+    show_all_users = request.args.get('all_users', 'false').lower() == 'true'
+    include_facets = request.args.get('facets', 'false').lower() == 'true'
+    include_archived = request.args.get('include_archived', 'false').lower() == 'true'
+
+    # Build query
+    statement = song_rows_select()
+
+    # Filter by user unless show_all_users is true
+    if not show_all_users:
+        statement = statement.where(Song.user_id == user_id)
+
+    try:
+        statement = _apply_song_filters(statement, request.args)
+    except ValueError:
+        return jsonify({'error': 'Invalid filter value'}), 400
+
     # Order by creation date (newest first)
-    query = query.order_by(Song.created_at.desc())
+    rows = fetch_song_rows(statement.order_by(Song.created_at.desc()))
+    songs = song_rows_to_dicts(rows, include_user=show_all_users)
+
+    archive_statement = None
+    if include_archived:
+        archive_statement = _filter_archived(song_rows_select(SongArchive), user_id, show_all_users)
+        archived_rows = fetch_song_rows(archive_statement.order_by(SongArchive.created_at.desc()))
+        songs = newest_first(
+            (rows, songs),
+            (archived_rows, song_rows_to_dicts(archived_rows, include_user=show_all_users, archived=True))
+        )
+
+    response = {
+        'songs': songs,
+        'total': len(songs)
+    }
+
+    if include_facets:
+        response['facets'] = _song_facets(statement, archive_statement)
+
+    return jsonify(response), 200
+
+
+@bp.route('/export', methods=['GET'])
+@jwt_required()
+@admission_control('bulk')
+@read_replica
+def export_songs():
+    """
+    Stream songs as NDJSON or CSV for backups and analytics.
+
+    Accepts the list filters plus `format` (ndjson or csv), `columns`
+    (comma-separated, default all), `all_users` and `include_archived`
+    (archived songs follow the others). Memory use is constant regardless
+    of how many songs match.
+    """
+    user_id = get_jwt_identity()
+    show_all_users = request.args.get('all_users', 'false').lower() == 'true'
+    include_archived = request.args.get('include_archived', 'false').lower() == 'true'
+    export_format = request.args.get('format', 'ndjson').lower()
+
+    if export_format not in EXPORT_FORMATS:
+        return jsonify({'error': f"format must be one of: {', '.join(EXPORT_FORMATS)}"}), 400
+
+    try:
+        columns = parse_columns(request.args.get('columns'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    statement = export_select(columns)
+    if not show_all_users:
+        statement = statement.where(Song.user_id == user_id)
+
+    try:
+        statement = _apply_song_filters(statement, request.args)
+    except ValueError:
+        return jsonify({'error': 'Invalid filter value'}), 400
+
+    rows = export_rows(statement, columns)
+    if include_archived:
+        archive_statement = _filter_archived(export_select(columns, SongArchive), user_id, show_all_users)
+        rows = then_archived_rows(rows, archive_statement, columns)
+    body = stream_csv(rows, columns) if export_format == 'csv' else stream_ndjson(rows, columns)
+    filename = f"songs-{datetime.utcnow():%Y%m%d-%H%M%S}.{export_format}"
+
+    return Response(
+        stream_with_context(body),
+        mimetype=EXPORT_FORMATS[export_format],
+        headers={'Content-Disposition': f'attachment; filename="{filename}"'}
+    )
+
+
+@bp.route('/analytics', methods=['GET'])
+@jwt_required()
+@read_replica
+def get_analytics():
+    """
+    Get per-style ratings and status distribution plus weekly completion rates.
+
+    Served from the song_rollups table, so the cost does not grow with the
+    number of songs. `weeks` sets the weekly window (default 12, max 104).
+    """
+    user_id = get_jwt_identity()
+    show_all_users = request.args.get('all_users', 'false').lower() == 'true'
+    weeks = min(max(request.args.get('weeks', 12, type=int), 1), 104)
+
+    return jsonify(song_analytics(user_id=None if show_all_users else user_id, weeks=weeks)), 200
+
+
+# Songs per GET /songs/waveforms request
+MAX_WAVEFORM_SONGS = 100
+
+
+@bp.route('/waveforms', methods=['GET'])
+@jwt_required()
+@read_replica
+def get_waveforms():
+    """Duration, loudness and waveform peaks of the given songs' audio files."""
+    try:
+        song_ids = [int(value) for value in request.args.get('ids', '').split(',') if value.strip()]
+    except ValueError:
+        return jsonify({'error': 'ids must be a comma-separated list of song ids'}), 400
+
+    if not song_ids:
+        return jsonify({'error': 'ids is required'}), 400
+    if len(song_ids) > MAX_WAVEFORM_SONGS:
+        return jsonify({'error': f'At most {MAX_WAVEFORM_SONGS} songs per request'}), 400
+
+    waveforms = waveforms_for(song_ids)
+    return jsonify({'waveforms': {
+        str(song_id): {str(index): track for index, track in tracks.items()}
+        for song_id, tracks in waveforms.items()
+    }}), 200
+
+
+def _encode_sync_cursor(updated_at, song_id, deletion_id, synced_at):
+    """Pack a delta sync position and the time it was issued into an opaque URL-safe cursor."""
+    raw = f"{updated_at.isoformat() if updated_at else ''}|{song_id}|{deletion_id}|{synced_at.isoformat()}"
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def _decode_sync_cursor(cursor):
+    """Unpack a cursor into (updated_at, song_id, deletion_id, synced_at); raises ValueError."""
+    padded = cursor + '=' * (-len(cursor) % 4)
+    parts = base64.urlsafe_b64decode(padded).decode('utf-8').split('|')
+    if len(parts) == 3:
+        # Cursors issued before synced_at was added: fall back to updated_at
+        parts.append(parts[0])
+    timestamp, song_id, deletion_id, synced = parts
+    updated_at = datetime.fromisoformat(timestamp) if timestamp else None
+    synced_at = datetime.fromisoformat(synced) if synced else None
+    return updated_at, int(song_id), int(deletion_id), synced_at
+
+
+@bp.route('/changes', methods=['GET'])
+@jwt_required()
+@read_replica
+def get_song_changes():
+    """
+    Get songs changed since a cursor, plus tombstones for deleted songs.
+
+    Omit `since` for the initial snapshot, then pass back `next_cursor`.
+    Pages are ordered by (updated_at, id); keep calling while `has_more`.
+    A `410` means the cursor was issued before the tombstone retention
+    window and the client must resync from scratch.
+    """
+    # Taken before reading: every tombstone up to now is in this response
+    synced_at = datetime.utcnow()
+    user_id = get_jwt_identity()
+    show_all_users = request.args.get('all_users', 'false').lower() == 'true'
+    limit = min(request.args.get('limit', 500, type=int), 1000)
+
+    since_updated_at, since_id, since_deletion_id = None, 0, 0
+    if request.args.get('since'):
+        try:
+            since_updated_at, since_id, since_deletion_id, since_synced_at = _decode_sync_cursor(request.args['since'])
+        except (ValueError, UnicodeDecodeError, binascii.Error):
+            return jsonify({'error': 'Invalid cursor'}), 400
+
+        # Tombstones written after the cursor was issued may have been pruned since
+        retention = timedelta(days=current_app.config['SYNC_TOMBSTONE_RETENTION_DAYS'])
+        if since_synced_at and since_synced_at < synced_at - retention:
+            return jsonify({'error': 'Cursor expired, full resync required', 'resync': True}), 410
+
+    statement = song_rows_select()
+    if not show_all_users:
+        statement = statement.where(Song.user_id == user_id)
+
+    # Keyset on (updated_at, id), served by idx_songs_user_updated
+    if since_updated_at:
+        statement = statement.where(db.or_(
+            Song.updated_at > since_updated_at,
+            db.and_(Song.updated_at == since_updated_at, Song.id > since_id)
+        ))
+
+    songs = fetch_song_rows(statement.order_by(Song.updated_at, Song.id).limit(limit + 1))
+    has_more = len(songs) > limit
+    songs = songs[:limit]
+
+    deletions_query = SongDeletion.query.filter(SongDeletion.id > since_deletion_id)
+    if not show_all_users:
+        deletions_query = deletions_query.filter_by(user_id=user_id)
+    deletions = deletions_query.order_by(SongDeletion.id).all()
+
+    if songs:
+        last = songs[-1]
+        # On the final page rewind to the start of the last timestamp: rows
+        # written later within the same (second-resolution) timestamp would
+        # otherwise fall behind the cursor. Clients upsert, so repeats are harmless.
+        next_cursor_id = last.id if has_more else 0
+        next_updated_at = last.updated_at
+    else:
+        next_cursor_id, next_updated_at = since_id, since_updated_at
 
-    songs = query.all()
+    next_deletion_id = deletions[-1].id if deletions else since_deletion_id
 
     return jsonify({
-        'songs': [song.to_dict(include_user=show_all_users, include_style=True) for song in songs],
-        'total': len(songs)
+        'songs': song_rows_to_dicts(songs, include_user=show_all_users),
+        'deleted': [deletion.to_dict() for deletion in deletions],
+        'next_cursor': _encode_sync_cursor(next_updated_at, next_cursor_id, next_deletion_id, synced_at),
+        'has_more': has_more
     }), 200
 
 
 @bp.route('/<int:song_id>', methods=['GET'])
 @jwt_required()
+@read_replica
 def get_song(song_id):
-    """Get a specific song."""
+    """Get a specific song; with `include_archived=true` archived songs are found too."""
     song = Song.query.get(song_id)
 
+    if not song and request.args.get('include_archived', 'false').lower() == 'true':
+        song = SongArchive.query.get(song_id)
+
     if not song:
         return jsonify({'error': 'Song not found'}), 404
 
     return jsonify({'song': song.to_dict(include_user=True, include_style=True)}), 200
 
 
+@bp.route('/<int:song_id>/similar', methods=['GET'])
+@jwt_required()
+@read_replica
+def get_similar_songs(song_id):
+    """Songs whose lyrics are near-duplicates of this song's, most similar first."""
+    song = Song.query.get(song_id)
+
+    if not song:
+        return jsonify({'error': 'Song not found'}), 404
+
+    limit = min(max(request.args.get('limit', 10, type=int), 1), 50)
+    signature = song.texts.lyrics_minhash if song.texts else None
+
+    return jsonify({'songs': similar_songs(signature, exclude_song_id=song.id, limit=limit)}), 200
+
+
+def _inline_disposition(filename):
+    """Content-Disposition for filename, built like send_file: RFC 5987 filename* plus an ASCII fallback."""
+    try:
+        filename.encode('ascii')
+    except UnicodeEncodeError:
+        simple = unicodedata.normalize('NFKD', filename).encode('ascii', 'ignore').decode('ascii')
+        names = {'filename': simple, 'filename*': f"UTF-8''{quote(filename, safe='!#$&+-.^_`|~')}"}
+    else:
+        names = {'filename': filename}
+    return dump_options_header('inline', names)
+
+
+@bp.route('/<int:song_id>/audio/<int:index>/link', methods=['GET'])
+@jwt_required()
+@read_replica
+def get_song_audio_link(song_id, index):
+    """Short-lived signed URL of a song's mirrored audio file, for <audio> elements."""
+    if index not in (1, 2):
+        return jsonify({'error': 'Audio index must be 1 or 2'}), 404
+
+    song = Song.query.get(song_id) or SongArchive.query.get(song_id)
+    if not song:
+        return jsonify({'error': 'Song not found'}), 404
+    if not getattr(song, f'audio_path_{index}'):
+        return jsonify({'error': 'Audio is not available locally yet'}), 404
+
+    token = sign_audio_link('song', [song_id, index])
+    return jsonify({
+        'url': url_for('songs.get_song_audio', song_id=song_id, index=index, token=token),
+        'expires_in': current_app.config['AUDIO_LINK_EXPIRES_SECONDS']
+    }), 200
+
+
+@bp.route('/<int:song_id>/audio/<int:index>', methods=['GET'])
+def get_song_audio(song_id, index):
+    """
+    Stream a song's locally mirrored audio file.
+
+    Needs the JWT in the Authorization header, or a `?token=` from the link
+    endpoint so <audio> elements can play it. When AUDIO_ACCEL_REDIRECT_PREFIX
+    is set the file is handed off to nginx via X-Accel-Redirect (sendfile,
+    Range and conditional requests handled there); otherwise it is served
+    with send_file, which supports Range, ETag and If-Modified-Since.
+    """
+    token = request.args.get('token')
+    if token is None:
+        verify_jwt_in_request()
+    elif not verify_audio_link('song', token, [song_id, index]):
+        return jsonify({'error': 'Invalid or expired audio link'}), 403
+
+    if index not in (1, 2):
+        return jsonify({'error': 'Audio index must be 1 or 2'}), 404
+
+    # Archived songs keep their mirrored files
+    song = Song.query.get(song_id) or SongArchive.query.get(song_id)
+
+    if not song:
+        return jsonify({'error': 'Song not found'}), 404
+
+    rel_path = getattr(song, f'audio_path_{index}')
+    if not rel_path:
+        return jsonify({'error': 'Audio is not available locally yet'}), 404
+
+    title = re.sub(r'[/\\?%*:|"<>]', '-', song.specific_title or 'song')
+    filename = f"{title}_{index}_{song.version or 'v1'}.mp3"
+    accel_prefix = current_app.config.get('AUDIO_ACCEL_REDIRECT_PREFIX')
+
+    if accel_prefix:
+        # nginx serves the bytes; the worker only returns headers
+        response = Response(status=200, mimetype='audio/mpeg')
+        response.headers['X-Accel-Redirect'] = f"{accel_prefix.rstrip('/')}/{rel_path}"
+        response.headers['Content-Disposition'] = _inline_disposition(filename)
+        response.headers['Cache-Control'] = 'private, max-age=86400'
+        return response
+
+    path = os.path.join(storage_root(), rel_path)
+    if not os.path.isfile(path):
+        return jsonify({'error': 'Audio file is missing from storage'}), 404
+
+    response = send_file(
+        path,
+        mimetype='audio/mpeg',
+        download_name=filename,
+        conditional=True,
+        etag=getattr(song, f'audio_sha256_{index}') or True,
+        max_age=86400
+    )
+    response.headers['Cache-Control'] = 'private, max-age=86400'
+    return response
+
+
 @bp.route('/', methods=['POST'])
 @jwt_required()
+@admission_control('provider')
+@idempotent('create_song')
 def create_song():
     """Create a new song."""
     user_id = get_jwt_identity()
@@ -214,6 +663,12 @@ def create_song():
         if not style:
             return jsonify({'error': 'Style not found'}), 404
 
+    # Near-duplicates of songs that were already generated; callers can
+    # opt to refuse instead of paying for another generation
+    similar = similar_songs(lyrics_signature(data.get('specific_lyrics')))
+    if similar and data.get('reject_near_duplicates'):
+        return jsonify({'error': 'Songs with nearly identical lyrics already exist', 'similar_songs': similar}), 409
+
     # Create song
     song = Song(
         user_id=user_id,
@@ -227,28 +682,93 @@ def create_song():
     )
 
     try:
-        db.session.add(song)
-        db.session.commit()
-
-        # Submit to Suno API directly if song status is 'create'
         if song.status == 'create':
-            try:
-                _submit_to_suno(song)
-            except Exception as suno_error:
-                # Log the error
-                current_app.logger.error(f"Failed to submit to Suno: {suno_error}")
-                # Return the error to the user with a helpful message
-                db.session.rollback()
-                return jsonify({'error': str(suno_error)}), 500
+            # Submit to Suno API directly. The slot is taken before the song is
+            # written, so a queue timeout leaves nothing behind for a retry to duplicate.
+            with submission_slot('interactive', user_id):
+                db.session.add(song)
+                db.session.commit()
+                try:
+                    _submit_to_suno(song, wait_for_duplicate=False)
+                except SubmissionInFlight:
+                    # A duplicate of a submission still in flight: queue it rather than
+                    # hold this thread; it picks up that submission's task id
+                    queue_for_generation([song.id], user_id, priority='interactive')
+                    return jsonify({
+                        'message': 'Song queued for generation',
+                        'song': song.to_dict(include_user=True, include_style=True),
+                        'similar_songs': similar
+                    }), 202
+                except Exception as suno_error:
+                    # Log the error
+                    logger.error(f"Failed to submit to Suno: {suno_error}")
+                    # Return the error to the user with a helpful message
+                    db.session.rollback()
+                    return jsonify({'error': str(suno_error)}), 500
+        else:
+            db.session.add(song)
+            db.session.commit()
 
         return jsonify({
             'message': 'Song submitted for generation' if song.status == 'submitted' else 'Song created successfully',
-            'song': song.to_dict(include_user=True, include_style=True)
+            'song': song.to_dict(include_user=True, include_style=True),
+            'similar_songs': similar
         }), 201
+    except SubmissionQueueTimeout as e:
+        return jsonify({'error': str(e)}), 503
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+
+@bp.route('/import', methods=['POST'])
+@jwt_required()
+@admission_control('bulk')
+def import_song_file():
+    """
+    Import songs from an uploaded CSV or XLSX file (multipart field `file`).
+
+    The first row holds the column names (title, lyrics, prompt, style,
+    vocal_gender, voice_name, version, star_rating). Invalid rows are
+    reported in `errors` and skipped; the rest are imported. With
+    `generate=true` the imported songs are queued for generation.
+    """
+    user_id = get_jwt_identity()
+    upload = request.files.get('file')
+    generate = request.form.get('generate', request.args.get('generate', 'false')).lower() == 'true'
+
+    if not upload or not upload.filename:
+        return jsonify({'error': 'A CSV or XLSX file is required'}), 400
+
+    try:
+        song_ids, errors, rows_read = import_songs(
+            upload,
+            user_id,
+            status='create' if generate else 'unspecified',
+            max_rows=current_app.config['SONG_IMPORT_MAX_ROWS']
+        )
+    except SongImportError as e:
+        db.session.rollback()
+        # Songs committed before the file turned out to be unreadable stay imported
+        if generate:
+            queue_for_generation(e.song_ids, user_id)
+        return jsonify({'error': str(e), 'imported': len(e.song_ids), 'song_ids': e.song_ids}), 400
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
+    if generate:
+        queue_for_generation(song_ids, user_id)
+
+    logger.info(f"Imported {len(song_ids)} songs for user {user_id} ({len(errors)} errors)")
+    return jsonify({
+        'message': f'Imported {len(song_ids)} of {rows_read} rows',
+        'imported': len(song_ids),
+        'queued': len(song_ids) if generate else 0,
+        'song_ids': song_ids,
+        'errors': errors
+    }), 201 if song_ids else 200
+
 
 @bp.route('/<int:song_id>', methods=['PUT'])
 @jwt_required()
@@ -307,8 +827,122 @@ def update_song(song_id):
         return jsonify({'error': str(e)}), 500
 
 
+# Fields that may be changed through the bulk PATCH endpoint
+BULK_UPDATABLE_FIELDS = ('star_rating', 'downloaded_url_1', 'downloaded_url_2', 'status')
+SONG_STATUSES = ('create', 'submitted', 'completed', 'failed', 'unspecified')
+MAX_BULK_UPDATES = 500
+
+
+def _validate_bulk_changes(changes):
+    """Validate and normalize one item's changes. Returns (changes, error)."""
+    if not isinstance(changes, dict) or not changes:
+        return None, 'changes must be a non-empty object'
+
+    unknown = set(changes) - set(BULK_UPDATABLE_FIELDS)
+    if unknown:
+        return None, f"Fields cannot be bulk updated: {', '.join(sorted(unknown))}"
+
+    normalized = {}
+    if 'star_rating' in changes:
+        rating = changes['star_rating']
+        if not isinstance(rating, int) or isinstance(rating, bool) or rating < 0 or rating > 5:
+            return None, 'Star rating must be between 0 and 5'
+        normalized['star_rating'] = rating
+    if 'status' in changes:
+        if changes['status'] not in SONG_STATUSES:
+            return None, 'Invalid status'
+        normalized['status'] = changes['status']
+    for field in ('downloaded_url_1', 'downloaded_url_2'):
+        if field in changes:
+            normalized[field] = bool(changes[field])
+
+    return normalized, None
+
+
+@bp.route('/', methods=['PATCH'])
+@jwt_required()
+def bulk_update_songs():
+    """
+    Apply small field changes to many songs at once.
+
+    Accepts a list of {"id": ..., "changes": {...}} (or {"updates": [...]}).
+    Ownership is checked with a single query and songs sharing the same
+    change set are updated with one UPDATE statement.
+    """
+    user_id = get_jwt_identity()
+    data = request.get_json(silent=True)
+    items = data.get('updates') if isinstance(data, dict) else data
+
+    if not isinstance(items, list) or not items:
+        return jsonify({'error': 'A list of {id, changes} updates is required'}), 400
+    if len(items) > MAX_BULK_UPDATES:
+        return jsonify({'error': f'At most {MAX_BULK_UPDATES} updates per request'}), 400
+
+    results = {}
+    pending = []
+    for position, item in enumerate(items):
+        song_id = item.get('id') if isinstance(item, dict) else None
+        if not isinstance(song_id, int) or isinstance(song_id, bool):
+            results[('invalid', position)] = {'id': song_id, 'ok': False, 'error': 'id must be an integer'}
+            continue
+        changes, error = _validate_bulk_changes(item.get('changes'))
+        if error:
+            results[song_id] = {'id': song_id, 'ok': False, 'error': error}
+        else:
+            pending.append((song_id, changes))
+
+    # Ownership check for every requested song in one query; the current
+    # values also feed the analytics rollups
+    current_rows = [
+        row._asdict() for row in
+        db.session.query(Song.id, *(getattr(Song, name) for name in ROLLUP_ATTRIBUTES))
+        .filter(Song.id.in_([song_id for song_id, _ in pending]))
+        .all()
+    ] if pending else []
+    owners = {row['id']: row['user_id'] for row in current_rows}
+
+    # Group songs by identical change set -> one UPDATE per group
+    groups = {}
+    for song_id, changes in pending:
+        if song_id not in owners:
+            results[song_id] = {'id': song_id, 'ok': False, 'error': 'Song not found'}
+        elif owners[song_id] != user_id:
+            results[song_id] = {'id': song_id, 'ok': False, 'error': 'Unauthorized to update this song'}
+        else:
+            groups.setdefault(tuple(sorted(changes.items())), []).append(song_id)
+
+    try:
+        now = datetime.utcnow()
+        for change_set, song_ids in groups.items():
+            values = dict(change_set)
+            values['updated_at'] = now
+            db.session.execute(
+                db.update(Song)
+                .where(Song.id.in_(song_ids), Song.user_id == user_id)
+                .values(**values)
+                .execution_options(synchronize_session=False)
+            )
+            for song_id in song_ids:
+                results[song_id] = {'id': song_id, 'ok': True}
+        record_bulk_changes(
+            [row for row in current_rows if row['user_id'] == user_id],
+            {song_id: dict(change_set) for change_set, song_ids in groups.items() for song_id in song_ids}
+        )
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+    return jsonify({
+        'results': list(results.values()),
+        'updated': sum(len(song_ids) for song_ids in groups.values())
+    }), 200
+
+
 @bp.route('/<int:song_id>/recreate', methods=['POST'])
 @jwt_required()
+@admission_control('provider')
+@idempotent('recreate_song')
 def recreate_song(song_id):
     """Recreate/regenerate an existing song."""
     user_id = get_jwt_identity()
@@ -322,26 +956,41 @@ def recreate_song(song_id):
         return jsonify({'error': 'Unauthorized to recreate this song'}), 403
 
     try:
-        # Reset download URLs and submit to Suno
-        song.download_url_1 = None
-        song.download_url_2 = None
-        song.status = 'create'
+        # Wait for a submission slot before resetting anything: a queue
+        # timeout must leave the song and its audio as they were
+        with submission_slot('recreate', user_id):
+            # Reset download URLs and submit to Suno
+            song.download_url_1 = None
+            song.download_url_2 = None
+            clear_local_audio(song)
+            clear_audio_analysis(song)
+            song.status = 'create'
 
-        # Access style relationship before commit to ensure it's loaded
-        _ = song.style
+            # Access style relationship before commit to ensure it's loaded
+            _ = song.style
 
-        db.session.commit()
+            db.session.commit()
 
-        # Submit to Suno API
-        _submit_to_suno(song)
+            # Submit to Suno API
+            _submit_to_suno(song, wait_for_duplicate=False, recreate=True)
 
         return jsonify({
             'message': 'Song submitted for regeneration',
             'song': song.to_dict(include_user=True, include_style=True)
         }), 200
+    except SubmissionInFlight:
+        # Same as in create_song: queue instead of waiting for the identical submission
+        queue_for_generation([song.id], user_id, priority='recreate')
+        return jsonify({
+            'message': 'Song queued for regeneration',
+            'song': song.to_dict(include_user=True, include_style=True)
+        }), 202
+    except SubmissionQueueTimeout as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 503
     except Exception as e:
         db.session.rollback()
-        current_app.logger.error(f"Error in recreate_song: {str(e)}", exc_info=True)
+        logger.error(f"Error in recreate_song: {str(e)}", exc_info=True)
         import traceback
         return jsonify({'error': str(e), 'traceback': traceback.format_exc()}), 500
 
@@ -349,9 +998,9 @@ def recreate_song(song_id):
 @bp.route('/<int:song_id>', methods=['DELETE'])
 @jwt_required()
 def delete_song(song_id):
-    """Delete a song."""
+    """Delete a song, or an archived one, with its mirrored audio."""
     user_id = get_jwt_identity()
-    song = Song.query.get(song_id)
+    song = Song.query.get(song_id) or SongArchive.query.get(song_id)
 
     if not song:
         return jsonify({'error': 'Song not found'}), 404
@@ -361,6 +1010,9 @@ def delete_song(song_id):
         return jsonify({'error': 'Unauthorized to delete this song'}), 403
 
     try:
+        clear_local_audio(song)
+        # Tombstone for clients syncing through /songs/changes
+        db.session.add(SongDeletion(song_id=song.id, user_id=song.user_id))
         db.session.delete(song)
         db.session.commit()
         return jsonify({'message': 'Song deleted successfully'}), 200
@@ -371,10 +1023,12 @@ def delete_song(song_id):
 
 @bp.route('/stats', methods=['GET'])
 @jwt_required()
+@read_replica
 def get_stats():
-    """Get song statistics."""
+    """Get song statistics; `include_archived=true` adds archived songs and an `archived` count."""
     user_id = get_jwt_identity()
     show_all_users = request.args.get('all_users', 'false').lower() == 'true'
+    include_archived = request.args.get('include_archived', 'false').lower() == 'true'
 
     # Build base query
     base_query = Song.query if show_all_users else Song.query.filter_by(user_id=user_id)
@@ -394,4 +1048,15 @@ def get_stats():
         'unspecified': base_query.filter_by(status='unspecified').count()
     }
 
+    if include_archived:
+        # Only completed and failed songs are archived
+        archive_query = SongArchive.query if show_all_users else SongArchive.query.filter_by(user_id=user_id)
+        stats['archived'] = archive_query.count()
+        stats['total'] += stats['archived']
+        stats['completed'] += archive_query.filter(
+            SongArchive.status == 'completed',
+            db.or_(SongArchive.download_url_1.isnot(None), SongArchive.download_url_2.isnot(None))
+        ).count()
+        stats['failed'] += archive_query.filter_by(status='failed').count()
+
     return jsonify(stats), 200
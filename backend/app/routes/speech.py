@@ -1,6 +1,11 @@
-from flask import Blueprint, request, jsonify, Response, current_app
-from flask_jwt_extended import jwt_required
-import requests
+from flask import Blueprint, request, jsonify, Response, current_app, send_file, url_for
+from flask_jwt_extended import jwt_required, get_jwt_identity, verify_jwt_in_request
+from app import db
+from app.audio_links import sign_audio_link, verify_audio_link
+from app.mirror import storage_root
+from app.models import SpeechJob
+from app.admission import admission_control
+from app.speech_jobs import SpeechSynthesisError, validate_speech_request, synthesize, start_speech_job, expire_if_stale
 import os
 
 bp = Blueprint('speech', __name__)
@@ -8,70 +13,120 @@ bp = Blueprint('speech', __name__)
 
 @bp.route('/synthesize', methods=['POST'])
 @jwt_required()
+@admission_control('provider')
 def synthesize_speech():
-    """Synthesize speech from text using Azure Speech API."""
-    data = request.get_json()
+    """
+    Synthesize speech from text using Azure Speech API.
 
-    text = data.get('text', '').strip()
-    voice_name = data.get('voice_name', 'en-US-AndrewMultilingualNeural')
-
-    if not text:
-        return jsonify({'error': 'Text is required'}), 400
+    Blocks until the audio is ready; use POST /speech/jobs for long texts.
+    """
+    try:
+        text, voice_name = validate_speech_request(request.get_json(silent=True))
+        audio = synthesize(text, voice_name)
+    except SpeechSynthesisError as e:
+        return jsonify({'error': str(e)}), e.status_code
+
+    # Return audio as binary response
+    return Response(
+        audio,
+        mimetype='audio/mpeg',
+        headers={
+            'Content-Disposition': 'attachment; filename="speech.mp3"'
+        }
+    )
+
+
+def _job_response(job):
+    data = job.to_dict()
+    if job.status == 'completed':
+        # Signed so <audio> elements can play it without the JWT in the URL
+        data['audio_url'] = url_for('speech.get_speech_job_audio', job_id=job.id,
+                                    token=sign_audio_link('speech', job.id))
+    return data
+
+
+@bp.route('/jobs', methods=['POST'])
+@jwt_required()
+def create_speech_job():
+    """Queue a synthesis job and return its id immediately."""
+    user_id = get_jwt_identity()
 
-    # Limit text length
-    if len(text) > 10000:
-        return jsonify({'error': 'Text exceeds maximum length of 10000 characters'}), 400
+    try:
+        text, voice_name = validate_speech_request(request.get_json(silent=True))
+    except SpeechSynthesisError as e:
+        return jsonify({'error': str(e)}), e.status_code
 
-    azure_speech_key = os.getenv('AZURE_SPEECH_KEY')
-    azure_speech_region = os.getenv('AZURE_SPEECH_REGION', 'eastus2')
+    try:
+        job = start_speech_job(user_id, text, voice_name)
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
 
-    if not azure_speech_key:
-        return jsonify({'error': 'Azure Speech API key is not configured'}), 500
+    response = jsonify({'job': _job_response(job)})
+    response.status_code = 202
+    response.headers['Location'] = url_for('speech.get_speech_job', job_id=job.id)
+    return response
 
-    # Azure TTS endpoint
-    tts_endpoint = f'https://{azure_speech_region}.tts.speech.microsoft.com/cognitiveservices/v1'
 
-    # Build SSML
-    ssml = f'''<speak version='1.0' xmlns='http://www.w3.org/2001/10/synthesis' xml:lang='en-US'>
-        <voice name='{voice_name}'>
-            {text}
-        </voice>
-    </speak>'''
+def _get_own_job(job_id):
+    job = db.session.get(SpeechJob, job_id)
+    if not job or job.user_id != get_jwt_identity():
+        return None
+    return job
 
-    headers = {
-        'Ocp-Apim-Subscription-Key': azure_speech_key,
-        'Content-Type': 'application/ssml+xml',
-        'X-Microsoft-OutputFormat': 'audio-16khz-128kbitrate-mono-mp3'
-    }
 
-    try:
-        response = requests.post(tts_endpoint, data=ssml.encode('utf-8'), headers=headers, timeout=30)
-
-        if response.status_code == 401:
-            return jsonify({'error': 'Azure Speech API authentication failed'}), 500
-        elif response.status_code == 403:
-            return jsonify({'error': 'Azure Speech API access denied'}), 500
-        elif response.status_code == 429:
-            return jsonify({'error': 'Rate limit exceeded. Please try again later.'}), 429
-        elif response.status_code >= 500:
-            return jsonify({'error': 'Azure Speech API is unavailable'}), 503
-
-        response.raise_for_status()
-
-        # Return audio as binary response
-        return Response(
-            response.content,
-            mimetype='audio/mpeg',
-            headers={
-                'Content-Disposition': 'attachment; filename="speech.mp3"'
-            }
-        )
-
-    except requests.exceptions.Timeout:
-        return jsonify({'error': 'Request timed out'}), 504
-    except requests.exceptions.RequestException as e:
-        current_app.logger.error(f"Speech synthesis error: {str(e)}")
-        return jsonify({'error': 'Failed to synthesize speech'}), 500
+@bp.route('/jobs/<job_id>', methods=['GET'])
+@jwt_required()
+def get_speech_job(job_id):
+    """Get a synthesis job's status; completed jobs include `audio_url`."""
+    job = _get_own_job(job_id)
+
+    if not job:
+        return jsonify({'error': 'Job not found'}), 404
+
+    if expire_if_stale(job):
+        try:
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            return jsonify({'error': str(e)}), 500
+
+    response = jsonify({'job': _job_response(job)})
+    if job.status in ('queued', 'running'):
+        response.headers['Retry-After'] = '2'
+    return response, 200
+
+
+@bp.route('/jobs/<job_id>/audio', methods=['GET'])
+def get_speech_job_audio(job_id):
+    """Serve a completed job's MP3 (JWT in the header, or the signed `?token=` of its audio_url)."""
+    token = request.args.get('token')
+    if token is None:
+        verify_jwt_in_request()
+        job = _get_own_job(job_id)
+    elif verify_audio_link('speech', token, job_id):
+        job = db.session.get(SpeechJob, job_id)
+    else:
+        return jsonify({'error': 'Invalid or expired audio link'}), 403
+
+    if not job:
+        return jsonify({'error': 'Job not found'}), 404
+
+    if job.status != 'completed' or not job.audio_path:
+        return jsonify({'error': 'Audio is not ready yet', 'status': job.status}), 409
+
+    accel_prefix = current_app.config.get('AUDIO_ACCEL_REDIRECT_PREFIX')
+    if accel_prefix:
+        response = Response(status=200, mimetype='audio/mpeg')
+        response.headers['X-Accel-Redirect'] = f"{accel_prefix.rstrip('/')}/{job.audio_path}"
+        response.headers['Content-Disposition'] = 'inline; filename="speech.mp3"'
+        return response
+
+    path = os.path.join(storage_root(), job.audio_path)
+    if not os.path.isfile(path):
+        return jsonify({'error': 'Audio file is missing from storage'}), 404
+
+    return send_file(path, mimetype='audio/mpeg', download_name='speech.mp3', conditional=True)
 
 
 @bp.route('/voices', methods=['GET'])
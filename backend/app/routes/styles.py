@@ -1,6 +1,7 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from app import db
+from app.db_routing import read_replica
 from app.models import Style
 
 bp = Blueprint('styles', __name__)
@@ -8,6 +9,7 @@ bp = Blueprint('styles', __name__)
 
 @bp.route('/', methods=['GET'])
 @jwt_required()
+@read_replica
 def get_styles():
     """Get all styles."""
     styles = Style.query.order_by(Style.name).all()
@@ -19,6 +21,7 @@ def get_styles():
 
 @bp.route('/<int:style_id>', methods=['GET'])
 @jwt_required()
+@read_replica
 def get_style(style_id):
     """Get a specific style."""
     style = Style.query.get(style_id)
@@ -121,10 +124,11 @@ def delete_style(style_id):
         return jsonify({'error': 'You can only delete styles you created'}), 403
 
     # Check if style is being used by any songs
-    if style.songs.count() > 0:
+    songs_count = style.songs.count()
+    if songs_count > 0:
         return jsonify({
             'error': 'Cannot delete style that is being used by songs',
-            'songs_count': style.songs.count()
+            'songs_count': songs_count
         }), 409
 
     try:
@@ -1,9 +1,92 @@
-from flask import Blueprint, request, jsonify, current_app
+from flask import Blueprint, request, jsonify
 from app import db
 from app.models import Song
-import json
+from app.coalescing import finish_task
+import logging
 
 bp = Blueprint('webhooks', __name__)
+logger = logging.getLogger(__name__)
+
+
+def _extract_audio_url(item):
+    """Pull the audio URL out of a single result item."""
+    return (
+        item.get('audio_url') or
+        item.get('audioUrl') or
+        item.get('url') or
+        item.get('audio')
+    )
+
+
+def apply_task_result(song, data):
+    """
+    Apply a provider task result to a song.
+
+    Shared by the callback endpoint and the background reconciler so both
+    paths interpret provider payloads identically. Changes are left on the
+    session; the caller is responsible for committing.
+
+    Returns one of:
+        'failed'  - the song was marked as failed
+        'updated' - download URLs were stored (status may now be 'completed')
+        'ignored' - the payload carried no usable result yet
+    """
+    # Check status (handle multiple possible status indicators)
+    status = (data.get('status') or '').lower()
+    msg = data.get('msg', '') or data.get('message', '') or ''
+
+    is_success = (
+        status in ['completed', 'success', 'done'] or
+        'successfully' in msg.lower() or
+        'complete' in msg.lower()
+    )
+
+    # Handle failure status
+    if status in ['failed', 'error', 'failure']:
+        song.status = 'failed'
+        logger.error(f"Task result: Song {song.id} generation failed: {msg}")
+        return 'failed'
+
+    # Extract audio data (handle multiple possible structures)
+    audio_data = data.get('data', [])
+
+    # If data is a dict with nested songs/clips/data array
+    if isinstance(audio_data, dict):
+        audio_data = (
+            audio_data.get('data') or  # API format: data.data.data[]
+            audio_data.get('songs') or
+            audio_data.get('clips') or
+            audio_data.get('results') or
+            []
+        )
+
+    # Ensure it's a list
+    if not isinstance(audio_data, list):
+        audio_data = [audio_data] if audio_data else []
+
+    logger.info(f"Task result: Found {len(audio_data)} audio items for song {song.id}")
+
+    if not (is_success and audio_data):
+        logger.warning(f"Task result: Unexpected payload for song {song.id}: is_success={is_success}, audio_data_len={len(audio_data)}")
+        return 'ignored'
+
+    # Extract audio URLs (try multiple possible field names)
+    if len(audio_data) > 0:
+        song.download_url_1 = _extract_audio_url(audio_data[0])
+        logger.info(f"Task result: download_url_1 = {song.download_url_1}")
+
+    if len(audio_data) > 1:
+        song.download_url_2 = _extract_audio_url(audio_data[1])
+        logger.info(f"Task result: download_url_2 = {song.download_url_2}")
+
+    # Only mark as completed when BOTH files are ready
+    if song.download_url_1 and song.download_url_2:
+        song.status = 'completed'
+        logger.info(f"Task result: Song {song.id} marked as completed (both URLs ready)")
+    else:
+        logger.info(f"Task result: Song {song.id} still waiting for both URLs (url1: {bool(song.download_url_1)}, url2: {bool(song.download_url_2)})")
+
+    return 'updated'
 
 
 @bp.route('/azure-speech-callback', methods=['POST'])
@@ -36,10 +119,10 @@ def azure_speech_callback():
     data = request.get_json()
 
     # Log the raw callback for debugging
-    current_app.logger.info(f"Azure Speech callback received: {json.dumps(data, indent=2)}")
+    logger.info("Azure Speech callback received: %s", data)
 
     if not data:
-        current_app.logger.error("Azure Speech callback: No data received")
+        logger.error("Azure Speech callback: No data received")
         return jsonify({'error': 'No data received'}), 400
 
     # Extract task_id (try multiple possible field names and locations)
@@ -50,110 +133,52 @@ def azure_speech_callback():
         task_id = data['data'].get('task_id') or data['data'].get('taskId')
 
     if not task_id:
-        current_app.logger.error(f"Azure Speech callback: No task_id found in payload: {data}")
+        logger.error("Azure Speech callback: No task_id found in payload: %s", data)
         return jsonify({'error': 'task_id is required'}), 400
 
-    # Find song by speech task ID
-    song = Song.query.filter_by(speech_task_id=task_id).first()
+    # Find songs by speech task ID (coalesced submissions share one task)
+    songs = Song.query.filter_by(speech_task_id=task_id).all()
 
-    if not song:
-        current_app.logger.error(f"Azure Speech callback: No song found for task_id: {task_id}")
+    if not songs:
+        logger.error(f"Azure Speech callback: No song found for task_id: {task_id}")
         return jsonify({'error': f'Song not found for task_id: {task_id}'}), 404
 
-    current_app.logger.info(f"Azure Speech callback: Found song {song.id} for task_id {task_id}")
-
-    # Check status (handle multiple possible status indicators)
-    status = data.get('status', '').lower()
-    msg = data.get('msg', '') or data.get('message', '')
-
-    is_success = (
-        status in ['completed', 'success', 'done'] or
-        'successfully' in msg.lower() or
-        'complete' in msg.lower()
-    )
+    song = songs[0]
+    logger.info(f"Azure Speech callback: Found songs {[s.id for s in songs]} for task_id {task_id}")
 
-    # Handle failure status
-    if status in ['failed', 'error', 'failure']:
-        song.status = 'failed'
-        current_app.logger.error(f"Azure Speech callback: Song {song.id} generation failed: {msg}")
-        try:
-            db.session.commit()
-            return jsonify({
-                'message': 'Song marked as failed',
-                'error': msg
-            }), 200
-        except Exception as e:
-            db.session.rollback()
-            return jsonify({'error': str(e)}), 500
+    outcome = 'ignored'
+    for item in songs:
+        outcome = apply_task_result(item, data)
 
-    # Extract audio data (handle multiple possible structures)
-    audio_data = data.get('data', [])
+    if outcome == 'ignored':
+        # Log but still return 200 to acknowledge receipt
+        return jsonify({
+            'message': 'Callback received but no audio data found',
+            'status_received': (data.get('status') or '').lower(),
+            'msg_received': data.get('msg', '') or data.get('message', '')
+        }), 200
 
-    # If data is a dict with nested songs/clips/data array
-    if isinstance(audio_data, dict):
-        audio_data = (
-            audio_data.get('data') or  # API format: data.data.data[]
-            audio_data.get('songs') or
-            audio_data.get('clips') or
-            audio_data.get('results') or
-            []
-        )
+    try:
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Azure Speech callback: Database error: {str(e)}")
+        return jsonify({'error': str(e)}), 500
 
-    # Ensure it's a list
-    if not isinstance(audio_data, list):
-        audio_data = [audio_data] if audio_data else []
+    finish_task(task_id)
 
-    current_app.logger.info(f"Azure Speech callback: Found {len(audio_data)} audio items")
-
-    if is_success and audio_data:
-        # Extract audio URLs (try multiple possible field names)
-        if len(audio_data) > 0:
-            item = audio_data[0]
-            song.download_url_1 = (
-                item.get('audio_url') or
-                item.get('audioUrl') or
-                item.get('url') or
-                item.get('audio')
-            )
-            current_app.logger.info(f"Azure Speech callback: download_url_1 = {song.download_url_1}")
-
-        if len(audio_data) > 1:
-            item = audio_data[1]
-            song.download_url_2 = (
-                item.get('audio_url') or
-                item.get('audioUrl') or
-                item.get('url') or
-                item.get('audio')
-            )
-            current_app.logger.info(f"Azure Speech callback: download_url_2 = {song.download_url_2}")
-
-        # Only mark as completed when BOTH files are ready
-        if song.download_url_1 and song.download_url_2:
-            song.status = 'completed'
-            current_app.logger.info(f"Suno callback: Song {song.id} marked as completed (both URLs ready)")
-        else:
-            current_app.logger.info(f"Suno callback: Song {song.id} still waiting for both URLs (url1: {bool(song.download_url_1)}, url2: {bool(song.download_url_2)})")
-
-        try:
-            db.session.commit()
-            current_app.logger.info(f"Azure Speech callback: Song {song.id} updated successfully")
-            return jsonify({
-                'message': 'Song updated successfully',
-                'song': song.to_dict(include_user=True, include_style=True)
-            }), 200
-        except Exception as e:
-            db.session.rollback()
-            current_app.logger.error(f"Azure Speech callback: Database error: {str(e)}")
-            return jsonify({'error': str(e)}), 500
-    else:
-        # Log but still return 200 to acknowledge receipt
-        current_app.logger.warning(f"Azure Speech callback: Unexpected payload for song {song.id}: is_success={is_success}, audio_data_len={len(audio_data)}")
+    if outcome == 'failed':
         return jsonify({
-            'message': 'Callback received but no audio data found',
-            'status_received': status,
-            'msg_received': msg
+            'message': 'Song marked as failed',
+            'error': data.get('msg', '') or data.get('message', '')
         }), 200
 
+    logger.info(f"Azure Speech callback: Song {song.id} updated successfully")
+    return jsonify({
+        'message': 'Song updated successfully',
+        'song': song.to_dict(include_user=True, include_style=True, include_texts=False)
+    }), 200
+
 
 @bp.route('/test', methods=['GET', 'POST'])
 def test_webhook():
@@ -166,7 +191,7 @@ def test_webhook():
         return jsonify({'status': 'ok', 'message': 'Webhook endpoint is accessible'}), 200
 
     data = request.get_json()
-    current_app.logger.info(f"Test webhook received: {json.dumps(data, indent=2) if data else 'No data'}")
+    logger.info("Test webhook received: %s", data if data else 'No data')
     return jsonify({
         'status': 'ok',
         'received': data
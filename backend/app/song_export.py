@@ -0,0 +1,143 @@
+"""
+Streaming song export (GET /songs/export).
+
+Rows are read by a Core select() with a server-side cursor (yield_per) as
+plain column tuples and serialized straight from them, so neither the ORM
+identity map nor the response grows with the table: each batch is
+serialized and handed to the client before the next one is fetched.
+Nothing else may query on the session while the cursor is open (PyMySQL
+discards the rest of an unbuffered result when the connection is reused),
+so creator names are joined from users rather than looked up per row.
+With include_archived, songs_archive is read the same way after songs.
+"""
+import csv
+from datetime import datetime
+import io
+import json
+from app import db
+from app.models import Song, SongArchive, SongText, Style, User
+
+YIELD_PER = 1000
+
+EXPORT_FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+
+# Exportable columns, in default output order
+EXPORT_COLUMNS = {
+    'id': Song.id,
+    'user_id': Song.user_id,
+    'creator': User.username.label('creator'),
+    'status': Song.status,
+    'specific_title': Song.specific_title,
+    'version': Song.version,
+    'star_rating': Song.star_rating,
+    'style_id': Song.style_id,
+    'style_name': Style.name,
+    'vocal_gender': Song.vocal_gender,
+    'voice_name': Song.voice_name,
+    'lyrics_preview': Song.lyrics_preview,
+    'specific_lyrics': SongText.specific_lyrics,
+    'prompt_to_generate': SongText.prompt_to_generate,
+    'download_url_1': Song.download_url_1,
+    'download_url_2': Song.download_url_2,
+    'speech_task_id': Song.speech_task_id,
+    'created_at': Song.created_at,
+    'updated_at': Song.updated_at,
+}
+
+TEXT_COLUMNS = {'specific_lyrics', 'prompt_to_generate'}
+
+# songs_archive carries the texts itself, so it never needs song_texts
+ARCHIVE_EXPORT_COLUMNS = {
+    **{name: getattr(SongArchive, name) for name in EXPORT_COLUMNS if name not in ('creator', 'style_name')},
+    'creator': User.username.label('creator'),
+    'style_name': Style.name,
+}
+
+
+def parse_columns(value):
+    """Validate a comma-separated column list; None or '' selects all columns."""
+    if not value:
+        return list(EXPORT_COLUMNS)
+
+    columns = [name.strip() for name in value.split(',') if name.strip()]
+    unknown = [name for name in columns if name not in EXPORT_COLUMNS]
+    if unknown or not columns:
+        raise ValueError(f"Unknown export columns: {', '.join(unknown) or value}")
+    return columns
+
+
+def export_select(columns, model=Song):
+    """
+    select() of the chosen columns, joining users, styles and song_texts only when needed; add filters.
+
+    Pass model=SongArchive to export archived songs.
+    """
+    exportable = ARCHIVE_EXPORT_COLUMNS if model is SongArchive else EXPORT_COLUMNS
+    statement = db.select(*(exportable[name] for name in columns)).select_from(model)
+    if 'creator' in columns:
+        statement = statement.outerjoin(User, User.id == model.user_id)
+    if 'style_name' in columns:
+        statement = statement.outerjoin(Style, Style.id == model.style_id)
+    if model is Song and TEXT_COLUMNS.intersection(columns):
+        statement = statement.outerjoin(SongText, SongText.song_id == Song.id)
+    return statement
+
+
+def export_rows(statement, columns, model=Song):
+    """
+    Run a filtered export_select() statement, one batch at a time.
+
+    The statement is executed immediately (so it runs under the caller's
+    database routing) and rows are fetched lazily as the result is iterated.
+    Yields value tuples in column order.
+    """
+    result = db.session.execute(statement.order_by(model.id).execution_options(yield_per=YIELD_PER))
+    return iter(result.tuples())
+
+
+def then_archived_rows(rows, archive_statement, columns):
+    """
+    Yield rows, then the rows of a filtered export_select(columns, SongArchive).
+
+    The archive is only queried once rows are exhausted: a connection
+    streams one server-side cursor at a time.
+    """
+    yield from rows
+    yield from export_rows(archive_statement, columns, SongArchive)
+
+
+def _serialize(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def stream_ndjson(rows, columns):
+    """Serialize rows as newline-delimited JSON, one chunk per batch."""
+    batch = []
+    for row in rows:
+        batch.append(json.dumps({name: _serialize(value) for name, value in zip(columns, row)}, ensure_ascii=False))
+        if len(batch) >= YIELD_PER:
+            yield '\n'.join(batch) + '\n'
+            batch = []
+    if batch:
+        yield '\n'.join(batch) + '\n'
+
+
+def stream_csv(rows, columns):
+    """Serialize rows as CSV with a header line, one chunk per batch."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+
+    count = 0
+    for row in rows:
+        writer.writerow(['' if value is None else _serialize(value) for value in row])
+        count += 1
+        if count % YIELD_PER == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+
+    yield buffer.getvalue()
@@ -0,0 +1,297 @@
+"""
+Bulk import of songs from CSV or XLSX spreadsheets (POST /songs/import).
+
+Rows are parsed one at a time from the uploaded file, validated, resolved
+against a style name -> id map loaded once up front, and written in chunks
+of IMPORT_CHUNK_SIZE, one transaction per chunk. A chunk is a few Core
+statements instead of ORM inserts:
+
+- one multi-row INSERT into songs; MySQL has no RETURNING, but InnoDB gives
+  the rows of a single multi-row INSERT consecutive ids starting at
+  LAST_INSERT_ID();
+- one INSERT of the chunk's song_texts rows, with their lyrics MinHash;
+- one INSERT of their LSH bucket rows;
+- one upsert of the combined analytics rollup delta.
+
+That is the work the ORM flush hooks would otherwise do row by row. A
+chunk that fails to insert is retried row by row so one bad row does not
+sink its neighbours; every rejected row is reported with its spreadsheet
+row number.
+
+CSV uploads are checked to be UTF-8 in full before the first row is read,
+so an encoding error cannot stop an import half way. If the file still
+turns out to be unreadable after some chunks were committed, the
+SongImportError carries their song ids.
+"""
+import codecs
+import csv
+from datetime import datetime
+import io
+from app import db
+from app.analytics import record_bulk_inserts
+from app.lyrics_similarity import insert_buckets, lyrics_signature
+from app.models import LYRICS_PREVIEW_LENGTH, Song, SongText, Style
+
+IMPORT_CHUNK_SIZE = 500
+READ_BLOCK_SIZE = 64 * 1024
+
+# Accepted header spellings for each song field
+HEADER_ALIASES = {
+    'specific_title': ('specific_title', 'title', 'song_title'),
+    'specific_lyrics': ('specific_lyrics', 'lyrics'),
+    'prompt_to_generate': ('prompt_to_generate', 'prompt'),
+    'style_name': ('style_name', 'style'),
+    'style_id': ('style_id',),
+    'vocal_gender': ('vocal_gender', 'gender', 'vocals'),
+    'voice_name': ('voice_name', 'voice'),
+    'version': ('version',),
+    'star_rating': ('star_rating', 'stars', 'rating'),
+}
+
+VOCAL_GENDERS = ('male', 'female', 'other')
+
+
+class SongImportError(Exception):
+    """The uploaded file cannot be imported (song_ids: songs already committed from it)."""
+
+    def __init__(self, message, song_ids=()):
+        super().__init__(message)
+        self.song_ids = list(song_ids)
+
+
+def _normalize_header(value):
+    return str(value or '').strip().lower().replace(' ', '_').replace('-', '_')
+
+
+def _map_headers(headers):
+    """Map column positions to song fields; raises SongImportError if unusable."""
+    lookup = {alias: field for field, aliases in HEADER_ALIASES.items() for alias in aliases}
+    mapping = {}
+    for position, header in enumerate(headers):
+        field = lookup.get(_normalize_header(header))
+        if field and field not in mapping.values():
+            mapping[position] = field
+
+    if 'specific_title' not in mapping.values() and 'specific_lyrics' not in mapping.values():
+        raise SongImportError('The file needs a title or lyrics column')
+    return mapping
+
+
+def _check_utf8(stream):
+    """Decode the whole upload once, without keeping it, then rewind it."""
+    decoder = codecs.getincrementaldecoder('utf-8-sig')()
+    try:
+        for block in iter(lambda: stream.read(READ_BLOCK_SIZE), b''):
+            decoder.decode(block)
+        decoder.decode(b'', final=True)
+    except UnicodeDecodeError:
+        raise SongImportError('CSV files must be UTF-8 encoded')
+    finally:
+        stream.seek(0)
+
+
+def _iter_csv(stream):
+    """Yield rows from a CSV upload without reading it into memory."""
+    _check_utf8(stream)
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    try:
+        yield from csv.reader(text)
+    except (UnicodeDecodeError, csv.Error) as e:
+        raise SongImportError(f'Could not read the CSV file: {str(e)}')
+    finally:
+        text.detach()
+
+
+def _iter_xlsx(stream):
+    """Yield rows from the first sheet of an XLSX upload."""
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        raise SongImportError('XLSX import requires openpyxl')
+
+    try:
+        workbook = load_workbook(stream, read_only=True, data_only=True)
+    except Exception as e:
+        raise SongImportError(f'Could not read the XLSX file: {str(e)}')
+
+    try:
+        yield from workbook.worksheets[0].iter_rows(values_only=True)
+    finally:
+        workbook.close()
+
+
+def iter_spreadsheet_rows(upload):
+    """
+    Yield (row_number, {field: value}) for each data row of an upload.
+
+    Row numbers match the spreadsheet (the header is row 1). Blank rows
+    are skipped.
+    """
+    filename = (upload.filename or '').lower()
+    if filename.endswith('.xlsx'):
+        rows = _iter_xlsx(upload.stream)
+    elif filename.endswith('.csv'):
+        rows = _iter_csv(upload.stream)
+    else:
+        raise SongImportError('Only .csv and .xlsx files can be imported')
+
+    headers = next(rows, None)
+    if headers is None:
+        raise SongImportError('The file is empty')
+    mapping = _map_headers(headers)
+
+    for row_number, row in enumerate(rows, start=2):
+        values = {}
+        for position, field in mapping.items():
+            value = row[position] if position < len(row) else None
+            if isinstance(value, str):
+                value = value.strip()
+            if value not in (None, ''):
+                values[field] = value
+        if values:
+            yield row_number, values
+
+
+def _build_row(values, user_id, status, style_ids):
+    """Validate one row into (songs row, song_texts row or None). Raises ValueError with a message."""
+    if not values.get('specific_title') and not values.get('specific_lyrics'):
+        raise ValueError('Title or lyrics is required')
+
+    style_id = None
+    if 'style_name' in values:
+        style_id = style_ids.get(str(values['style_name']).lower())
+        if style_id is None:
+            raise ValueError(f"Unknown style: {values['style_name']}")
+    elif 'style_id' in values:
+        try:
+            style_id = int(values['style_id'])
+        except (TypeError, ValueError):
+            raise ValueError(f"Invalid style_id: {values['style_id']}")
+        if style_id not in style_ids.values():
+            raise ValueError(f'Style not found: {style_id}')
+
+    vocal_gender = values.get('vocal_gender')
+    if vocal_gender is not None:
+        vocal_gender = str(vocal_gender).lower()
+        if vocal_gender not in VOCAL_GENDERS:
+            raise ValueError(f"vocal_gender must be one of: {', '.join(VOCAL_GENDERS)}")
+
+    star_rating = values.get('star_rating', 0)
+    try:
+        star_rating = int(star_rating)
+    except (TypeError, ValueError):
+        raise ValueError(f'Invalid star_rating: {star_rating}')
+    if star_rating < 0 or star_rating > 5:
+        raise ValueError('Star rating must be between 0 and 5')
+
+    title = values.get('specific_title')
+    if title is not None and len(str(title)) > 500:
+        raise ValueError('Title must be at most 500 characters')
+
+    lyrics = str(values['specific_lyrics']) if 'specific_lyrics' in values else None
+    prompt = str(values['prompt_to_generate']) if 'prompt_to_generate' in values else None
+    song = {
+        'user_id': user_id,
+        'specific_title': str(title) if title is not None else None,
+        'version': str(values.get('version', 'v1'))[:10],
+        'lyrics_preview': lyrics[:LYRICS_PREVIEW_LENGTH] if lyrics else None,
+        'style_id': style_id,
+        'vocal_gender': vocal_gender,
+        'voice_name': str(values['voice_name']) if 'voice_name' in values else None,
+        'star_rating': star_rating,
+        'status': status,
+    }
+    texts = None
+    if lyrics is not None or prompt is not None:
+        texts = {'specific_lyrics': lyrics, 'prompt_to_generate': prompt}
+    return song, texts
+
+
+def _insert_song_rows(connection, rows):
+    """Insert songs rows with one multi-row INSERT; returns their ids in row order."""
+    table = Song.__table__
+    if connection.dialect.name == 'mysql':
+        first_id = connection.execute(table.insert().values(rows)).lastrowid
+        step = connection.exec_driver_sql('SELECT @@auto_increment_increment').scalar()
+        return [first_id + position * step for position in range(len(rows))]
+
+    result = connection.execute(table.insert().returning(table.c.id, sort_by_parameter_order=True), rows)
+    return list(result.scalars())
+
+
+def _write_songs(rows):
+    """Write (songs row, song_texts row) pairs and their index and rollup rows; returns the new song ids."""
+    now = datetime.utcnow()
+    connection = db.session.connection()
+    songs = [{**song, 'created_at': now, 'updated_at': now} for song, _ in rows]
+    song_ids = _insert_song_rows(connection, songs)
+
+    texts = [
+        {**text, 'song_id': song_id, 'lyrics_minhash': lyrics_signature(text['specific_lyrics'])}
+        for song_id, (_, text) in zip(song_ids, rows) if text is not None
+    ]
+    if texts:
+        connection.execute(SongText.__table__.insert(), texts)
+    insert_buckets(connection, {text['song_id']: text['lyrics_minhash'] for text in texts})
+    record_bulk_inserts(songs)
+    return song_ids
+
+
+def _insert_chunk(chunk, errors):
+    """Write (row_number, row) pairs in one transaction; returns the inserted song ids."""
+    try:
+        song_ids = _write_songs([row for _, row in chunk])
+        db.session.commit()
+        return song_ids
+    except Exception:
+        db.session.rollback()
+
+    # Isolate the rows that the database rejected
+    inserted = []
+    for row_number, row in chunk:
+        try:
+            inserted.extend(_write_songs([row]))
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            errors.append({'row': row_number, 'error': str(getattr(e, 'orig', e))})
+    return inserted
+
+
+def import_songs(upload, user_id, status='unspecified', max_rows=None):
+    """
+    Import songs from an uploaded CSV/XLSX file.
+
+    Returns (song_ids, errors, rows_read). Raises SongImportError when the
+    file itself cannot be imported; its song_ids lists any songs committed
+    before the problem was found.
+    """
+    style_ids = {name.lower(): style_id for style_id, name in db.session.query(Style.id, Style.name)}
+
+    song_ids, errors, chunk = [], [], []
+    rows_read = 0
+
+    try:
+        for row_number, values in iter_spreadsheet_rows(upload):
+            rows_read += 1
+            if max_rows and rows_read > max_rows:
+                errors.append({'row': row_number,
+                               'error': f'Imports are limited to {max_rows} rows; this and later rows were skipped'})
+                break
+
+            try:
+                chunk.append((row_number, _build_row(values, user_id, status, style_ids)))
+            except ValueError as e:
+                errors.append({'row': row_number, 'error': str(e)})
+
+            if len(chunk) >= IMPORT_CHUNK_SIZE:
+                song_ids.extend(_insert_chunk(chunk, errors))
+                chunk = []
+    except SongImportError as e:
+        raise SongImportError(str(e), song_ids) from e
+
+    if chunk:
+        song_ids.extend(_insert_chunk(chunk, errors))
+
+    errors.sort(key=lambda error: error['row'])
+    return song_ids, errors, rows_read
@@ -0,0 +1,141 @@
+"""
+ORM-free reads for the high-volume song list endpoints.
+
+GET /songs and GET /songs/changes can return thousands of songs. Loading
+them as Song objects pays for the identity map, attribute instrumentation
+and a lazy load of each distinct style, which costs more CPU than the query
+itself. Instead these endpoints run a Core select() of exactly the columns
+of the list payload, with the style outer-joined, and serialize the
+resulting rows straight into the same dicts that
+Song.to_dict(include_style=True, include_texts=False) builds. The rows are
+SQLAlchemy's tuple-backed Row records; nothing is added to the session.
+
+`flask benchmark-song-reads` compares this path with the ORM one (see
+app/read_benchmark.py).
+"""
+from datetime import datetime
+import heapq
+from app import db
+from app.models import Song, Style
+from app.user_directory import username_for
+
+
+def song_row_columns(model=Song):
+    """
+    The list columns of songs (or songs_archive) and their styles.
+
+    Selected in this order; song_row_to_dict() unpacks rows positionally.
+    """
+    return (
+        model.id, model.user_id, model.status, model.specific_title, model.version, model.star_rating,
+        model.lyrics_preview, model.style_id, model.vocal_gender, model.voice_name,
+        model.download_url_1, model.downloaded_url_1, model.download_url_2, model.downloaded_url_2,
+        model.audio_size_1, model.audio_size_2, model.speech_task_id, model.created_at, model.updated_at,
+        Style.id.label('joined_style_id'),
+        Style.name.label('style_name'),
+        Style.style_prompt.label('style_prompt'),
+        Style.created_by.label('style_created_by'),
+        Style.created_at.label('style_created_at'),
+        Style.updated_at.label('style_updated_at'),
+    )
+
+
+SONG_ROW_COLUMNS = song_row_columns()
+
+
+def song_rows_select(model=Song):
+    """
+    select() of the list columns of songs and their styles; add filters and ordering.
+
+    Pass model=SongArchive to read archived songs the same way.
+    """
+    columns = SONG_ROW_COLUMNS if model is Song else song_row_columns(model)
+    return db.select(*columns).select_from(model).outerjoin(Style, Style.id == model.style_id)
+
+
+def fetch_song_rows(statement):
+    """Execute a song_rows_select() statement and return its rows."""
+    return db.session.execute(statement).all()
+
+
+def song_row_to_dict(row, include_user=False, username=username_for):
+    """The list representation of a song row, matching Song.to_dict(include_texts=False)."""
+    # Unpacking the tuple is much cheaper than looking up ~25 fields by name
+    (song_id, user_id, status, specific_title, version, star_rating, lyrics_preview, style_id,
+     vocal_gender, voice_name, download_url_1, downloaded_url_1, download_url_2, downloaded_url_2,
+     audio_size_1, audio_size_2, speech_task_id, created_at, updated_at, joined_style_id,
+     style_name, style_prompt, style_created_by, style_created_at, style_updated_at) = row
+
+    data = {
+        'id': song_id,
+        'status': status,
+        'specific_title': specific_title,
+        'version': version or 'v1',
+        'star_rating': star_rating or 0,
+        'lyrics_preview': lyrics_preview,
+        'vocal_gender': vocal_gender,
+        'voice_name': voice_name,
+        'download_url_1': download_url_1,
+        'downloaded_url_1': downloaded_url_1 or False,
+        'download_url_2': download_url_2,
+        'downloaded_url_2': downloaded_url_2 or False,
+        'audio_size_1': audio_size_1,
+        'audio_size_2': audio_size_2,
+        'speech_task_id': speech_task_id,
+        'created_at': created_at.isoformat() if created_at else None,
+        'updated_at': updated_at.isoformat() if updated_at else None
+    }
+
+    if include_user:
+        data['creator'] = username(user_id)
+        data['user_id'] = user_id
+
+    if joined_style_id is not None:
+        data['style'] = {
+            'id': joined_style_id,
+            'name': style_name,
+            'style_prompt': style_prompt,
+            'created_by': username(style_created_by),
+            'created_by_id': style_created_by,
+            'created_at': style_created_at.isoformat() if style_created_at else None,
+            'updated_at': style_updated_at.isoformat() if style_updated_at else None
+        }
+        data['style_name'] = style_name
+    else:
+        data['style_id'] = style_id
+
+    return data
+
+
+def song_rows_to_dicts(rows, include_user=False, archived=False):
+    """
+    song_row_to_dict() of every row, looking up each distinct username once.
+
+    archived=True marks rows read from songs_archive with 'archived': True.
+    """
+    usernames = {}
+
+    def username(user_id):
+        if user_id not in usernames:
+            usernames[user_id] = username_for(user_id)
+        return usernames[user_id]
+
+    songs = [song_row_to_dict(row, include_user, username) for row in rows]
+    if archived:
+        for song in songs:
+            song['archived'] = True
+    return songs
+
+
+def newest_first(*sources):
+    """
+    Merge (rows, dicts) pairs, each already ordered newest first, into one list of dicts.
+
+    Used to interleave songs and archived songs by created_at.
+    """
+    merged = heapq.merge(
+        *(zip(rows, dicts) for rows, dicts in sources),
+        key=lambda pair: pair[0].created_at or datetime.min,
+        reverse=True
+    )
+    return [data for _, data in merged]
@@ -0,0 +1,187 @@
+"""
+Azure text-to-speech synthesis, inline or as background jobs.
+
+Long texts can take longer to synthesize than the proxy and gunicorn
+timeouts allow. POST /speech/jobs stores a SpeechJob and hands it to a
+per-process thread pool (SPEECH_JOB_WORKERS threads); the finished MP3 is
+written to local storage and served by GET /speech/jobs/<id>/audio.
+
+Job state lives in the database so any worker can answer status requests.
+The pool itself is in memory: jobs interrupted by a worker restart are
+reported as failed once they are SPEECH_JOB_STALE_SECONDS old.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+import os
+import threading
+import uuid
+from xml.sax.saxutils import escape
+import requests
+from flask import current_app
+from app import db
+from app.mirror import storage_root
+from app.models import SpeechJob
+
+DEFAULT_VOICE = 'en-US-AndrewMultilingualNeural'
+MAX_TEXT_LENGTH = 10000
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+class SpeechSynthesisError(Exception):
+    """Synthesis failed; status_code is the HTTP status to report."""
+
+    def __init__(self, message, status_code=500):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def validate_speech_request(data):
+    """Return (text, voice_name) from a request body; raises SpeechSynthesisError."""
+    data = data or {}
+    text = (data.get('text') or '').strip()
+    voice_name = data.get('voice_name') or DEFAULT_VOICE
+
+    if not text:
+        raise SpeechSynthesisError('Text is required', 400)
+
+    # Limit text length
+    if len(text) > MAX_TEXT_LENGTH:
+        raise SpeechSynthesisError(f'Text exceeds maximum length of {MAX_TEXT_LENGTH} characters', 400)
+
+    return text, voice_name
+
+
+def synthesize(text, voice_name):
+    """Synthesize text with Azure Speech and return the MP3 bytes."""
+    azure_speech_key = os.getenv('AZURE_SPEECH_KEY')
+    azure_speech_region = os.getenv('AZURE_SPEECH_REGION', 'eastus2')
+
+    if not azure_speech_key:
+        raise SpeechSynthesisError('Azure Speech API key is not configured')
+
+    # Azure TTS endpoint
+    tts_endpoint = f'https://{azure_speech_region}.tts.speech.microsoft.com/cognitiveservices/v1'
+
+    # Build SSML
+    ssml = f'''<speak version='1.0' xmlns='http://www.w3.org/2001/10/synthesis' xml:lang='en-US'>
+        <voice name='{escape(voice_name, {"'": '&apos;'})}'>
+            {escape(text)}
+        </voice>
+    </speak>'''
+
+    headers = {
+        'Ocp-Apim-Subscription-Key': azure_speech_key,
+        'Content-Type': 'application/ssml+xml',
+        'X-Microsoft-OutputFormat': 'audio-16khz-128kbitrate-mono-mp3'
+    }
+
+    try:
+        response = requests.post(tts_endpoint, data=ssml.encode('utf-8'), headers=headers, timeout=30)
+
+        if response.status_code == 401:
+            raise SpeechSynthesisError('Azure Speech API authentication failed')
+        elif response.status_code == 403:
+            raise SpeechSynthesisError('Azure Speech API access denied')
+        elif response.status_code == 429:
+            raise SpeechSynthesisError('Rate limit exceeded. Please try again later.', 429)
+        elif response.status_code >= 500:
+            raise SpeechSynthesisError('Azure Speech API is unavailable', 503)
+
+        response.raise_for_status()
+        return response.content
+
+    except requests.exceptions.Timeout:
+        raise SpeechSynthesisError('Request timed out', 504)
+    except requests.exceptions.RequestException as e:
+        current_app.logger.error(f"Speech synthesis error: {str(e)}")
+        raise SpeechSynthesisError('Failed to synthesize speech')
+
+
+def _get_executor(workers):
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='speech-job')
+        return _executor
+
+
+def _run_job(app, job_id):
+    """Synthesize one job and store its audio, in its own app context."""
+    with app.app_context():
+        try:
+            job = db.session.get(SpeechJob, job_id)
+            if job is None or job.status != 'queued':
+                return
+
+            job.status = 'running'
+            db.session.commit()
+
+            try:
+                audio = synthesize(job.text, job.voice_name)
+
+                rel_path = f"speech/{job.id}.mp3"
+                dest = os.path.join(storage_root(), rel_path)
+                os.makedirs(os.path.dirname(dest), exist_ok=True)
+                with open(f"{dest}.part", 'wb') as fh:
+                    fh.write(audio)
+                os.replace(f"{dest}.part", dest)
+
+                job.audio_path = rel_path
+                job.audio_size = len(audio)
+                job.status = 'completed'
+            except Exception as e:
+                job.status = 'failed'
+                job.error = str(e)[:500]
+                app.logger.error(f"Speech job {job.id} failed: {str(e)}")
+
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            app.logger.error(f"Speech job {job_id}: Database error: {str(e)}")
+        finally:
+            db.session.remove()
+
+
+def start_speech_job(user_id, text, voice_name):
+    """Create a queued job, commit it and schedule it on the thread pool."""
+    job = SpeechJob(id=uuid.uuid4().hex, user_id=user_id, text=text, voice_name=voice_name)
+    db.session.add(job)
+    db.session.commit()
+
+    app = current_app._get_current_object()
+    _get_executor(app.config['SPEECH_JOB_WORKERS']).submit(_run_job, app, job.id)
+    return job
+
+
+def expire_if_stale(job):
+    """Fail a queued/running job whose worker has evidently gone away."""
+    if job.status not in ('queued', 'running'):
+        return False
+
+    stale_after = timedelta(seconds=current_app.config['SPEECH_JOB_STALE_SECONDS'])
+    if job.updated_at and job.updated_at < datetime.utcnow() - stale_after:
+        job.status = 'failed'
+        job.error = 'Synthesis was interrupted, please try again'
+        return True
+    return False
+
+
+def prune_speech_jobs():
+    """Delete jobs (and their audio) older than the retention window. Returns the number removed."""
+    cutoff = datetime.utcnow() - timedelta(hours=current_app.config['SPEECH_JOB_RETENTION_HOURS'])
+    root = storage_root()
+
+    removed = 0
+    for job in SpeechJob.query.filter(SpeechJob.created_at < cutoff).all():
+        if job.audio_path:
+            try:
+                os.remove(os.path.join(root, job.audio_path))
+            except FileNotFoundError:
+                pass
+        db.session.delete(job)
+        removed += 1
+
+    db.session.commit()
+    return removed
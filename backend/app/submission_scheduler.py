@@ -0,0 +1,200 @@
+"""
+Fair-share scheduling of Suno generation submissions.
+
+Every submission to Suno takes a slot from a per-process scheduler with
+SUNO_SUBMIT_CONCURRENCY slots. When slots are scarce, waiting submissions
+are ordered by self-clocked weighted fair queuing over flows of
+(priority, user):
+
+- Each priority class has a weight (SUNO_PRIORITY_WEIGHTS); each of a
+  flow's submissions finishes 1/weight later in virtual time than the
+  previous one, and the smallest finish tag goes first. A new interactive
+  create therefore overtakes queued bulk work, and with the default
+  weights interactive gets 8 slots for every bulk one under contention.
+- Each user has their own flow per class, so a user importing thousands
+  of songs only delays other users' imports by their fair share, not by
+  the length of their backlog.
+- SUNO_PRIORITY_LIMITS caps the slots a class may hold at once; bulk is
+  capped at one so interactive requests always find a free slot quickly.
+
+Interactive and recreate requests wait for their slot in the request
+thread (up to SUNO_QUEUE_TIMEOUT seconds). Bulk submissions are queued as
+jobs and run on the scheduler's own threads once granted.
+
+Like admission control, the scheduler is per worker process; the total
+number of concurrent Suno submissions is workers x SUNO_SUBMIT_CONCURRENCY.
+"""
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+import threading
+import time
+from flask import current_app
+from app import metrics
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+_queue_wait = metrics.summary('suno_queue_wait_seconds', 'Time submissions waited for a Suno submission slot')
+_timeouts = metrics.counter('suno_queue_timeouts_total', 'Submissions that gave up waiting for a slot')
+
+
+class SubmissionQueueTimeout(Exception):
+    """No submission slot became free within SUNO_QUEUE_TIMEOUT."""
+
+
+class _Ticket:
+    __slots__ = ('priority', 'user_id', 'finish', 'job', 'granted', 'enqueued_at')
+
+    def __init__(self, priority, user_id, finish, job):
+        self.priority = priority
+        self.user_id = user_id
+        self.finish = finish
+        self.job = job
+        self.granted = threading.Event()
+        self.enqueued_at = time.monotonic()
+
+
+class FairShareScheduler:
+    """Weighted fair queuing of submission slots across (priority, user) flows."""
+
+    def __init__(self, capacity, weights, class_limits):
+        self.capacity = capacity
+        self.weights = weights
+        self.class_limits = class_limits
+        self.active = dict.fromkeys(weights, 0)
+        self.virtual_time = 0.0
+        self._flows = {}        # (priority, user_id) -> deque of waiting tickets
+        self._last_finish = {}  # (priority, user_id) -> finish tag of the flow's newest ticket
+        self._lock = threading.Lock()
+        self._executor = None
+
+    def _enqueue(self, priority, user_id, job=None):
+        key = (priority, user_id)
+        start = max(self.virtual_time, self._last_finish.get(key, 0.0))
+        ticket = _Ticket(priority, user_id, start + 1.0 / self.weights[priority], job)
+        self._last_finish[key] = ticket.finish
+        self._flows.setdefault(key, deque()).append(ticket)
+        return ticket
+
+    def _dispatch(self):
+        """Grant free slots to the eligible flow heads with the smallest finish tags. Caller holds the lock."""
+        while sum(self.active.values()) < self.capacity:
+            best = None
+            for key, flow in self._flows.items():
+                limit = self.class_limits.get(key[0])
+                if limit is not None and self.active[key[0]] >= limit:
+                    continue
+                if best is None or flow[0].finish < self._flows[best][0].finish:
+                    best = key
+            if best is None:
+                break
+
+            flow = self._flows[best]
+            ticket = flow.popleft()
+            if not flow:
+                del self._flows[best]
+
+            self.virtual_time = max(self.virtual_time, ticket.finish)
+            self.active[ticket.priority] += 1
+            _queue_wait.observe(time.monotonic() - ticket.enqueued_at, priority=ticket.priority)
+
+            if ticket.job is None:
+                ticket.granted.set()
+            else:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=self.capacity, thread_name_prefix='suno-submit')
+                self._executor.submit(self._run_job, ticket)
+
+        # Idle flows whose finish tag the clock has passed carry no state
+        if len(self._last_finish) > len(self._flows) + 100:
+            self._last_finish = {key: finish for key, finish in self._last_finish.items()
+                                 if key in self._flows or finish > self.virtual_time}
+
+    def _release(self, priority):
+        with self._lock:
+            self.active[priority] -= 1
+            self._dispatch()
+
+    def _run_job(self, ticket):
+        try:
+            ticket.job()
+        finally:
+            self._release(ticket.priority)
+
+    @contextmanager
+    def slot(self, priority, user_id, timeout=None):
+        """Hold a submission slot for the duration of the block; raises SubmissionQueueTimeout."""
+        with self._lock:
+            ticket = self._enqueue(priority, user_id)
+            self._dispatch()
+
+        if not ticket.granted.wait(timeout):
+            with self._lock:
+                if not ticket.granted.is_set():
+                    key = (priority, user_id)
+                    self._flows[key].remove(ticket)
+                    if not self._flows[key]:
+                        del self._flows[key]
+                    _timeouts.inc(priority=priority)
+                    raise SubmissionQueueTimeout('Song generation is busy, please try again shortly')
+
+        try:
+            yield
+        finally:
+            self._release(priority)
+
+    def submit(self, priority, user_id, job):
+        """Queue job() to run on a scheduler thread once it is granted a slot."""
+        with self._lock:
+            self._enqueue(priority, user_id, job)
+            self._dispatch()
+
+    def queue_depths(self):
+        with self._lock:
+            depths = dict.fromkeys(self.weights, 0)
+            for (priority, _), flow in self._flows.items():
+                depths[priority] += len(flow)
+            return depths
+
+
+def _current_scheduler():
+    with _scheduler_lock:
+        return _scheduler
+
+
+def _collect_queue_depth():
+    scheduler = _current_scheduler()
+    if scheduler is None:
+        return []
+    return [({'priority': priority}, depth) for priority, depth in scheduler.queue_depths().items()]
+
+
+def _collect_active():
+    scheduler = _current_scheduler()
+    if scheduler is None:
+        return []
+    return [({'priority': priority}, active) for priority, active in dict(scheduler.active).items()]
+
+
+metrics.gauge('suno_queue_depth', 'Submissions waiting for a Suno submission slot', _collect_queue_depth)
+metrics.gauge('suno_submissions_active', 'Submissions currently holding a slot', _collect_active)
+
+
+def get_scheduler():
+    """The per-process scheduler, sized from config."""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            config = current_app.config
+            _scheduler = FairShareScheduler(
+                config['SUNO_SUBMIT_CONCURRENCY'],
+                config['SUNO_PRIORITY_WEIGHTS'],
+                config['SUNO_PRIORITY_LIMITS'],
+            )
+        return _scheduler
+
+
+def submission_slot(priority, user_id):
+    """Wait (up to SUNO_QUEUE_TIMEOUT) for a slot to submit on behalf of user_id."""
+    return get_scheduler().slot(priority, user_id, current_app.config['SUNO_QUEUE_TIMEOUT'])
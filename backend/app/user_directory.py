@@ -0,0 +1,41 @@
+"""
+Per-process cache of user id -> username.
+
+Song and style listings show the creator's username for every row; looking
+it up through the `creator` relationship costs one query per distinct user.
+The team is small, so the whole map is loaded in one query and refreshed
+every USER_DIRECTORY_CACHE_SECONDS, or immediately when an unknown id is
+requested (a user registered through another worker).
+"""
+import time
+from flask import current_app
+from app import db
+
+# Per-process cache state
+_directory = {'loaded_at': None, 'usernames': {}}
+
+
+def _load():
+    """Reload the full id -> username map."""
+    from app.models import User
+
+    rows = db.session.execute(db.select(User.id, User.username)).all()
+    _directory.update(loaded_at=time.monotonic(), usernames={user_id: username for user_id, username in rows})
+
+
+def username_for(user_id):
+    """Username for a user id, or None for unknown ids."""
+    if user_id is None:
+        return None
+
+    ttl = current_app.config['USER_DIRECTORY_CACHE_SECONDS']
+    loaded_at = _directory['loaded_at']
+    if loaded_at is None or time.monotonic() - loaded_at >= ttl or user_id not in _directory['usernames']:
+        _load()
+
+    return _directory['usernames'].get(user_id)
+
+
+def invalidate():
+    """Drop the cached map, e.g. after creating or renaming a user."""
+    _directory.update(loaded_at=None, usernames={})
@@ -0,0 +1,51 @@
+"""
+Process warm-up helpers for gunicorn's preload/fork model.
+
+prepare_for_fork runs once in the master after the app is preloaded and
+does the one-off work every worker would otherwise repeat, so its results
+live in pages shared copy-on-write with the workers. warm_up_worker runs in
+each worker right after the fork and opens the per-process resources
+(database connections) before the first request arrives.
+"""
+import time
+from sqlalchemy.orm import configure_mappers
+from sqlalchemy.pool import QueuePool
+from app import db
+
+
+def prepare_for_fork(app):
+    """Resolve ORM mappers in the master so workers inherit them ready-made."""
+    with app.app_context():
+        configure_mappers()
+
+
+def warm_up_worker(app):
+    """
+    Reset inherited pools and pre-open database connections in a new worker.
+
+    Opens at most pool_size connections per engine, so warm-up never waits
+    on its own checkouts. Returns the warm-up duration in milliseconds.
+    """
+    started = time.monotonic()
+    connections = app.config.get('WARMUP_DB_CONNECTIONS', 2)
+
+    with app.app_context():
+        for engine in db.engines.values():
+            # Never reuse sockets opened by the master process
+            engine.dispose(close=False)
+
+            count = min(connections, engine.pool.size()) if isinstance(engine.pool, QueuePool) else connections
+            opened = []
+            try:
+                for _ in range(count):
+                    connection = engine.connect()
+                    connection.exec_driver_sql('SELECT 1')
+                    opened.append(connection)
+            except Exception as e:
+                app.logger.warning(f"Worker warm-up: could not open database connection: {str(e)}")
+            finally:
+                # Returned connections stay in the pool for the first requests
+                for connection in opened:
+                    connection.close()
+
+    return (time.monotonic() - started) * 1000
@@ -2,6 +2,8 @@ import os
 from datetime import timedelta
 from dotenv import load_dotenv
 
+basedir = os.path.abspath(os.path.dirname(__file__))
+
 # Load environment variables
 load_dotenv()
 
@@ -21,22 +23,149 @@ class Config:
 
     SQLALCHEMY_DATABASE_URI = f"mysql+pymysql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+    # Optional read replica for read-only GET endpoints (see app/db_routing.py)
+    DB_REPLICA_HOST = os.getenv('DB_REPLICA_HOST')
+    DB_REPLICA_PORT = os.getenv('DB_REPLICA_PORT', DB_PORT)
+    SQLALCHEMY_BINDS = {
+        'replica': f"mysql+pymysql://{DB_USER}:{DB_PASSWORD}@{DB_REPLICA_HOST}:{DB_REPLICA_PORT}/{DB_NAME}"
+    } if DB_REPLICA_HOST else {}
+    REPLICA_MAX_LAG_SECONDS = int(os.getenv('REPLICA_MAX_LAG_SECONDS', 2))
+    REPLICA_LAG_CHECK_INTERVAL = int(os.getenv('REPLICA_LAG_CHECK_INTERVAL', 5))
+    # pool_size/max_overflow/pool_timeout are derived per process from the
+    # connection budget in create_app (see app/db_pool.py)
     SQLALCHEMY_ENGINE_OPTIONS = {
-        'pool_size': 10,
         'pool_recycle': 3600,
         'pool_pre_ping': True,
     }
+    # Connections all web workers together may hold on each database server
+    DB_CONNECTION_BUDGET = int(os.getenv('DB_CONNECTION_BUDGET', 100))
+    DB_POOL_TIMEOUT = int(os.getenv('DB_POOL_TIMEOUT', 10))
+    # Warn when a checkout waits longer than this for a free connection
+    DB_POOL_STARVATION_SECONDS = float(os.getenv('DB_POOL_STARVATION_SECONDS', 0.5))
+    # Exported by gunicorn_config.py; 1 worker when running outside gunicorn
+    GUNICORN_WORKERS = int(os.getenv('GUNICORN_WORKERS', 1))
+    # 'web' (set by gunicorn_config.py) shares DB_CONNECTION_BUDGET between the
+    # workers; anything else (reconciler, mirror, analyzer, archival, flask
+    # migrate) gets a fixed pool of DB_BACKGROUND_POOL_SIZE outside the budget
+    DB_POOL_ROLE = os.getenv('DB_POOL_ROLE', 'background')
+    DB_BACKGROUND_POOL_SIZE = int(os.getenv('DB_BACKGROUND_POOL_SIZE', 2))
+    GUNICORN_THREADS = int(os.getenv('GUNICORN_THREADS', 8))
+    # Connections each gunicorn worker opens right after fork
+    WARMUP_DB_CONNECTIONS = int(os.getenv('WARMUP_DB_CONNECTIONS', 2))
 
     # JWT
     JWT_SECRET_KEY = os.getenv('JWT_SECRET_KEY', 'jwt-secret-key-change-in-production')
     JWT_ACCESS_TOKEN_EXPIRES = timedelta(seconds=int(os.getenv('JWT_ACCESS_TOKEN_EXPIRES', 86400)))
 
+    # Logging: async JSON pipeline (see app/log_pipeline.py)
+    LOG_ASYNC = os.getenv('LOG_ASYNC', 'true').lower() == 'true'
+    LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO').upper()
+    LOG_QUEUE_SIZE = int(os.getenv('LOG_QUEUE_SIZE', 10000))
+    LOG_MAX_MESSAGE_LENGTH = int(os.getenv('LOG_MAX_MESSAGE_LENGTH', 2000))
+    LOG_SAMPLE_RATES = os.getenv('LOG_SAMPLE_RATES', '')  # e.g. "app.routes.webhooks=0.1"
+
     # CORS
     CORS_ORIGINS = os.getenv('CORS_ORIGINS', 'http://localhost:3000').split(',')
 
     # API
     API_PREFIX = os.getenv('API_PREFIX', '/api/v1')
 
+    # Team directory: how long each worker caches the id -> username map
+    USER_DIRECTORY_CACHE_SECONDS = int(os.getenv('USER_DIRECTORY_CACHE_SECONDS', 60))
+
+    # Near-duplicate lyrics (see app/lyrics_similarity.py)
+    SIMILAR_LYRICS_THRESHOLD = float(os.getenv('SIMILAR_LYRICS_THRESHOLD', 0.8))
+    SIMILAR_LYRICS_MAX_CANDIDATES = int(os.getenv('SIMILAR_LYRICS_MAX_CANDIDATES', 200))
+
+    # Admission control: (concurrent, queued) requests per endpoint class, per worker process
+    ADMISSION_CONTROL_ENABLED = os.getenv('ADMISSION_CONTROL_ENABLED', 'true').lower() == 'true'
+    ADMISSION_LIMITS = {
+        'provider': (int(os.getenv('ADMISSION_PROVIDER_LIMIT', 3)), int(os.getenv('ADMISSION_PROVIDER_QUEUE', 3))),
+        'bulk': (int(os.getenv('ADMISSION_BULK_LIMIT', 1)), int(os.getenv('ADMISSION_BULK_QUEUE', 1))),
+    }
+    ADMISSION_QUEUE_TIMEOUT = float(os.getenv('ADMISSION_QUEUE_TIMEOUT', 5))
+    ADMISSION_RETRY_AFTER = int(os.getenv('ADMISSION_RETRY_AFTER', 5))
+
+    # /metrics (app/metrics.py): snapshot directory shared by the gunicorn
+    # workers (set by the gunicorn config) and the client networks allowed to scrape
+    METRICS_DIR = os.getenv('METRICS_DIR', '')
+    METRICS_FLUSH_SECONDS = float(os.getenv('METRICS_FLUSH_SECONDS', 5))
+    METRICS_ALLOWED_NETWORKS = os.getenv('METRICS_ALLOWED_NETWORKS', '127.0.0.0/8,::1/128').split(',')
+
+    # Generation submissions: Idempotency-Key retention and duplicate coalescing
+    IDEMPOTENCY_KEY_TTL_HOURS = int(os.getenv('IDEMPOTENCY_KEY_TTL_HOURS', 24))
+    SUNO_COALESCE_SECONDS = int(os.getenv('SUNO_COALESCE_SECONDS', 30))
+    SUNO_COALESCE_WAIT_SECONDS = int(os.getenv('SUNO_COALESCE_WAIT_SECONDS', 12))
+
+    # Suno submission scheduler (see app/submission_scheduler.py): slots per
+    # worker process, fair-share weight and slot cap per priority class, and
+    # how long interactive/recreate requests wait for a slot
+    SUNO_SUBMIT_CONCURRENCY = int(os.getenv('SUNO_SUBMIT_CONCURRENCY', 3))
+    SUNO_PRIORITY_WEIGHTS = {
+        'interactive': int(os.getenv('SUNO_INTERACTIVE_WEIGHT', 8)),
+        'recreate': int(os.getenv('SUNO_RECREATE_WEIGHT', 4)),
+        'bulk': int(os.getenv('SUNO_BULK_WEIGHT', 1)),
+    }
+    SUNO_PRIORITY_LIMITS = {'bulk': int(os.getenv('SUNO_BULK_SLOTS', 1))}
+    SUNO_QUEUE_TIMEOUT = float(os.getenv('SUNO_QUEUE_TIMEOUT', 20))
+
+    # Spreadsheet imports (POST /songs/import)
+    SONG_IMPORT_MAX_ROWS = int(os.getenv('SONG_IMPORT_MAX_ROWS', 20000))
+    IMPORT_SUBMIT_INTERVAL_SECONDS = float(os.getenv('IMPORT_SUBMIT_INTERVAL_SECONDS', 2))
+
+    # Background speech synthesis jobs (POST /speech/jobs)
+    SPEECH_JOB_WORKERS = int(os.getenv('SPEECH_JOB_WORKERS', 2))
+    SPEECH_JOB_STALE_SECONDS = int(os.getenv('SPEECH_JOB_STALE_SECONDS', 300))
+    SPEECH_JOB_RETENTION_HOURS = int(os.getenv('SPEECH_JOB_RETENTION_HOURS', 24))
+
+    # Delta sync: how long deletion tombstones are kept
+    SYNC_TOMBSTONE_RETENTION_DAYS = int(os.getenv('SYNC_TOMBSTONE_RETENTION_DAYS', 30))
+
+    # Reconciler (songs stuck in 'submitted' after a lost callback)
+    RECONCILE_STALE_MINUTES = int(os.getenv('RECONCILE_STALE_MINUTES', 15))
+    RECONCILE_BATCH_SIZE = int(os.getenv('RECONCILE_BATCH_SIZE', 50))
+    RECONCILE_CLIENT = os.getenv('RECONCILE_CLIENT', 'suno')  # 'suno' or 'local'
+
+    # Local audio mirror
+    AUDIO_STORAGE_DIR = os.getenv('AUDIO_STORAGE_DIR', os.path.join(basedir, 'storage', 'audio'))
+    AUDIO_MIRROR_WORKERS = int(os.getenv('AUDIO_MIRROR_WORKERS', 4))
+    AUDIO_MIRROR_BATCH_SIZE = int(os.getenv('AUDIO_MIRROR_BATCH_SIZE', 25))
+    # Failed files are retried after AUDIO_MIRROR_RETRY_SECONDS, doubling per
+    # attempt up to AUDIO_MIRROR_RETRY_MAX_SECONDS, and given up after MAX_ATTEMPTS
+    AUDIO_MIRROR_RETRY_SECONDS = int(os.getenv('AUDIO_MIRROR_RETRY_SECONDS', 300))
+    AUDIO_MIRROR_RETRY_MAX_SECONDS = int(os.getenv('AUDIO_MIRROR_RETRY_MAX_SECONDS', 86400))
+    AUDIO_MIRROR_MAX_ATTEMPTS = int(os.getenv('AUDIO_MIRROR_MAX_ATTEMPTS', 10))
+    # Internal nginx location for X-Accel-Redirect hand-off (empty = serve from Flask)
+    AUDIO_ACCEL_REDIRECT_PREFIX = os.getenv('AUDIO_ACCEL_REDIRECT_PREFIX', '')
+    # Lifetime of signed ?token= audio links for <audio> elements (app/audio_links.py)
+    AUDIO_LINK_EXPIRES_SECONDS = int(os.getenv('AUDIO_LINK_EXPIRES_SECONDS', 900))
+
+    # Audio analysis: duration, loudness and waveform peaks (flask analyze-audio)
+    AUDIO_ANALYSIS_BATCH_SIZE = int(os.getenv('AUDIO_ANALYSIS_BATCH_SIZE', 25))
+    # Tracks whose source could not be fetched are retried after
+    # AUDIO_ANALYSIS_RETRY_SECONDS, doubling per attempt up to
+    # AUDIO_ANALYSIS_RETRY_MAX_SECONDS, and given up after MAX_ATTEMPTS
+    AUDIO_ANALYSIS_RETRY_SECONDS = int(os.getenv('AUDIO_ANALYSIS_RETRY_SECONDS', 600))
+    AUDIO_ANALYSIS_RETRY_MAX_SECONDS = int(os.getenv('AUDIO_ANALYSIS_RETRY_MAX_SECONDS', 86400))
+    AUDIO_ANALYSIS_MAX_ATTEMPTS = int(os.getenv('AUDIO_ANALYSIS_MAX_ATTEMPTS', 8))
+    FFMPEG_BINARY = os.getenv('FFMPEG_BINARY', 'ffmpeg')
+
+    # Archival of old completed/failed songs into songs_archive (flask archive-songs)
+    ARCHIVE_AFTER_DAYS = int(os.getenv('ARCHIVE_AFTER_DAYS', 365))
+    ARCHIVE_BATCH_SIZE = int(os.getenv('ARCHIVE_BATCH_SIZE', 500))
+    ARCHIVE_BATCH_PAUSE_SECONDS = float(os.getenv('ARCHIVE_BATCH_PAUSE_SECONDS', 0.5))
+
+    # Schema migrations (flask migrate, see app/migration_runner.py): backfill
+    # batch size and pacing, and how long DDL waits for a table's metadata lock
+    MIGRATIONS_DIR = os.getenv('MIGRATIONS_DIR', os.path.join(os.path.dirname(basedir), 'database', 'migrations'))
+    MIGRATION_BATCH_SIZE = int(os.getenv('MIGRATION_BATCH_SIZE', 1000))
+    MIGRATION_BATCH_TARGET_SECONDS = float(os.getenv('MIGRATION_BATCH_TARGET_SECONDS', 0.5))
+    MIGRATION_BATCH_PAUSE_SECONDS = float(os.getenv('MIGRATION_BATCH_PAUSE_SECONDS', 0.1))
+    MIGRATION_PROGRESS_SECONDS = int(os.getenv('MIGRATION_PROGRESS_SECONDS', 5))
+    MIGRATION_LOCK_WAIT_TIMEOUT = int(os.getenv('MIGRATION_LOCK_WAIT_TIMEOUT', 5))
+    MIGRATION_DDL_RETRIES = int(os.getenv('MIGRATION_DDL_RETRIES', 5))
+
 
 class DevelopmentConfig(Config):
     """Development configuration."""
@@ -53,7 +182,11 @@ class ProductionConfig(Config):
 class TestingConfig(Config):
     """Testing configuration."""
     TESTING = True
-    SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
+    # A scratch MySQL database (tables are created and dropped) enables the query plan tests
+    SQLALCHEMY_DATABASE_URI = os.getenv('TEST_DATABASE_URL', 'sqlite:///:memory:')
+    SQLALCHEMY_BINDS = {}
+    SQLALCHEMY_ENGINE_OPTIONS = {}
+    RECONCILE_CLIENT = 'local'
 
 
 config = {
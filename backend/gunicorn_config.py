@@ -1,15 +1,30 @@
 # Gunicorn configuration file for AIASpeech (Docker version)
 
+import gc
 import multiprocessing
 import os
+import tempfile
+import time
+
+_boot_started = time.monotonic()
 
 # Server socket
 bind = '0.0.0.0:5000'
 backlog = 2048
 
 # Worker processes
-workers = min(multiprocessing.cpu_count() * 2 + 1, 4)  # Cap at 4 workers for container
-worker_class = 'sync'
+workers = int(os.getenv('GUNICORN_WORKERS', min(multiprocessing.cpu_count() * 2 + 1, 4)))  # Cap at 4 workers for container
+# Threaded workers so admission control (app/admission.py) can cap slow
+# provider-bound requests while the remaining threads keep serving reads
+worker_class = 'gthread'
+threads = int(os.getenv('GUNICORN_THREADS', 8))
+# The app sizes its DB connection pool from these (app/db_pool.py); the
+# config file is loaded before the app, so export them for it
+os.environ['GUNICORN_WORKERS'] = str(workers)
+os.environ['GUNICORN_THREADS'] = str(threads)
+os.environ['DB_POOL_ROLE'] = 'web'
+# Workers write metrics snapshots here so /metrics covers all of them (app/metrics.py)
+os.environ.setdefault('METRICS_DIR', os.path.join(tempfile.gettempdir(), 'aiaspeech-metrics'))
 worker_connections = 1000
 timeout = 120  # Increased for long Azure TTS synthesis
 keepalive = 2
@@ -18,6 +33,8 @@ keepalive = 2
 accesslog = '/app/logs/gunicorn_access.log' if os.path.exists('/app/logs') else '-'
 errorlog = '/app/logs/gunicorn_error.log' if os.path.exists('/app/logs') else '-'
 loglevel = 'info'
+# The app logs JSON lines to stderr (app/log_pipeline.py); send them to errorlog too
+capture_output = True
 access_log_format = '%(h)s %(l)s %(u)s %(t)s "%(r)s" %(s)s %(b)s "%(f)s" "%(a)s"'
 
 # Process naming
@@ -37,3 +54,39 @@ limit_request_field_size = 8190
 
 # Preload app for faster worker spawn
 preload_app = True
+
+
+# Server hooks: share preloaded state copy-on-write and warm up workers
+def when_ready(server):
+    """Runs in the master after the app is preloaded, before workers fork."""
+    from run import app
+    from app.metrics import reset_directory
+    from app.warmup import prepare_for_fork
+
+    prepare_for_fork(app)
+    reset_directory(app.config['METRICS_DIR'])
+    # Move everything allocated so far out of the GC's generations so
+    # collections in the workers don't touch (and un-share) those pages
+    gc.collect()
+    gc.freeze()
+    server.log.info(f"App preloaded in {(time.monotonic() - _boot_started) * 1000:.0f} ms, "
+                    f"{gc.get_freeze_count()} objects frozen")
+
+
+def post_fork(server, worker):
+    """Runs in each worker right after fork, before it accepts requests."""
+    from run import app
+    from app.metrics import start_exporter
+    from app.warmup import warm_up_worker
+
+    start_exporter(app.config['METRICS_DIR'], app.config['METRICS_FLUSH_SECONDS'])
+    elapsed = warm_up_worker(app)
+    server.log.info(f"Worker {worker.pid} warmed up in {elapsed:.0f} ms")
+
+
+def child_exit(server, worker):
+    """Runs in the master when a worker exits: keep its counters, drop its gauges."""
+    from run import app
+    from app.metrics import mark_process_dead
+
+    mark_process_dead(app.config['METRICS_DIR'], worker.pid)
@@ -0,0 +1,47 @@
+"""Song analytics rollups stay in step with ORM writes."""
+import pytest
+from app import create_app, db
+from app.analytics import rebuild_rollups
+from app.models import Song, SongRollup, User
+
+
+@pytest.fixture
+def app():
+    app = create_app('testing')
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+def _rollups():
+    return sorted(
+        (row.status, row.song_count, row.rated_count, row.rating_sum)
+        for row in SongRollup.query.filter(SongRollup.song_count != 0)
+    )
+
+
+def test_rollups_follow_changes_to_expired_songs(app):
+    user = User(username='alice', email='alice@example.com')
+    db.session.add(user)
+    db.session.commit()
+
+    song = Song(user_id=user.id, specific_title='Song', status='create')
+    db.session.add(song)
+    db.session.commit()
+    assert _rollups() == [('create', 1, 0, 0)]
+
+    # The commit expired song: the old values are not loaded when these are set
+    song.status = 'completed'
+    song.star_rating = 5
+    db.session.commit()
+    assert _rollups() == [('completed', 1, 1, 5)]
+
+    song.star_rating = 3
+    db.session.commit()
+    assert _rollups() == [('completed', 1, 1, 3)]
+
+    incremental = _rollups()
+    rebuild_rollups()
+    assert _rollups() == incremental
@@ -0,0 +1,55 @@
+"""The hot song queries use their composite indexes (MySQL only)."""
+from datetime import datetime, timedelta
+import pytest
+from app import create_app, db
+from app.models import Song, Style, User
+from app.query_plans import check_query_plans
+
+USERS = 50
+STYLES = 10
+SONGS = 20000
+STATUSES = ('create', 'submitted', 'completed', 'completed', 'completed', 'failed')
+
+
+@pytest.fixture
+def app():
+    app = create_app('testing')
+    with app.app_context():
+        if db.engine.dialect.name != 'mysql':
+            pytest.skip('set TEST_DATABASE_URL to a scratch MySQL database to check query plans')
+        db.create_all()
+        _seed()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+def _seed():
+    """Enough songs spread over users, styles, statuses and two years for the optimizer to pick indexes."""
+    db.session.execute(User.__table__.insert(), [
+        {'id': i, 'username': f'user{i}', 'email': f'user{i}@example.com'} for i in range(1, USERS + 1)
+    ])
+    db.session.execute(Style.__table__.insert(), [
+        {'id': i, 'name': f'Style {i}'} for i in range(1, STYLES + 1)
+    ])
+
+    start = datetime.utcnow() - timedelta(days=730)
+    for offset in range(0, SONGS, 1000):
+        db.session.execute(Song.__table__.insert(), [
+            {
+                'user_id': i % USERS + 1,
+                'style_id': i % STYLES + 1,
+                'status': STATUSES[i % len(STATUSES)],
+                'speech_task_id': f'task{i}',
+                'created_at': start + timedelta(minutes=53 * i),
+                'updated_at': start + timedelta(minutes=53 * i + 5),
+            }
+            for i in range(offset, offset + 1000)
+        ])
+    db.session.commit()
+    db.session.execute(db.text('ANALYZE TABLE songs'))
+
+
+def test_hot_queries_use_their_indexes(app):
+    failures = [f'{name}: {detail}' for name, ok, detail in check_query_plans() if not ok]
+    assert not failures, '\n'.join(failures)
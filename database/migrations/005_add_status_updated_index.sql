@@ -0,0 +1,8 @@
+-- Migration: Index for the submitted-song reconciler
+-- Date: 2026-10-19
+
+USE aiaspeech_db;
+
+-- The reconciler looks up songs still 'submitted' whose updated_at is older
+-- than the staleness window; serve that range scan from a composite index
+CREATE INDEX idx_songs_status_updated ON songs(status, updated_at);
@@ -0,0 +1,13 @@
+-- Migration: Track server-side mirrored audio files
+-- Date: 2026-10-19
+
+USE aiaspeech_db;
+
+-- Local copies of download_url_1/2 (paths relative to AUDIO_STORAGE_DIR)
+ALTER TABLE songs
+    ADD COLUMN audio_path_1 VARCHAR(255) AFTER downloaded_url_2,
+    ADD COLUMN audio_size_1 BIGINT AFTER audio_path_1,
+    ADD COLUMN audio_sha256_1 CHAR(64) AFTER audio_size_1,
+    ADD COLUMN audio_path_2 VARCHAR(255) AFTER audio_sha256_1,
+    ADD COLUMN audio_size_2 BIGINT AFTER audio_path_2,
+    ADD COLUMN audio_sha256_2 CHAR(64) AFTER audio_size_2;
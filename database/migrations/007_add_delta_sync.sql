@@ -0,0 +1,17 @@
+-- Migration: Delta sync support (GET /songs/changes)
+-- Date: 2026-10-19
+
+USE aiaspeech_db;
+
+-- Keyset scan of a user's songs by (updated_at, id)
+CREATE INDEX idx_songs_user_updated ON songs(user_id, updated_at, id);
+
+-- Tombstones for deleted songs, pruned by `flask prune-tombstones`
+CREATE TABLE IF NOT EXISTS song_deletions (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    song_id INT NOT NULL,
+    user_id INT NOT NULL,
+    deleted_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    INDEX idx_song_deletions_user (user_id, id),
+    INDEX idx_song_deletions_deleted_at (deleted_at)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
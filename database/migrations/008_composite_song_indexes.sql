@@ -0,0 +1,67 @@
+-- Migration: Composite indexes matched to the hot song queries
+-- Date: 2026-10-19
+--
+-- get_songs:  WHERE user_id = ? ORDER BY created_at DESC   -> (user_id, created_at)
+-- get_stats:  WHERE user_id = ? AND status = ?             -> (user_id, status)
+-- by style:   WHERE style_id = ? ORDER BY created_at DESC  -> (style_id, created_at)
+--
+-- Check the resulting plans with `flask check-query-plans`.
+
+USE aiaspeech_db;
+
+CREATE INDEX idx_songs_user_created ON songs(user_id, created_at);
+CREATE INDEX idx_songs_user_status ON songs(user_id, status);
+CREATE INDEX idx_songs_style_created ON songs(style_id, created_at);
+
+-- Drop indexes that are now left-prefixes of a composite index (the
+-- foreign keys on user_id/style_id are served by the new composites)
+-- or that no query uses. MySQL has no DROP INDEX IF EXISTS, so each drop
+-- is guarded through information_schema.
+
+SET @drop_sql = (
+    SELECT IF(COUNT(*) > 0, 'DROP INDEX idx_user_id ON songs', 'DO 0')
+    FROM information_schema.statistics
+    WHERE table_schema = DATABASE() AND table_name = 'songs' AND index_name = 'idx_user_id'
+);
+PREPARE stmt FROM @drop_sql; EXECUTE stmt; DEALLOCATE PREPARE stmt;
+
+SET @drop_sql = (
+    SELECT IF(COUNT(*) > 0, 'DROP INDEX idx_style_id ON songs', 'DO 0')
+    FROM information_schema.statistics
+    WHERE table_schema = DATABASE() AND table_name = 'songs' AND index_name = 'idx_style_id'
+);
+PREPARE stmt FROM @drop_sql; EXECUTE stmt; DEALLOCATE PREPARE stmt;
+
+-- (status) is the left prefix of idx_songs_status_updated (migration 005)
+SET @drop_sql = (
+    SELECT IF(COUNT(*) > 0, 'DROP INDEX idx_status ON songs', 'DO 0')
+    FROM information_schema.statistics
+    WHERE table_schema = DATABASE() AND table_name = 'songs' AND index_name = 'idx_status'
+);
+PREPARE stmt FROM @drop_sql; EXECUTE stmt; DEALLOCATE PREPARE stmt;
+
+-- idx_songs_star_rating (migration 003) duplicates idx_star_rating (schema.sql)
+SET @drop_sql = (
+    SELECT IF(COUNT(DISTINCT index_name) = 2, 'DROP INDEX idx_songs_star_rating ON songs', 'DO 0')
+    FROM information_schema.statistics
+    WHERE table_schema = DATABASE() AND table_name = 'songs'
+      AND index_name IN ('idx_star_rating', 'idx_songs_star_rating')
+);
+PREPARE stmt FROM @drop_sql; EXECUTE stmt; DEALLOCATE PREPARE stmt;
+
+-- Low-cardinality indexes from migrations 002 and 004 that no query uses
+SET @drop_sql = (
+    SELECT IF(COUNT(*) > 0, 'DROP INDEX idx_songs_version ON songs', 'DO 0')
+    FROM information_schema.statistics
+    WHERE table_schema = DATABASE() AND table_name = 'songs' AND index_name = 'idx_songs_version'
+);
+PREPARE stmt FROM @drop_sql; EXECUTE stmt; DEALLOCATE PREPARE stmt;
+
+SET @drop_sql = (
+    SELECT IF(COUNT(*) > 0, 'DROP INDEX idx_songs_downloaded ON songs', 'DO 0')
+    FROM information_schema.statistics
+    WHERE table_schema = DATABASE() AND table_name = 'songs' AND index_name = 'idx_songs_downloaded'
+);
+PREPARE stmt FROM @drop_sql; EXECUTE stmt; DEALLOCATE PREPARE stmt;
+
+SHOW INDEX FROM songs;
@@ -0,0 +1,58 @@
+-- Migration: Move large song texts out of the songs table
+-- Date: 2026-10-19
+--
+-- specific_lyrics and prompt_to_generate move to a 1:1 song_texts table so
+-- the rows scanned by list/stats/filter queries stay narrow. songs keeps a
+-- short lyrics_preview for list cards.
+
+USE aiaspeech_db;
+
+CREATE TABLE IF NOT EXISTS song_texts (
+    song_id INT PRIMARY KEY,
+    specific_lyrics TEXT,
+    prompt_to_generate TEXT,
+    FOREIGN KEY (song_id) REFERENCES songs(id) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+INSERT INTO song_texts (song_id, specific_lyrics, prompt_to_generate)
+SELECT id, specific_lyrics, prompt_to_generate
+FROM songs
+WHERE specific_lyrics IS NOT NULL OR prompt_to_generate IS NOT NULL;
+
+ALTER TABLE songs ADD COLUMN lyrics_preview VARCHAR(300) AFTER star_rating;
+
+UPDATE songs SET lyrics_preview = LEFT(specific_lyrics, 300) WHERE specific_lyrics IS NOT NULL;
+
+ALTER TABLE songs
+    DROP COLUMN specific_lyrics,
+    DROP COLUMN prompt_to_generate;
+
+-- Rebuild the view on top of song_texts
+DROP VIEW IF EXISTS song_details_view;
+
+CREATE VIEW song_details_view AS
+SELECT
+    s.id,
+    s.specific_title,
+    s.version,
+    s.star_rating,
+    t.specific_lyrics,
+    t.prompt_to_generate,
+    s.status,
+    s.vocal_gender,
+    s.voice_name,
+    s.download_url_1,
+    s.downloaded_url_1,
+    s.download_url_2,
+    s.downloaded_url_2,
+    s.speech_task_id,
+    s.created_at,
+    s.updated_at,
+    u.username as creator_username,
+    u.email as creator_email,
+    st.name as style_name,
+    st.style_prompt
+FROM songs s
+LEFT JOIN song_texts t ON t.song_id = s.id
+LEFT JOIN users u ON s.user_id = u.id
+LEFT JOIN styles st ON s.style_id = st.id;
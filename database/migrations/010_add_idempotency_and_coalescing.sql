@@ -0,0 +1,26 @@
+-- Migration: Idempotency-Key support and Suno submission coalescing
+-- Date: 2026-10-19
+
+USE aiaspeech_db;
+
+-- Stored responses for requests sent with an Idempotency-Key header
+CREATE TABLE IF NOT EXISTS idempotency_keys (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    user_id INT NOT NULL,
+    idem_key VARCHAR(255) NOT NULL,
+    endpoint VARCHAR(100) NOT NULL,
+    request_hash VARCHAR(64) NOT NULL,
+    status_code INT NULL,
+    response_body TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE KEY uq_idempotency_user_key (user_id, idem_key),
+    INDEX idx_idempotency_keys_created_at (created_at)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- Recent Suno submissions keyed by payload hash, pruned by `flask prune-tombstones`
+CREATE TABLE IF NOT EXISTS suno_submissions (
+    payload_hash CHAR(64) PRIMARY KEY,
+    task_id VARCHAR(255) NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    INDEX idx_suno_submissions_created_at (created_at)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
@@ -0,0 +1,7 @@
+-- Migration: Index for the paginated team directory (GET /auth/users)
+-- Date: 2026-10-19
+
+USE aiaspeech_db;
+
+-- Active users by username prefix, in username order
+CREATE INDEX idx_users_active_username ON users(is_active, username);
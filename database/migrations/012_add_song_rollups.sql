@@ -0,0 +1,24 @@
+-- Migration: Pre-aggregated song analytics (GET /songs/analytics)
+-- Date: 2026-10-19
+
+USE aiaspeech_db;
+
+-- Song counts per user, style (0 = none), creation day and status
+CREATE TABLE IF NOT EXISTS song_rollups (
+    user_id INT NOT NULL,
+    style_id INT NOT NULL,
+    day DATE NOT NULL,
+    status VARCHAR(20) NOT NULL,
+    song_count INT NOT NULL DEFAULT 0,
+    rated_count INT NOT NULL DEFAULT 0,
+    rating_sum INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (user_id, style_id, day, status),
+    INDEX idx_song_rollups_day (day)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- Backfill from existing songs (same as `flask rebuild-analytics`)
+INSERT INTO song_rollups (user_id, style_id, day, status, song_count, rated_count, rating_sum)
+SELECT user_id, COALESCE(style_id, 0), DATE(created_at), status,
+       COUNT(*), SUM(star_rating > 0), COALESCE(SUM(star_rating), 0)
+FROM songs
+GROUP BY user_id, COALESCE(style_id, 0), DATE(created_at), status;
@@ -0,0 +1,20 @@
+-- Migration: Background speech synthesis jobs (POST /speech/jobs)
+-- Date: 2026-10-19
+
+USE aiaspeech_db;
+
+CREATE TABLE IF NOT EXISTS speech_jobs (
+    id CHAR(32) PRIMARY KEY,
+    user_id INT NOT NULL,
+    status ENUM('queued', 'running', 'completed', 'failed') NOT NULL DEFAULT 'queued',
+    voice_name VARCHAR(255) NOT NULL,
+    text TEXT NOT NULL,
+    error VARCHAR(500),
+    audio_path VARCHAR(255),
+    audio_size INT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
+    INDEX idx_speech_jobs_user_created (user_id, created_at),
+    INDEX idx_speech_jobs_created_at (created_at)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
@@ -0,0 +1,17 @@
+-- Migration: MinHash signatures and LSH buckets for near-duplicate lyrics
+-- Date: 2026-10-19
+-- Run `flask rebuild-lyrics-index` afterwards to index existing songs.
+
+USE aiaspeech_db;
+
+ALTER TABLE song_texts ADD COLUMN lyrics_minhash VARBINARY(512) NULL;
+
+-- Songs sharing a (band, bucket) are near-duplicate candidates
+CREATE TABLE IF NOT EXISTS song_lsh_buckets (
+    band SMALLINT NOT NULL,
+    bucket BIGINT NOT NULL,
+    song_id INT NOT NULL,
+    PRIMARY KEY (band, bucket, song_id),
+    FOREIGN KEY (song_id) REFERENCES songs(id) ON DELETE CASCADE,
+    INDEX idx_song_lsh_buckets_song (song_id)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
@@ -0,0 +1,16 @@
+-- Migration: Per-track duration, loudness and waveform peaks (flask analyze-audio)
+-- Date: 2026-10-19
+
+USE aiaspeech_db;
+
+CREATE TABLE IF NOT EXISTS song_waveforms (
+    song_id INT NOT NULL,
+    audio_index SMALLINT NOT NULL,
+    duration_ms INT,
+    loudness_lufs FLOAT,
+    peaks VARBINARY(1024),
+    error VARCHAR(500),
+    analyzed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (song_id, audio_index),
+    FOREIGN KEY (song_id) REFERENCES songs(id) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
@@ -0,0 +1,38 @@
+-- Migration: Cold table for old completed/failed songs (flask archive-songs)
+-- Date: 2026-10-19
+
+USE aiaspeech_db;
+
+-- Same columns as songs (ids kept) plus the song_texts columns
+CREATE TABLE IF NOT EXISTS songs_archive (
+    id INT PRIMARY KEY,
+    user_id INT NOT NULL,
+    status ENUM('create', 'submitted', 'completed', 'failed', 'unspecified'),
+    specific_title VARCHAR(500),
+    version VARCHAR(10),
+    star_rating INT DEFAULT 0,
+    lyrics_preview VARCHAR(300),
+    style_id INT,
+    vocal_gender ENUM('male', 'female', 'other'),
+    voice_name VARCHAR(255),
+    download_url_1 VARCHAR(1000),
+    downloaded_url_1 BOOLEAN DEFAULT FALSE,
+    download_url_2 VARCHAR(1000),
+    downloaded_url_2 BOOLEAN DEFAULT FALSE,
+    audio_path_1 VARCHAR(255),
+    audio_size_1 BIGINT,
+    audio_sha256_1 CHAR(64),
+    audio_path_2 VARCHAR(255),
+    audio_size_2 BIGINT,
+    audio_sha256_2 CHAR(64),
+    speech_task_id VARCHAR(255),
+    specific_lyrics TEXT,
+    prompt_to_generate TEXT,
+    created_at TIMESTAMP NULL,
+    updated_at TIMESTAMP NULL,
+    archived_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
+    FOREIGN KEY (style_id) REFERENCES styles(id) ON DELETE SET NULL,
+    INDEX idx_songs_archive_user_created (user_id, created_at),
+    INDEX idx_songs_archive_user_status (user_id, status)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
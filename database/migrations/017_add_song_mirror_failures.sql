@@ -0,0 +1,17 @@
+-- Migration: Remember failed audio mirror downloads and back off retries
+-- Date: 2026-10-19
+
+USE aiaspeech_db;
+
+-- One row per audio file whose last mirror attempt failed; retry_at is
+-- NULL once the mirror has given up on it
+CREATE TABLE IF NOT EXISTS song_mirror_failures (
+    song_id INT NOT NULL,
+    audio_index SMALLINT NOT NULL,
+    attempts INT NOT NULL DEFAULT 0,
+    error VARCHAR(500),
+    failed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    retry_at TIMESTAMP NULL,
+    PRIMARY KEY (song_id, audio_index),
+    FOREIGN KEY (song_id) REFERENCES songs(id) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
@@ -0,0 +1,12 @@
+-- Migration: Index for archival candidates (flask archive-songs)
+-- Date: 2026-10-19
+--
+-- archival: WHERE status = ? AND created_at < ? ORDER BY created_at, id
+--           LIMIT n FOR UPDATE SKIP LOCKED                   -> (status, created_at)
+--
+-- Without it the locking read scans (and next-key locks) every completed
+-- or failed song on each batch.
+
+USE aiaspeech_db;
+
+CREATE INDEX idx_songs_status_created ON songs(status, created_at);
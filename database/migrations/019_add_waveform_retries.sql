@@ -0,0 +1,17 @@
+-- Migration: Retry audio analysis after transient failures
+-- Date: 2026-10-19
+
+USE aiaspeech_db;
+
+-- attempts/retry_at back off tracks whose source could not be fetched
+-- (ffmpeg timeout, CDN/network error); retry_at stays NULL for files that
+-- could not be decoded and once AUDIO_ANALYSIS_MAX_ATTEMPTS is reached.
+-- local_source records whether the mirrored copy was analyzed, so tracks
+-- that failed from the CDN URL are tried again once the mirror stores them.
+ALTER TABLE song_waveforms
+    ADD COLUMN attempts INT NOT NULL DEFAULT 0 AFTER error,
+    ADD COLUMN retry_at TIMESTAMP NULL AFTER attempts,
+    ADD COLUMN local_source BOOLEAN NOT NULL DEFAULT FALSE AFTER retry_at;
+
+-- Earlier failures were not classified: give each of them one more attempt
+UPDATE song_waveforms SET retry_at = CURRENT_TIMESTAMP WHERE error IS NOT NULL;
@@ -18,7 +18,8 @@ CREATE TABLE users (
     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
     INDEX idx_username (username),
     INDEX idx_email (email),
-    INDEX idx_oauth (oauth_provider, oauth_id)
+    INDEX idx_oauth (oauth_provider, oauth_id),
+    INDEX idx_users_active_username (is_active, username)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
 -- Styles table for music style management (simplified to single style_prompt)
@@ -41,8 +42,7 @@ CREATE TABLE songs (
     specific_title VARCHAR(500),
     version VARCHAR(10) DEFAULT 'v1',
     star_rating INT DEFAULT 0,
-    specific_lyrics TEXT,
-    prompt_to_generate TEXT,
+    lyrics_preview VARCHAR(300),
     style_id INT,
     vocal_gender ENUM('male', 'female', 'other'),
     voice_name VARCHAR(255),
@@ -50,20 +50,204 @@ CREATE TABLE songs (
     downloaded_url_1 BOOLEAN DEFAULT FALSE,
     download_url_2 VARCHAR(1000),
     downloaded_url_2 BOOLEAN DEFAULT FALSE,
+    audio_path_1 VARCHAR(255),
+    audio_size_1 BIGINT,
+    audio_sha256_1 CHAR(64),
+    audio_path_2 VARCHAR(255),
+    audio_size_2 BIGINT,
+    audio_sha256_2 CHAR(64),
     speech_task_id VARCHAR(255),
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
     FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
     FOREIGN KEY (style_id) REFERENCES styles(id) ON DELETE SET NULL,
-    INDEX idx_user_id (user_id),
-    INDEX idx_status (status),
-    INDEX idx_style_id (style_id),
     INDEX idx_speech_task_id (speech_task_id),
     INDEX idx_created_at (created_at),
     INDEX idx_star_rating (star_rating),
+    INDEX idx_songs_status_updated (status, updated_at),
+    INDEX idx_songs_status_created (status, created_at),
+    INDEX idx_songs_user_updated (user_id, updated_at, id),
+    INDEX idx_songs_user_created (user_id, created_at),
+    INDEX idx_songs_user_status (user_id, status),
+    INDEX idx_songs_style_created (style_id, created_at),
     CONSTRAINT chk_star_rating CHECK (star_rating >= 0 AND star_rating <= 5)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
+-- Old completed/failed songs moved out of songs by `flask archive-songs`
+-- (same columns plus the song_texts columns; app/archival.py)
+CREATE TABLE songs_archive (
+    id INT PRIMARY KEY,
+    user_id INT NOT NULL,
+    status ENUM('create', 'submitted', 'completed', 'failed', 'unspecified'),
+    specific_title VARCHAR(500),
+    version VARCHAR(10),
+    star_rating INT DEFAULT 0,
+    lyrics_preview VARCHAR(300),
+    style_id INT,
+    vocal_gender ENUM('male', 'female', 'other'),
+    voice_name VARCHAR(255),
+    download_url_1 VARCHAR(1000),
+    downloaded_url_1 BOOLEAN DEFAULT FALSE,
+    download_url_2 VARCHAR(1000),
+    downloaded_url_2 BOOLEAN DEFAULT FALSE,
+    audio_path_1 VARCHAR(255),
+    audio_size_1 BIGINT,
+    audio_sha256_1 CHAR(64),
+    audio_path_2 VARCHAR(255),
+    audio_size_2 BIGINT,
+    audio_sha256_2 CHAR(64),
+    speech_task_id VARCHAR(255),
+    specific_lyrics TEXT,
+    prompt_to_generate TEXT,
+    created_at TIMESTAMP NULL,
+    updated_at TIMESTAMP NULL,
+    archived_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
+    FOREIGN KEY (style_id) REFERENCES styles(id) ON DELETE SET NULL,
+    INDEX idx_songs_archive_user_created (user_id, created_at),
+    INDEX idx_songs_archive_user_status (user_id, status)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- Large song texts, split 1:1 from songs so list/stats scans stay narrow
+CREATE TABLE song_texts (
+    song_id INT PRIMARY KEY,
+    specific_lyrics TEXT,
+    prompt_to_generate TEXT,
+    lyrics_minhash VARBINARY(512),
+    FOREIGN KEY (song_id) REFERENCES songs(id) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- Duration, loudness and int8 min/max waveform peaks per audio file (app/audio_analysis.py)
+CREATE TABLE song_waveforms (
+    song_id INT NOT NULL,
+    audio_index SMALLINT NOT NULL,
+    duration_ms INT,
+    loudness_lufs FLOAT,
+    peaks VARBINARY(1024),
+    error VARCHAR(500),
+    attempts INT NOT NULL DEFAULT 0,
+    retry_at TIMESTAMP NULL,
+    local_source BOOLEAN NOT NULL DEFAULT FALSE,
+    analyzed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (song_id, audio_index),
+    FOREIGN KEY (song_id) REFERENCES songs(id) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- Failed audio mirror downloads and when to retry them (app/mirror.py)
+CREATE TABLE song_mirror_failures (
+    song_id INT NOT NULL,
+    audio_index SMALLINT NOT NULL,
+    attempts INT NOT NULL DEFAULT 0,
+    error VARCHAR(500),
+    failed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    retry_at TIMESTAMP NULL,
+    PRIMARY KEY (song_id, audio_index),
+    FOREIGN KEY (song_id) REFERENCES songs(id) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- LSH buckets of lyrics signatures (near-duplicate lookup, app/lyrics_similarity.py)
+CREATE TABLE song_lsh_buckets (
+    band SMALLINT NOT NULL,
+    bucket BIGINT NOT NULL,
+    song_id INT NOT NULL,
+    PRIMARY KEY (band, bucket, song_id),
+    FOREIGN KEY (song_id) REFERENCES songs(id) ON DELETE CASCADE,
+    INDEX idx_song_lsh_buckets_song (song_id)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- Tombstones for deleted songs (delta sync via GET /songs/changes)
+CREATE TABLE song_deletions (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    song_id INT NOT NULL,
+    user_id INT NOT NULL,
+    deleted_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    INDEX idx_song_deletions_user (user_id, id),
+    INDEX idx_song_deletions_deleted_at (deleted_at)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+CREATE TABLE song_rollups (
+    user_id INT NOT NULL,
+    style_id INT NOT NULL,
+    day DATE NOT NULL,
+    status VARCHAR(20) NOT NULL,
+    song_count INT NOT NULL DEFAULT 0,
+    rated_count INT NOT NULL DEFAULT 0,
+    rating_sum INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (user_id, style_id, day, status),
+    INDEX idx_song_rollups_day (day)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- Migrations applied by `flask migrate` (app/migration_runner.py). This
+-- schema already includes every file in database/migrations up to 016;
+-- keep the list below in step when adding migrations.
+CREATE TABLE schema_migrations (
+    version INT PRIMARY KEY,
+    name VARCHAR(255) NOT NULL,
+    checksum CHAR(64),
+    status VARCHAR(20) NOT NULL DEFAULT 'running',
+    statements_done INT NOT NULL DEFAULT 0,
+    backfill_position BIGINT,
+    started_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    applied_at TIMESTAMP NULL
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+INSERT INTO schema_migrations (version, name, status, applied_at) VALUES
+    (1, 'add_failed_status', 'applied', CURRENT_TIMESTAMP),
+    (2, 'add_version_column', 'applied', CURRENT_TIMESTAMP),
+    (3, 'add_star_rating', 'applied', CURRENT_TIMESTAMP),
+    (4, 'add_download_tracking', 'applied', CURRENT_TIMESTAMP),
+    (5, 'add_status_updated_index', 'applied', CURRENT_TIMESTAMP),
+    (6, 'add_local_audio_columns', 'applied', CURRENT_TIMESTAMP),
+    (7, 'add_delta_sync', 'applied', CURRENT_TIMESTAMP),
+    (8, 'composite_song_indexes', 'applied', CURRENT_TIMESTAMP),
+    (9, 'split_song_texts', 'applied', CURRENT_TIMESTAMP),
+    (10, 'add_idempotency_and_coalescing', 'applied', CURRENT_TIMESTAMP),
+    (11, 'add_user_directory_index', 'applied', CURRENT_TIMESTAMP),
+    (12, 'add_song_rollups', 'applied', CURRENT_TIMESTAMP),
+    (13, 'add_speech_jobs', 'applied', CURRENT_TIMESTAMP),
+    (14, 'add_lyrics_lsh_index', 'applied', CURRENT_TIMESTAMP),
+    (15, 'add_song_waveforms', 'applied', CURRENT_TIMESTAMP),
+    (16, 'add_songs_archive', 'applied', CURRENT_TIMESTAMP),
+    (17, 'add_song_mirror_failures', 'applied', CURRENT_TIMESTAMP),
+    (18, 'add_songs_status_created_index', 'applied', CURRENT_TIMESTAMP),
+    (19, 'add_waveform_retries', 'applied', CURRENT_TIMESTAMP);
+
+CREATE TABLE speech_jobs (
+    id CHAR(32) PRIMARY KEY,
+    user_id INT NOT NULL,
+    status ENUM('queued', 'running', 'completed', 'failed') NOT NULL DEFAULT 'queued',
+    voice_name VARCHAR(255) NOT NULL,
+    text TEXT NOT NULL,
+    error VARCHAR(500),
+    audio_path VARCHAR(255),
+    audio_size INT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
+    INDEX idx_speech_jobs_user_created (user_id, created_at),
+    INDEX idx_speech_jobs_created_at (created_at)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+CREATE TABLE idempotency_keys (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    user_id INT NOT NULL,
+    idem_key VARCHAR(255) NOT NULL,
+    endpoint VARCHAR(100) NOT NULL,
+    request_hash VARCHAR(64) NOT NULL,
+    status_code INT NULL,
+    response_body TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE KEY uq_idempotency_user_key (user_id, idem_key),
+    INDEX idx_idempotency_keys_created_at (created_at)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+CREATE TABLE suno_submissions (
+    payload_hash CHAR(64) PRIMARY KEY,
+    task_id VARCHAR(255) NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    INDEX idx_suno_submissions_created_at (created_at)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
 -- Insert default admin user (password: admin123 - CHANGE THIS!)
 -- Password hash for 'admin123' using bcrypt
 INSERT INTO users (username, email, password_hash) VALUES
@@ -84,8 +268,8 @@ SELECT
     s.specific_title,
     s.version,
     s.star_rating,
-    s.specific_lyrics,
-    s.prompt_to_generate,
+    t.specific_lyrics,
+    t.prompt_to_generate,
     s.status,
     s.vocal_gender,
     s.voice_name,
@@ -101,5 +285,6 @@ SELECT
     st.name as style_name,
     st.style_prompt
 FROM songs s
+LEFT JOIN song_texts t ON t.song_id = s.id
 LEFT JOIN users u ON s.user_id = u.id
 LEFT JOIN styles st ON s.style_id = st.id;
@@ -70,7 +70,7 @@ function SongCard({ song, onView, onDelete, onDuplicate }) {
           {song.specific_title || 'Untitled Song'}
         </h3>
 
-        <p className="song-lyrics">{truncateText(song.specific_lyrics)}</p>
+        <p className="song-lyrics">{truncateText(song.lyrics_preview ?? song.specific_lyrics)}</p>
 
         {/* Show audio players and download links for completed songs */}
         {song.status === 'completed' && (song.download_url_1 || song.download_url_2) && (
@@ -105,7 +105,7 @@ function SongCardEnhanced({ song, onView, onDelete, onDuplicate }) {
         </h3>
 
         <p className="track-lyrics">
-          {truncateText(song.specific_lyrics)}
+          {truncateText(song.lyrics_preview ?? song.specific_lyrics)}
         </p>
 
         {/* Audio Player Preview (for completed songs) */}
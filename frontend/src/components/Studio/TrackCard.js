@@ -246,7 +246,7 @@ function TrackCard({ song, onView, onDelete, onDuplicate, onRatingChange, isPlay
 
       {/* Lyrics Preview */}
       <p className="track-lyrics">
-        {truncateText(song.specific_lyrics)}
+        {truncateText(song.lyrics_preview ?? song.specific_lyrics)}
       </p>
 
       {/* Audio Players */}
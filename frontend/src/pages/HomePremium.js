@@ -1,6 +1,6 @@
 import React, { useState, useEffect, useMemo } from 'react';
 import { useNavigate } from 'react-router-dom';
-import { getSongs, getSongStats, deleteSong } from '../services/songs';
+import { getSongs, getSong, getSongStats, deleteSong } from '../services/songs';
 import { getStyles } from '../services/styles';
 import TopBar from '../components/Studio/TopBar';
 import StudioStats from '../components/Studio/StudioStats';
@@ -73,20 +73,25 @@ function HomePremium({ onLogout }) {
     // eslint-disable-next-line react-hooks/exhaustive-deps
   }, [songs]);
 
-  // Client-side filtering for star rating
-  const filteredSongs = useMemo(() => {
-    if (!filters.min_stars || filters.min_stars === 0) {
-      return songs;
-    }
-    return songs.filter(song => (song.star_rating || 0) >= filters.min_stars);
-  }, [songs, filters.min_stars]);
-
   const handleAddSong = () => {
     setEditingSong(null);
     setShowModal(true);
   };
 
-  const handleViewSong = (song) => {
+  // List responses omit full lyrics/prompt; fetch them on demand
+  const loadFullSong = async (song) => {
+    if (song.specific_lyrics !== undefined) {
+      return song;
+    }
+    try {
+      return await getSong(song.id);
+    } catch (error) {
+      console.error('Error loading song details:', error);
+      return song;
+    }
+  };
+
+  const handleViewSong = async (song) => {
     setViewingSong(song);
     setShowViewModal(true);
 
@@ -94,6 +99,9 @@ function HomePremium({ onLogout }) {
     if (song.status === 'completed' && (song.download_url_1 || song.download_url_2)) {
       setPlayingSongId(song.id);
     }
+
+    const fullSong = await loadFullSong(song);
+    setViewingSong((current) => (current && current.id === song.id ? fullSong : current));
   };
 
   const handleDeleteSong = async (songId) => {
@@ -114,11 +122,13 @@ function HomePremium({ onLogout }) {
     }
   };
 
-  const handleDuplicateSong = (song) => {
+  const handleDuplicateSong = async (listSong) => {
     // Close view modal if open
     setShowViewModal(false);
     setViewingSong(null);
 
+    const song = await loadFullSong(listSong);
+
     // Calculate next version number
     const currentVersion = song.version || 'v1';
     const versionNumber = parseInt(currentVersion.replace('v', '')) || 1;
@@ -194,12 +204,12 @@ function HomePremium({ onLogout }) {
           />
 
           <TrackGrid
-            songs={filteredSongs}
+            songs={songs}
             loading={loading}
             onAddSong={handleAddSong}
             hasFilters={hasActiveFilters}
           >
-            {filteredSongs.map((song) => (
+            {songs.map((song) => (
               <TrackCard
                 key={song.id}
                 song={song}
@@ -1,7 +1,7 @@
 import React, { useState } from 'react';
 import { useNavigate } from 'react-router-dom';
 import TopBar from '../components/Studio/TopBar';
-import api from '../services/api';
+import { synthesizeSpeech } from '../services/speech';
 import '../theme/theme.css';
 import './ManageStyles.css';
 
@@ -35,15 +35,10 @@ function ManageStyles({ onLogout }) {
     setIsPlaying(true);
 
     try {
-      const response = await api.post('/speech/synthesize', {
-        text: testText,
-        voice_name: selectedVoice.id,
-      }, {
-        responseType: 'blob'
-      });
+      const audioData = await synthesizeSpeech(testText, selectedVoice.id);
 
       // Create audio URL from blob
-      const blob = new Blob([response.data], { type: 'audio/mpeg' });
+      const blob = new Blob([audioData], { type: 'audio/mpeg' });
       const url = URL.createObjectURL(blob);
 
       // Clean up previous audio URL
@@ -62,7 +57,7 @@ function ManageStyles({ onLogout }) {
       };
       audio.play();
     } catch (err) {
-      setError(err.response?.data?.error || 'Failed to synthesize speech');
+      setError(err.response?.data?.error || err.message || 'Failed to synthesize speech');
       setIsPlaying(false);
     }
   };
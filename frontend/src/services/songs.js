@@ -6,15 +6,39 @@ export const getSongs = async (filters = {}) => {
   if (filters.status && filters.status !== 'all') {
     params.append('status', filters.status);
   }
+  if (filters.style_id) {
+    params.append('style_id', filters.style_id);
+  }
+  if (filters.vocal_gender && filters.vocal_gender !== 'all') {
+    params.append('vocal_gender', filters.vocal_gender);
+  }
   if (filters.voice_name) {
     params.append('voice_name', filters.voice_name);
   }
+  if (filters.version && filters.version !== 'all') {
+    params.append('version', filters.version);
+  }
+  if (filters.min_stars) {
+    params.append('min_stars', filters.min_stars);
+  }
+  if (filters.max_stars) {
+    params.append('max_stars', filters.max_stars);
+  }
+  if (filters.created_after) {
+    params.append('created_after', filters.created_after);
+  }
+  if (filters.created_before) {
+    params.append('created_before', filters.created_before);
+  }
   if (filters.search) {
     params.append('search', filters.search);
   }
   if (filters.all_users) {
     params.append('all_users', 'true');
   }
+  if (filters.facets) {
+    params.append('facets', 'true');
+  }
 
   const response = await api.get(`/songs/?${params.toString()}`);
   return response.data;
@@ -25,11 +49,32 @@ export const getSong = async (id) => {
   return response.data.song;
 };
 
+export const getSimilarSongs = async (id, limit = 10) => {
+  const response = await api.get(`/songs/${id}/similar`, { params: { limit } });
+  return response.data.songs;
+};
+
+export const getWaveforms = async (ids) => {
+  const response = await api.get('/songs/waveforms', { params: { ids: ids.join(',') } });
+  return response.data.waveforms;
+};
+
 export const createSong = async (songData) => {
   const response = await api.post('/songs/', songData);
   return response.data;
 };
 
+export const importSongs = async (file, generate = false) => {
+  const formData = new FormData();
+  formData.append('file', file);
+  formData.append('generate', generate ? 'true' : 'false');
+
+  const response = await api.post('/songs/import', formData, {
+    headers: { 'Content-Type': 'multipart/form-data' },
+  });
+  return response.data;
+};
+
 export const updateSong = async (id, songData) => {
   const response = await api.put(`/songs/${id}`, songData);
   return response.data;
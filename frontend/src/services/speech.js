@@ -0,0 +1,37 @@
+import api from './api';
+
+const POLL_INTERVAL_MS = 1500;
+const MAX_WAIT_MS = 5 * 60 * 1000;
+
+const sleep = (ms) => new Promise((resolve) => setTimeout(resolve, ms));
+
+export const createSpeechJob = async (text, voiceName) => {
+  const response = await api.post('/speech/jobs', { text, voice_name: voiceName });
+  return response.data.job;
+};
+
+export const getSpeechJob = async (id) => {
+  const response = await api.get(`/speech/jobs/${id}`);
+  return response.data.job;
+};
+
+// Queue a synthesis job, wait for it to finish and return the MP3 as a Blob
+export const synthesizeSpeech = async (text, voiceName) => {
+  let job = await createSpeechJob(text, voiceName);
+  const startedAt = Date.now();
+
+  while (job.status === 'queued' || job.status === 'running') {
+    if (Date.now() - startedAt > MAX_WAIT_MS) {
+      throw new Error('Speech synthesis is taking too long');
+    }
+    await sleep(POLL_INTERVAL_MS);
+    job = await getSpeechJob(job.id);
+  }
+
+  if (job.status !== 'completed') {
+    throw new Error(job.error || 'Failed to synthesize speech');
+  }
+
+  const response = await api.get(`/speech/jobs/${job.id}/audio`, { responseType: 'blob' });
+  return response.data;
+};